@@ -0,0 +1,80 @@
+import math
+import random
+
+
+class BackoffStrategy(object):
+    """
+    Computes the backoff period (in milliseconds) to wait before retrying a
+    failed connect or handshake.
+
+    Strategies are stateless: the client passes in its current backoff period
+    along with the number of consecutive failures, so a single instance can be
+    shared by any number of clients.
+    """
+
+    def __init__(self, initial=1000, maximum=60000, random_source=None):
+        self._initial = initial
+        self._maximum = maximum
+        self._random = random_source or random.Random()
+
+    def __repr__(self):
+        return '%s(initial=%s, maximum=%s)' % (self.__class__.__name__, self._initial, self._maximum)
+
+    @property
+    def initial(self):
+        return self._initial
+
+    @property
+    def maximum(self):
+        return self._maximum
+
+    def _get_ceiling(self, attempt, factor=2):
+
+        # The exponent stops growing once the ceiling reaches the maximum,
+        # otherwise a long run of failures overflows
+        exponent = max(attempt - 1, 0)
+        if factor > 1 and 0 < self._initial < self._maximum:
+            exponent = min(exponent, int(math.ceil(math.log(self._maximum / float(self._initial), factor))) + 1)
+        return min(self._maximum, self._initial * factor ** exponent)
+
+    def get_period(self, period, attempt):
+        raise NotImplementedError('Must be implemented by child classes')
+
+
+class LinearBackoff(BackoffStrategy):
+    """Grows the period by a fixed increment without jitter (the default)."""
+
+    def get_period(self, period, attempt):
+        if period < self._maximum:
+            period += self._initial
+        return period
+
+
+class ExponentialBackoff(BackoffStrategy):
+    """Multiplies the period by a fixed factor without jitter."""
+
+    def __init__(self, initial=1000, maximum=60000, factor=2, random_source=None):
+        super(ExponentialBackoff, self).__init__(initial=initial, maximum=maximum, random_source=random_source)
+        self._factor = factor
+
+    @property
+    def factor(self):
+        return self._factor
+
+    def get_period(self, period, attempt):
+        return self._get_ceiling(attempt, self._factor)
+
+
+class FullJitterBackoff(BackoffStrategy):
+    """Picks a random period between 0 and the exponential ceiling."""
+
+    def get_period(self, period, attempt):
+        return int(self._random.uniform(0, self._get_ceiling(attempt)))
+
+
+class DecorrelatedJitterBackoff(BackoffStrategy):
+    """Picks a random period between the initial period and three times the last one."""
+
+    def get_period(self, period, attempt):
+        upper = max(self._initial, period * 3)
+        return int(min(self._maximum, self._random.uniform(self._initial, upper)))
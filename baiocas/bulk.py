@@ -0,0 +1,103 @@
+import logging
+
+from tornado.concurrent import Future
+
+from baiocas.message import FailureMessage
+
+
+class BulkRequest(object):
+    """
+    Tracks the replies to a set of subscribe/unsubscribe messages sent on
+    behalf of a single subscribe_many()/unsubscribe_many() call.
+
+    The request resolves once every message has either been answered by the
+    server or failed locally. The result maps each channel ID to the reply (or
+    failure message) covering it. Instances can be awaited directly.
+
+    When the subscriptions sent differ from the channels asked for (e.g.
+    because a subscription planner collapsed them into a wildcard), channel_ids
+    maps each subscription sent to the requested channels it covers, and only
+    those channels end up in the result.
+    """
+
+    def __init__(self, messages, subscription_ids=None, callback=None, channel_ids=None):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self._pending = list(messages)
+        self._channel_ids = channel_ids
+        self._results = {}
+        self._subscription_ids = subscription_ids or {}
+        self._callback = callback
+        self._future = Future()
+        if not self._pending:
+            self._complete()
+
+    def __await__(self):
+        return self._future.__await__()
+
+    @property
+    def future(self):
+        return self._future
+
+    @property
+    def is_done(self):
+        return self._future.done()
+
+    @property
+    def subscription_ids(self):
+        return self._subscription_ids.copy()
+
+    def _complete(self):
+        self.log.debug('Bulk request completed for %d channels' % len(self._results))
+        self._future.set_result(self._results.copy())
+        if self._callback:
+            try:
+                self._callback(self._results.copy())
+            except Exception as ex:
+                self.log.warning('Exception with bulk request callback: %s' % ex)
+
+    def _find_request(self, message):
+        request = message.get(FailureMessage.FIELD_REQUEST)
+        for index, pending in enumerate(self._pending):
+            if pending is request:
+                return index
+            if pending.id is not None and pending.id == message.id:
+                return index
+        return None
+
+    def add_done_callback(self, function):
+        self._future.add_done_callback(function)
+
+    def discard(self, message):
+
+        # Messages cancelled by an extension never get a reply, so they are
+        # left out of the result
+        for index, pending in enumerate(self._pending):
+            if pending is message:
+                break
+        else:
+            return False
+        self._pending.pop(index)
+        if not self._pending:
+            self._complete()
+        return True
+
+    def handle(self, message):
+        index = self._find_request(message)
+        if index is None:
+            return False
+        request = self._pending.pop(index)
+        subscription = request.subscription
+        if not isinstance(subscription, (list, tuple)):
+            subscription = [subscription]
+        for channel_id in subscription:
+            if self._channel_ids is None:
+                self._results[channel_id] = message
+                continue
+            for requested_channel_id in self._channel_ids.get(channel_id, ()):
+                self._results[requested_channel_id] = message
+        if not self._pending:
+            self._complete()
+        return True
+
+    def result(self):
+        return self._future.result()
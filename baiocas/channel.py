@@ -1,8 +1,13 @@
 import logging
+from dataclasses import is_dataclass
 
 from baiocas.channel_id import ChannelId
+from baiocas.columnar import ColumnarListener
+from baiocas.conflation import ConflatingListener
 from baiocas.listener import Listener
 from baiocas.message import Message
+from baiocas.message import RawData
+from baiocas.schema import SchemaObject
 
 
 class Channel(object):
@@ -42,23 +47,53 @@ class Channel(object):
     def has_subscriptions(self):
         return len(self._subscriptions) > 0
 
-    def _add_listener(self, listeners, function, extra_args, extra_kwargs):
+    def _add_listener(self, listeners, function, extra_args, extra_kwargs, raw=False):
         self._listener_id += 1
-        listeners.append(Listener(
+        listener = Listener(
             id=self._listener_id,
             function=function,
             extra_args=extra_args,
-            extra_kwargs=extra_kwargs
-        ))
+            extra_kwargs=extra_kwargs,
+            raw=raw
+        )
+        listeners.append(listener)
+
+        # Buffering listeners call their function later on and report its
+        # exceptions with the listener they were added as
+        if isinstance(function, (ColumnarListener, ConflatingListener)):
+            function.listener = listener
         self.log.debug('Added listener "%s" for channel %s' %
                        (function.__name__, self._channel_id))
         return self._listener_id
 
+    def _cancel_listeners(self, listeners):
+
+        # Buffering listeners drop what they hold once they are removed
+        for listener in listeners:
+            if isinstance(listener.function, (ColumnarListener, ConflatingListener)):
+                listener.function.cancel()
+
+    def _convert_data(self, message, raw):
+
+        # Raw listeners get the data still encoded while the others get it
+        # decoded. Messages are copied so that each listener sees the form it
+        # asked for, whatever form the message arrived in. Data decoded with
+        # a schema is passed to every listener as is.
+        data = message.data
+        if data is None or isinstance(data, RawData) == raw:
+            return message
+        if isinstance(data, SchemaObject) or is_dataclass(data):
+            return message
+        message = message.copy()
+        message.data = RawData.encode(data) if raw else data.decode()
+        return message
+
     def _notify_listeners(self, listeners, channel, message):
         for listener in listeners:
             try:
                 self.log.debug('Notifying listener "%s" of message' % listener.function.__name__)
-                listener.function(channel, message, *listener.extra_args, **listener.extra_kwargs)
+                listener.function(channel, self._convert_data(message, listener.raw),
+                                  *listener.extra_args, **listener.extra_kwargs)
             except Exception as ex:
                 self.log.warning('Exception with listener "%s" with %s: %s' %
                                  (listener.function.__name__, message, ex))
@@ -72,6 +107,7 @@ class Channel(object):
             for index, listener in enumerate(listeners):
                 if listener.id == id:
                     function = listener.function
+                    self._cancel_listeners([listener])
                     del listeners[index]
                     success = True
                     break
@@ -80,6 +116,7 @@ class Channel(object):
             for index, listener in enumerate(listeners):
                 if function == listener.function:
                     to_remove.append(index)
+            self._cancel_listeners([listeners[index] for index in to_remove])
             for index in reversed(to_remove):
                 del listeners[index]
             success = bool(to_remove)
@@ -88,20 +125,32 @@ class Channel(object):
                            (function.__name__, self._channel_id))
         return success
 
-    def add_listener(self, function, *extra_args, **extra_kwargs):
-        return self._add_listener(self._listeners, function, extra_args, extra_kwargs)
+    def add_listener(self, function, *extra_args, raw=False, **extra_kwargs):
+        return self._add_listener(self._listeners, function, extra_args, extra_kwargs, raw=raw)
+
+    def add_subscription(self, function, *extra_args, raw=False, **extra_kwargs):
+        return self._add_listener(self._subscriptions, function, extra_args, extra_kwargs, raw=raw)
 
     def clear_listeners(self):
+        self._cancel_listeners(self._listeners)
         self._listeners = []
         self.log.debug('Cleared listeners for channel %s' % self._channel_id)
 
     def clear_subscriptions(self):
+        self._cancel_listeners(self._subscriptions)
         self._subscriptions = []
         self.log.debug('Cleared subscriptions for channel %s' % self._channel_id)
 
     def get_wilds(self):
         return self._channel_id.get_wilds()
 
+    def fail_listeners(self, message, exception):
+
+        # Tell the listeners that would have been notified of the message
+        # that it could not be delivered
+        for listener in self._listeners + (self._subscriptions if message.data else []):
+            self._client.fire(self._client.EVENT_LISTENER_EXCEPTION, listener, message, exception)
+
     def notify_listeners(self, channel, message):
         self._notify_listeners(self._listeners, channel, message)
         if message.data:
@@ -112,10 +161,20 @@ class Channel(object):
         message = Message(properties, channel=self._channel_id, data=data)
         self._client.send(message)
 
+    def publish_raw(self, data, properties=None):
+        self.log.debug('Publishing raw data to channel: %s' % data)
+        if not isinstance(data, RawData):
+            data = RawData(data)
+        message = Message(properties, channel=self._channel_id, data=data)
+        self._client.send(message)
+
     def remove_listener(self, id=None, function=None):
         return self._remove_listener(self._listeners, id=id, function=function)
 
-    def subscribe(self, function, *extra_args, **extra_kwargs):
+    def remove_subscription(self, id=None, function=None):
+        return self._remove_listener(self._subscriptions, id=id, function=function)
+
+    def subscribe(self, function, *extra_args, raw=False, **extra_kwargs):
         properties = None
         if 'properties' in extra_kwargs:
             properties = extra_kwargs.pop('properties')
@@ -126,10 +185,43 @@ class Channel(object):
                               subscription=self._channel_id
                               )
             self._client.send(message)
-        return self._add_listener(self._subscriptions, function, extra_args, extra_kwargs)
+        return self.add_subscription(function, *extra_args, raw=raw, **extra_kwargs)
+
+    def subscribe_columnar(self, function, *extra_args, **extra_kwargs):
+        """
+        Subscribe with a listener getting the data of the messages received
+        together as arrays keyed by field (see ColumnarListener), for
+        vectorized processing. Accepts the fields, window, max_size, dtypes
+        and channel_field keyword arguments of ColumnarListener. The
+        ColumnarListener is the subscribed function, so it is what to
+        unsubscribe.
+        """
+        options = dict((name, extra_kwargs.pop(name))
+                       for name in ('fields', 'window', 'max_size', 'dtypes', 'channel_field')
+                       if name in extra_kwargs)
+        properties = extra_kwargs.pop('properties', None)
+        listener = ColumnarListener(self._client, self, function, extra_args=extra_args,
+                                    extra_kwargs=extra_kwargs, **options)
+        self.subscribe(listener, properties=properties)
+        return listener
+
+    def subscribe_conflated(self, function, *extra_args, **extra_kwargs):
+        """
+        Subscribe with a listener only getting the latest message for each
+        key, at most once per interval (see ConflatingListener). Accepts the
+        key and interval keyword arguments of ConflatingListener. The
+        ConflatingListener is the subscribed function, so it is what to
+        unsubscribe.
+        """
+        options = dict((name, extra_kwargs.pop(name)) for name in ('key', 'interval') if name in extra_kwargs)
+        properties = extra_kwargs.pop('properties', None)
+        listener = ConflatingListener(self._client, function, extra_args=extra_args,
+                                      extra_kwargs=extra_kwargs, **options)
+        self.subscribe(listener, properties=properties)
+        return listener
 
     def unsubscribe(self, id=None, function=None, properties=None):
-        success = self._remove_listener(self._subscriptions, id=id, function=function)
+        success = self.remove_subscription(id=id, function=function)
         if not self.has_subscriptions:
             self.log.debug('Channel has no remaining subscriptions, sending unsubscribe')
             message = Message(properties,
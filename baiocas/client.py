@@ -1,18 +1,28 @@
 import logging
+import math
 from contextlib import contextmanager
-from datetime import timedelta
 
 from tornado.ioloop import IOLoop
 
 from baiocas import errors
+from baiocas.backoff import LinearBackoff
+from baiocas.bulk import BulkRequest
 from baiocas.channel import Channel
 from baiocas.channel_id import ChannelId
+from baiocas.endpoints import EndpointSelector
 from baiocas.listener import Listener
 from baiocas.message import FailureMessage
 from baiocas.message import Message
+from baiocas.message import RawData
+from baiocas.rate_limit import HANDSHAKE_LIMITER
+from baiocas.rate_limit import PublishThrottle
+from baiocas.schema import compile_schema
+from baiocas.serialization import FieldDecoder
 from baiocas.status import ClientStatus
-from baiocas.transports.long_polling import LongPollingHttpTransport
 from baiocas.transports.registry import TransportRegistry
+from baiocas.util import add_timeout
+from baiocas.util import find_channel_entry
+from baiocas.util import remove_timeout
 
 
 class Client(object):
@@ -21,8 +31,17 @@ class Client(object):
 
     DEFAULT_OPTIONS = {
         'backoff_period_increment': 1000,
+        'backoff_strategy': None,
+        'fast_start': False,
+        'handshake_limiter': HANDSHAKE_LIMITER,
         'maximum_backoff_period': 60000,
+        'maximum_endpoint_failures': 3,
+        'maximum_subscriptions_per_message': 100,
+        'publish_limiter': None,
+        'resubscribe_on_handshake': False,
         'reverse_incoming_extensions': True,
+        'subscription_planner': None,
+        'timer_wheel': None,
         'advice': {
             Message.FIELD_TIMEOUT: 60000,
             Message.FIELD_INTERVAL: 0,
@@ -30,6 +49,10 @@ class Client(object):
         }
     }
 
+    EVENT_CIRCUIT_STATE_CHANGE = 'circuit_state_change'
+
+    EVENT_ENDPOINT_CHANGE = 'endpoint_change'
+
     EVENT_EXTENSION_EXCEPTION = 'extension_exception'
 
     EVENT_LISTENER_EXCEPTION = 'listener_exception'
@@ -41,8 +64,15 @@ class Client(object):
         # Set up a logger for the client
         self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
 
-        # Save the URL
-        self._url = url
+        # Keep track of the endpoints. A list of URLs can be given for
+        # equivalent servers that the client can fail over between.
+        self._endpoints = EndpointSelector(url)
+        self._failing_over = False
+        self._round_trip_starts = {}
+
+        # Outgoing messages that extensions replaced with a copy, by message
+        # ID, so that failures are reported with what was originally sent
+        self._original_messages = {}
 
         # Use the default IO loop
         self.io_loop = IOLoop.current()
@@ -52,11 +82,15 @@ class Client(object):
         self._connected = False
         self._scheduled_send = None
         self._backoff_period = 0
+        self._backoff_attempts = 0
         self._advice = {}
 
         # Channels keyed by channel ID
         self._channels = {}
 
+        # Pending bulk subscribe/unsubscribe requests
+        self._bulk_requests = []
+
         # Active connection properties
         self._client_id = None
         self._message_id = 0
@@ -70,9 +104,22 @@ class Client(object):
         self._internal_batch = False
         self._message_queue = []
 
+        # Publishes held back by rate limits
+        self._throttle = PublishThrottle()
+        self._scheduled_drain = None
+        self._drain_deadline = None
+
         # Extensions
         self._extensions = []
 
+        # Data decoders and compiled payload schemas keyed by channel ID
+        # (wildcards allowed), and those found for each channel messages
+        # arrived on
+        self._decoders = {}
+        self._decoder_cache = {}
+        self._schemas = {}
+        self._schema_cache = {}
+
         # Event listeners keyed by event
         self._event_listener_id = 0
         self._event_listeners = {}
@@ -93,6 +140,10 @@ class Client(object):
     def client_id(self):
         return self._client_id
 
+    @property
+    def endpoints(self):
+        return self._endpoints.endpoints
+
     @property
     def is_batching(self):
         return self._batch_id > 0 or self._internal_batch
@@ -119,7 +170,7 @@ class Client(object):
 
     @property
     def url(self):
-        return self._url
+        return self._endpoints.current.url
 
     def _apply_extension(self, extension, message, outgoing=False):
         try:
@@ -158,10 +209,16 @@ class Client(object):
             return
         if self._scheduled_send:
             self.log.debug('Cancelling delayed send')
-            self.io_loop.remove_timeout(self._scheduled_send)
+            remove_timeout(self, self._scheduled_send)
         self._scheduled_send = None
 
-    def _connect(self):
+    def _cancel_drain(self):
+        if self._scheduled_drain is not None:
+            remove_timeout(self, self._scheduled_drain)
+            self._scheduled_drain = None
+            self._drain_deadline = None
+
+    def _connect(self, messages=None):
 
         # Don't attempt to connect if we're disconnected. This doesn't make much
         # sense, but that's how the JavaScript client is implemented.
@@ -181,13 +238,60 @@ class Client(object):
             message[Message.FIELD_ADVICE] = {
                 Message.FIELD_TIMEOUT: 0
             }
+            self._round_trip_starts[ChannelId.META_CONNECT] = self.io_loop.time()
 
-        # Connect
+        # Connect, piggybacking any other messages provided
         self._set_status(ClientStatus.CONNECTING)
         self.log.debug('Sending connect: %s' % message)
-        self._send(message, for_setup=True)
+        self._send((messages or []) + [message], for_setup=True)
         self._set_status(ClientStatus.CONNECTED)
 
+    def _create_subscription_messages(self, channel, channel_ids, properties=None):
+
+        # The Bayeux specification allows the subscription field to hold an
+        # array of channels, so split the channels into chunks of the maximum
+        # size. Single channels are sent as a plain string for servers that
+        # only understand the basic form (e.g. when the maximum is set to 1).
+        size = max(1, self._options['maximum_subscriptions_per_message'])
+        messages = []
+        for index in range(0, len(channel_ids), size):
+            chunk = list(channel_ids[index:index + size])
+            messages.append(Message(properties,
+                                    channel=channel,
+                                    subscription=chunk[0] if len(chunk) == 1 else chunk
+                                    ))
+        self.log.debug('Created %d %s messages for %d channels' %
+                       (len(messages), channel, len(channel_ids)))
+        return messages
+
+    def _decode_data(self, message):
+        decoder = find_channel_entry(self._decoders, self._decoder_cache, message.channel)
+        schema = find_channel_entry(self._schemas, self._schema_cache, message.channel)
+        if decoder is None and schema is None:
+            return message
+        data = message.data
+        if isinstance(data, RawData):
+            data = data.decode()
+        decoded = message.copy()
+        try:
+            if decoder is not None:
+                data = decoder(data)
+            if schema is not None:
+                data = schema(data)
+        except Exception as ex:
+
+            # Decoders can fail in any way, which is reported as a schema
+            # error rather than failing the rest of the response
+            if not isinstance(ex, errors.SchemaError):
+                error = errors.SchemaError('', '%s: %s' % (ex.__class__.__name__, ex))
+                error.__cause__ = ex
+                ex = error
+            self.log.warning('Invalid data with %s: %s' % (message, ex))
+            self._fail_listeners(message.channel, message, ex)
+            return None
+        decoded.data = data
+        return decoded
+
     def _delay_connect(self):
         self.log.debug('Scheduling delayed connect')
         self._set_status(ClientStatus.CONNECTING)
@@ -197,20 +301,23 @@ class Client(object):
         self.log.debug('Scheduling delayed handshake')
         self._set_status(ClientStatus.HANDSHAKING)
         self._internal_batch = True
-        self._delay_send(self._handshake, properties=self._handshake_properties)
+
+        # Spread out handshakes from all the clients sharing the limiter so
+        # that they don't hit a recovering server all at once. The wait for
+        # a token comes on top of the backoff of this client.
+        delay = self._advice['interval'] + self._backoff_period
+        limiter = self._options['handshake_limiter']
+        if limiter:
+            wait = int(round(limiter.reserve() * 1000))
+            self.log.debug('Handshake limiter added a wait of %sms' % wait)
+            delay += wait
+        self._schedule_send(delay, self._handshake, properties=self._handshake_properties)
 
     def _delay_send(self, method, *args, **kwargs):
-        self._cancel_delayed_send()
         delay = self._advice['interval'] + self._backoff_period
-        self.log.debug('Send scheduled in %sms, interval = %s, backoff = %s: %s' %
-                       (delay, self._advice['interval'], self._backoff_period, method.__name__))
-        if delay == 0:
-            method(*args, **kwargs)
-        else:
-            self._scheduled_send = self.io_loop.add_timeout(
-                timedelta(seconds=delay / 1000.0),
-                lambda: method(*args, **kwargs)
-            )
+        self.log.debug('Delaying send, interval = %s, backoff = %s' %
+                       (self._advice['interval'], self._backoff_period))
+        self._schedule_send(delay, method, *args, **kwargs)
 
     def _disconnect(self, abort=False):
         if self._status == ClientStatus.DISCONNECTED:
@@ -228,6 +335,53 @@ class Client(object):
             self.log.debug('Failing queued messages')
             self._handle_failure(self._message_queue[:], errors.StatusError(self._status))
             self._message_queue = []
+        self._cancel_drain()
+        if len(self._throttle) > 0:
+            self.log.debug('Failing throttled messages')
+            self._handle_failure(self._throttle.clear(), errors.StatusError(self._status))
+
+    def _drain_throttled(self):
+        self._scheduled_drain = None
+        self._drain_deadline = None
+
+        # Held messages go out with the batch or once the handshake is done
+        if self.is_batching or ClientStatus.is_handshaking(self._status):
+            self.log.debug('Batching or handshaking, not draining throttled messages')
+            return
+        messages, wait = self._throttle.drain(self._options['publish_limiter'])
+        self.log.debug('Releasing %d throttled messages, %d still waiting' % (len(messages), len(self._throttle)))
+        self._schedule_drain(wait)
+        if messages:
+            self._send(messages)
+
+    def _fail_listeners(self, channel_id, message, exception):
+        channel = self.get_channel(channel_id)
+        channel.fail_listeners(message, exception)
+        for wild in channel.channel_id.get_wilds():
+            self.get_channel(wild).fail_listeners(message, exception)
+
+    def _fast_connect(self):
+
+        # Send the messages held during the handshake along with the first
+        # connect so that the session is established in a single round trip.
+        # The first connect isn't held by the server, so the replies to the
+        # held messages come back right away.
+        messages = []
+        if not self.is_batching:
+            self.log.debug('Sending %d held messages with connect' % len(self._message_queue))
+            messages = self._throttle_messages(self._message_queue)
+            self._message_queue = []
+        self._set_status(ClientStatus.CONNECTING)
+        self._connect(messages)
+
+    def _get_backoff_strategy(self):
+        strategy = self._options['backoff_strategy']
+        if strategy is None:
+            strategy = LinearBackoff(
+                initial=self._options['backoff_period_increment'],
+                maximum=self._options['maximum_backoff_period']
+            )
+        return strategy
 
     def _get_next_message_id(self):
         self._message_id += 1
@@ -236,6 +390,11 @@ class Client(object):
     def _handle_connect_failure(self, message, exception):
         self.log.debug('Handling failed connect')
         self._connected = False
+
+        # The session only exists on the server that created it, so moving to
+        # another endpoint means re-handshaking there
+        if self._record_endpoint_failure():
+            self._advice[Message.FIELD_RECONNECT] = Message.RECONNECT_HANDSHAKE
         self._notify_connect_failure(FailureMessage.from_message(
             message,
             exception=exception,
@@ -251,6 +410,7 @@ class Client(object):
             self.log.debug('Client disconnected, discarding connect response')
             return
         self._connected = message.successful
+        self._record_round_trip(ChannelId.META_CONNECT)
         if self._connected:
             self.log.info('Client is now connected')
             self._notify_listeners(ChannelId.META_CONNECT, message)
@@ -283,6 +443,7 @@ class Client(object):
     def _handle_failure(self, messages, exception):
         self.log.debug('Handling %d failed messages for exception: %s' % (len(messages), exception))
         for message in messages:
+            message = self._original_messages.pop(message.id, message)
             handler = self._handle_message_failure
             if message.channel.is_meta:
                 handler_name = '_handle_%s_failure' % '_'.join(message.channel.parts[1:])
@@ -294,6 +455,7 @@ class Client(object):
 
     def _handle_handshake_failure(self, message, exception):
         self.log.debug('Handling failed handshake')
+        self._record_endpoint_failure()
         self._notify_handshake_failure(FailureMessage.from_message(
             message,
             exception=exception,
@@ -307,6 +469,7 @@ class Client(object):
 
         # Fail immediately if the message was not successful
         self.log.debug('Handling handshake response')
+        self._record_round_trip(ChannelId.META_HANDSHAKE)
         if not message.successful:
             self.log.info('Client failed to handshake')
             self._notify_handshake_failure(message)
@@ -330,6 +493,12 @@ class Client(object):
             self.log.debug('Transport %s -> %s' % (self._transport, new_transport))
             self._transport = new_transport
 
+        # Replay the subscriptions that survived a re-handshake ahead of
+        # anything the application queued in the meantime
+        if self._options['resubscribe_on_handshake'] or self._failing_over:
+            self._resubscribe()
+        self._failing_over = False
+
         # The new transport is now in place, so the listeners can perform a
         # publish() if they want. Notify the listeners of the connect below.
         self._notify_listeners(ChannelId.META_HANDSHAKE, message)
@@ -340,7 +509,11 @@ class Client(object):
             action = Message.RECONNECT_NONE
         if action == Message.RECONNECT_RETRY:
             self._reset_backoff_period()
-            self._delay_connect()
+            if self._options['fast_start'] and self._advice[Message.FIELD_INTERVAL] == 0:
+                self._internal_batch = False
+                self._fast_connect()
+            else:
+                self._delay_connect()
         elif action == Message.RECONNECT_NONE:
             self._disconnect()
         else:
@@ -359,8 +532,13 @@ class Client(object):
         self.log.debug('Handling message response')
         if message.successful is None:
             self.log.debug('Client received message with blank successful flag')
-            if message.data:
-                self._notify_listeners(message.channel, message)
+            planner = self._options['subscription_planner']
+            if planner and message.channel and not planner.is_wanted(message.channel):
+                self.log.debug('Message not wanted by subscription planner, discarding')
+            elif message.data:
+                message = self._decode_data(message)
+                if message is not None:
+                    self._notify_listeners(message.channel, message)
             else:
                 self.log.warning('Unknown message received: %s' % message)
         elif message.successful is True:
@@ -372,7 +550,9 @@ class Client(object):
 
     def _handle_subscribe_failure(self, message, exception):
         self.log.debug('Handling failed subscribe')
-        self._notify_subscribe_failure(FailureMessage.from_message(message, exception=exception))
+        message = FailureMessage.from_message(message, exception=exception)
+        self._notify_subscribe_failure(message)
+        self._update_bulk_requests(message)
 
     def _handle_subscribe_response(self, message):
         self.log.debug('Handling subscribe response')
@@ -383,10 +563,13 @@ class Client(object):
         else:
             self.log.info('Client failed to subscribe to channel "%s"' % channel)
             self._notify_subscribe_failure(message)
+        self._update_bulk_requests(message)
 
     def _handle_unsubscribe_failure(self, message, exception):
         self.log.debug('Handling failed unsubscribe')
-        self._notify_unsubscribe_failure(FailureMessage.from_message(message, exception=exception))
+        message = FailureMessage.from_message(message, exception=exception)
+        self._notify_unsubscribe_failure(message)
+        self._update_bulk_requests(message)
 
     def _handle_unsubscribe_response(self, message):
         self.log.debug('Handling unsubscribe response')
@@ -397,13 +580,22 @@ class Client(object):
         else:
             self.log.info('Client failed to unsubscribe from channel "%s"' % channel)
             self._notify_unsubscribe_failure(message)
+        self._update_bulk_requests(message)
 
     def _handshake(self, properties=None):
 
-        # Reset state before starting
+        # Reset state before starting. When resubscribing is enabled or when
+        # failing over to another endpoint, the subscriptions are kept during
+        # re-handshakes so that they can be replayed once the new session is
+        # established.
         self.log.info('Starting handshake')
         self._client_id = None
-        self.clear_subscriptions()
+        if self.is_disconnected:
+            self._failing_over = False
+            old_endpoint = self._endpoints.current
+            self._set_endpoint(self._endpoints.select(), old_endpoint=old_endpoint)
+        if self.is_disconnected or not (self._options['resubscribe_on_handshake'] or self._failing_over):
+            self.clear_subscriptions()
 
         # Reset the transports if we're not retrying the handshake. If we are
         # retrying the handshake, either because another handshake failed and
@@ -456,12 +648,17 @@ class Client(object):
         # Bypass the internal batch and send immediately
         self._set_status(ClientStatus.HANDSHAKING)
         self.log.debug('Sending handshake: %s' % message)
+        self._round_trip_starts[ChannelId.META_HANDSHAKE] = self.io_loop.time()
         self._send(message, for_setup=True)
 
     def _increase_backoff_period(self):
-        if self._backoff_period < self._options['maximum_backoff_period']:
-            self._backoff_period += self._options['backoff_period_increment']
-            self.log.debug('Increasing backoff period to %s' % self._backoff_period)
+        self._backoff_attempts += 1
+        self._backoff_period = self._get_backoff_strategy().get_period(
+            self._backoff_period,
+            self._backoff_attempts
+        )
+        self.log.debug('Backoff period set to %s after %d attempts' %
+                       (self._backoff_period, self._backoff_attempts))
 
     def _notify_connect_failure(self, message):
         self.log.debug('Notifying listeners of failed connect')
@@ -529,14 +726,26 @@ class Client(object):
         self._notify_listeners(ChannelId.META_UNSUBSCRIBE, message)
         self._notify_listeners(ChannelId.META_UNSUCCESSFUL, message)
 
+    def _plan_subscriptions(self, channel, channel_ids):
+        planner = self._options['subscription_planner']
+        if channel == ChannelId.META_SUBSCRIBE:
+            if not planner:
+                return list(channel_ids), []
+            return planner.subscribe(channel_ids)
+        if not planner:
+            return [], list(channel_ids)
+        return planner.unsubscribe(channel_ids)
+
     def _queue_send(self, message):
         self.log.debug('Queueing message for sending: %s' % message)
         if self.is_batching or ClientStatus.is_handshaking(self._status):
             self.log.debug('In batch, adding message to queue')
             self._message_queue.append(message)
-        else:
+        elif self._throttle_messages([message]):
             self.log.debug('Sending message immediately')
             self._send(message)
+        else:
+            self.log.debug('Message throttled')
 
     def _receive(self, message):
         self.log.debug('Receiving message: %s' % message)
@@ -545,6 +754,8 @@ class Client(object):
             self.log.debug('Message cancelled by extensions')
             return
         self._update_advice(message.advice)
+        if message.successful is not None:
+            self._original_messages.pop(message.id, None)
         handler = self._handle_message_response
         if message.channel and message.channel.is_meta:
             handler_name = '_handle_%s_response' % '_'.join(message.channel.parts[1:])
@@ -554,9 +765,81 @@ class Client(object):
         self.log.debug('Passing message to handler %s' % handler.__name__)
         handler(message)
 
+    def _record_endpoint_failure(self):
+        endpoint = self._endpoints.current
+        endpoint.record_failure()
+        self.log.debug('Endpoint %s failed %d times in a row' % (endpoint.url, endpoint.consecutive_failures))
+        if endpoint.consecutive_failures < self._options['maximum_endpoint_failures']:
+            return False
+        new_endpoint = self._endpoints.failover()
+        if new_endpoint is endpoint:
+            return False
+        self._failing_over = True
+        self._set_endpoint(new_endpoint, old_endpoint=endpoint)
+        return True
+
+    def _record_round_trip(self, channel_id):
+        start = self._round_trip_starts.pop(channel_id, None)
+        if start is None:
+            return
+        rtt = (self.io_loop.time() - start) * 1000
+        self.log.debug('Round trip time for %s: %.1fms' % (channel_id, rtt))
+        self._endpoints.current.record_rtt(rtt)
+
     def _reset_backoff_period(self):
         self.log.debug('Resetting backoff period to 0')
         self._backoff_period = 0
+        self._backoff_attempts = 0
+
+    def _resubscribe(self):
+
+        # Skip channels the application already (re)subscribed to while the
+        # handshake was in progress since those messages are still queued
+        queued = set()
+        for message in self._message_queue:
+            if message.channel == ChannelId.META_SUBSCRIBE:
+                subscription = message.subscription
+                if isinstance(subscription, (list, tuple)):
+                    queued.update(subscription)
+                elif subscription:
+                    queued.add(subscription)
+        planner = self._options['subscription_planner']
+        if planner:
+            channel_ids = planner.get_server_subscriptions()
+        else:
+            channel_ids = [channel.channel_id for channel in self._channels.values()
+                           if channel.has_subscriptions and not channel.is_meta]
+        channel_ids = [channel_id for channel_id in channel_ids if channel_id not in queued]
+        if not channel_ids:
+            self.log.debug('No subscriptions to replay')
+            return
+
+        # Queue the subscribes in front of the held messages so that they are
+        # all sent in the same batch once the handshake completes
+        self.log.info('Resubscribing to %d channels' % len(channel_ids))
+        self._message_queue[:0] = self._create_subscription_messages(
+            ChannelId.META_SUBSCRIBE,
+            channel_ids
+        )
+
+    def _schedule_drain(self, wait):
+        if wait is None:
+            return
+        deadline = self.io_loop.time() + wait
+        if self._drain_deadline is not None and self._drain_deadline <= deadline:
+            return
+        self._cancel_drain()
+        self.log.debug('Draining throttled messages in %.3fs' % wait)
+        self._scheduled_drain = add_timeout(self, int(math.ceil(wait * 1000)), self._drain_throttled)
+        self._drain_deadline = deadline
+
+    def _schedule_send(self, delay, method, *args, **kwargs):
+        self._cancel_delayed_send()
+        self.log.debug('Send scheduled in %sms: %s' % (delay, method.__name__))
+        if delay == 0:
+            method(*args, **kwargs)
+        else:
+            self._scheduled_send = add_timeout(self, delay, lambda: method(*args, **kwargs))
 
     def _send(self, messages, for_setup=False, sync=False):
 
@@ -582,11 +865,15 @@ class Client(object):
         for message in messages:
             if self._client_id:
                 message['clientId'] = self._client_id
-            message = self._apply_outgoing_extensions(message)
-            if not message:
+            prepared_message = self._apply_outgoing_extensions(message)
+            if not prepared_message:
+                self._update_bulk_requests(message, cancelled=True)
                 continue
-            message.id = str(self._get_next_message_id())
-            prepared_messages.append(message)
+            prepared_message.id = str(self._get_next_message_id())
+            if prepared_message is not message:
+                message.id = prepared_message.id
+                self._original_messages[message.id] = message
+            prepared_messages.append(prepared_message)
         if not prepared_messages:
             self.log.debug('All messages cancelled by extensions, skipping send')
             return False
@@ -596,12 +883,65 @@ class Client(object):
         self._transport.send(prepared_messages, sync=sync)
         return True
 
+    def _send_bulk_request(self, channel, channel_ids, subscription_ids=None, properties=None,
+                           callback=None):
+        to_subscribe, to_unsubscribe = self._plan_subscriptions(channel, channel_ids)
+        messages = self._create_subscription_messages(
+            ChannelId.META_SUBSCRIBE,
+            to_subscribe,
+            properties=properties
+        )
+        messages += self._create_subscription_messages(
+            ChannelId.META_UNSUBSCRIBE,
+            to_unsubscribe,
+            properties=properties
+        )
+
+        # The subscriptions the server sees can differ from the requested
+        # channels, so map the replies back: channels covered by a wildcard
+        # get the reply for the wildcard, and the siblings the planner
+        # replaced are left out
+        sent = set(to_subscribe if channel == ChannelId.META_SUBSCRIBE else to_unsubscribe)
+        covered = {}
+        for channel_id in map(ChannelId.convert, channel_ids):
+            if channel_id in sent:
+                covered.setdefault(channel_id, []).append(channel_id)
+                continue
+            for wild in channel_id.get_wilds():
+                if wild in sent:
+                    covered.setdefault(wild, []).append(channel_id)
+                    break
+        request = BulkRequest(messages, subscription_ids=subscription_ids, callback=callback,
+                              channel_ids=covered)
+        if messages:
+            self._bulk_requests.append(request)
+            with self.batch():
+                for message in messages:
+                    self._queue_send(message)
+        return request
+
+    def _set_endpoint(self, endpoint, old_endpoint=None):
+        for name in self._transports.get_known_transports():
+            transport = self._transports.get_transport(name)
+            if transport.url != endpoint.url:
+                transport.url = endpoint.url
+        if old_endpoint and old_endpoint is not endpoint:
+            self.log.info('Endpoint: %s -> %s' % (old_endpoint.url, endpoint.url))
+            self.fire(self.EVENT_ENDPOINT_CHANGE, old_endpoint.url, endpoint.url)
+
     def _set_status(self, status):
         if status == self._status:
             return
         self.log.info('Status: %s -> %s' % (self._status, status))
         self._status = status
 
+    def _throttle_messages(self, messages):
+
+        # Publishes over their rate limits are held back, the rest go out
+        messages, wait = self._throttle.admit(messages, self._options['publish_limiter'])
+        self._schedule_drain(wait)
+        return messages
+
     def _update_advice(self, new_advice):
         if new_advice:
             advice = self._options['advice'].copy()
@@ -609,10 +949,20 @@ class Client(object):
             self._advice = advice
             self.log.debug('New advice: %s' % self._advice)
 
+    def _update_bulk_requests(self, message, cancelled=False):
+        for request in self._bulk_requests:
+            handled = request.discard(message) if cancelled else request.handle(message)
+            if handled:
+                if request.is_done:
+                    self._bulk_requests.remove(request)
+                break
+
     def clear_subscriptions(self):
         self.log.info('Clearing subscriptions')
         for channel in self._channels.values():
             channel.clear_subscriptions()
+        if self._options['subscription_planner']:
+            self._options['subscription_planner'].reset()
 
     def configure(self, **options):
         if not options:
@@ -663,10 +1013,12 @@ class Client(object):
         self.log.debug('Flushing batch of %d messages' % len(self._message_queue))
         if not self._message_queue:
             self.log.debug('No messages in batch queue, skipping flush')
+            self._schedule_drain(self._throttle.get_wait(self._options['publish_limiter']))
             return
-        messages = self._message_queue[:]
+        messages = self._throttle_messages(self._message_queue[:])
         self._message_queue = []
-        self._send(messages)
+        if messages:
+            self._send(messages)
 
     def get_channel(self, channel_id):
         self.log.debug('Fetching channel %s' % channel_id)
@@ -700,6 +1052,15 @@ class Client(object):
         self.log.info('Received %d messages' % len(messages))
         list(map(self._receive, messages))
 
+    def register_decoder(self, channel_id, decoder):
+        channel_id = ChannelId.convert(channel_id)
+        if isinstance(decoder, dict):
+            decoder = FieldDecoder(decoder)
+        self._decoders[channel_id] = decoder
+        self._decoder_cache.clear()
+        self.log.debug('Registered decoder %s for channel %s' % (decoder, channel_id))
+        return decoder
+
     def register_extension(self, extension):
         self._extensions.append(extension)
         self.log.debug('Registered extension %s' % extension)
@@ -717,22 +1078,101 @@ class Client(object):
         ))
         return self._event_listener_id
 
+    def register_publish_limit(self, channel_id, limiter, coalesce=False, key=None):
+        channel_id = ChannelId.convert(channel_id)
+        self._throttle.add_limit(channel_id, limiter, coalesce=coalesce, key=key)
+        self.log.debug('Registered publish limit %s for channel %s' % (limiter, channel_id))
+
+    def register_schema(self, channel_id, schema, name=None):
+        channel_id = ChannelId.convert(channel_id)
+        schema = compile_schema(schema, name=name)
+        self._schemas[channel_id] = schema
+        self._schema_cache.clear()
+        self.log.debug('Registered schema %s for channel %s' % (schema, channel_id))
+        return schema
+
     def register_transport(self, transport):
         if not self._transports.add(transport):
             self.log.warning('Failed to register transport %s' % transport)
             return False
         self.log.debug('Registered transport %s' % transport)
-        transport.register(self, url=self._url)
+        transport.register(self, url=self.url)
         return True
 
     def send(self, message):
         self.log.debug('Received message for sending: %s' % message)
+
+        # Let the subscription planner rewrite subscribes and unsubscribes
+        # coming from the channels
+        if self._options['subscription_planner'] and \
+                message.channel in (ChannelId.META_SUBSCRIBE, ChannelId.META_UNSUBSCRIBE):
+            subscription = message.subscription
+            if not isinstance(subscription, (list, tuple)):
+                subscription = [subscription]
+            to_subscribe, to_unsubscribe = self._plan_subscriptions(message.channel, subscription)
+            properties = dict((key, value) for key, value in message.items()
+                              if key not in (Message.FIELD_CHANNEL, Message.FIELD_SUBSCRIPTION))
+            messages = self._create_subscription_messages(
+                ChannelId.META_SUBSCRIBE,
+                to_subscribe,
+                properties=properties
+            )
+            messages += self._create_subscription_messages(
+                ChannelId.META_UNSUBSCRIBE,
+                to_unsubscribe,
+                properties=properties
+            )
+            self.log.debug('Subscription planner produced %d messages' % len(messages))
+            if len(messages) > 1:
+                with self.batch():
+                    list(map(self._queue_send, messages))
+            elif messages:
+                self._queue_send(messages[0])
+            return
+
         self._queue_send(message)
 
     def start_batch(self):
         self._batch_id += 1
         self.log.debug('Started batch with ID %s' % self._batch_id)
 
+    def subscribe_many(self, channel_ids, function, *extra_args, raw=False, **extra_kwargs):
+        properties = extra_kwargs.pop('properties', None)
+        callback = extra_kwargs.pop('callback', None)
+
+        # Add the subscription to every channel, only sending subscribes for
+        # the channels that didn't have any subscriptions yet
+        subscription_ids = {}
+        to_subscribe = []
+        for channel_id in channel_ids:
+            channel = self.get_channel(channel_id)
+            if not channel.has_subscriptions:
+                to_subscribe.append(channel.channel_id)
+            subscription_ids[channel.channel_id] = channel.add_subscription(
+                function,
+                *extra_args,
+                raw=raw,
+                **extra_kwargs
+            )
+
+        # Send the subscribes as a single batch
+        self.log.debug('Bulk subscribing to %d channels' % len(to_subscribe))
+        return self._send_bulk_request(
+            ChannelId.META_SUBSCRIBE,
+            to_subscribe,
+            subscription_ids=subscription_ids,
+            properties=properties,
+            callback=callback
+        )
+
+    def unregister_decoder(self, channel_id):
+        decoder = self._decoders.pop(ChannelId.convert(channel_id), None)
+        if decoder is None:
+            return False
+        self._decoder_cache.clear()
+        self.log.debug('Unregistered decoder %s for channel %s' % (decoder, channel_id))
+        return True
+
     def unregister_extension(self, extension):
         if extension not in self._extensions:
             self.log.warning('Failed to unregister extension %s, not registered' % extension)
@@ -774,6 +1214,21 @@ class Client(object):
         self.log.debug('Unregistered %d listeners' % unregistered)
         return bool(unregistered)
 
+    def unregister_publish_limit(self, channel_id):
+        if not self._throttle.remove_limit(ChannelId.convert(channel_id)):
+            return False
+        self.log.debug('Unregistered publish limit for channel %s' % channel_id)
+        self._schedule_drain(self._throttle.get_wait(self._options['publish_limiter']))
+        return True
+
+    def unregister_schema(self, channel_id):
+        schema = self._schemas.pop(ChannelId.convert(channel_id), None)
+        if schema is None:
+            return False
+        self._schema_cache.clear()
+        self.log.debug('Unregistered schema %s for channel %s' % (schema, channel_id))
+        return True
+
     def unregister_transport(self, name):
         transport = self._transports.remove(name)
         if not transport:
@@ -783,6 +1238,32 @@ class Client(object):
         transport.unregister()
         return transport
 
+    def unsubscribe_many(self, channel_ids, function=None, properties=None, callback=None):
+
+        # Remove the subscriptions from every channel (all of them if no
+        # function is given), only sending unsubscribes for the channels that
+        # no longer have any subscriptions
+        to_unsubscribe = []
+        for channel_id in channel_ids:
+            channel = self.get_channel(channel_id)
+            if not channel.has_subscriptions:
+                continue
+            if function is None:
+                channel.clear_subscriptions()
+            else:
+                channel.remove_subscription(function=function)
+            if not channel.has_subscriptions:
+                to_unsubscribe.append(channel.channel_id)
+
+        # Send the unsubscribes as a single batch
+        self.log.debug('Bulk unsubscribing from %d channels' % len(to_unsubscribe))
+        return self._send_bulk_request(
+            ChannelId.META_UNSUBSCRIBE,
+            to_unsubscribe,
+            properties=properties,
+            callback=callback
+        )
+
     @contextmanager
     def batch(self):
         self.log.debug('Entered batch context manager')
@@ -796,6 +1277,10 @@ class Client(object):
 
 
 def get_client(url, **options):
+
+    # The transport pulls in the Tornado HTTP client stack (and SSL), so it is
+    # only imported once a client actually needs it
+    from baiocas.transports.long_polling import LongPollingHttpTransport
     client = Client(url, **options)
     client.register_transport(LongPollingHttpTransport())
     return client
@@ -0,0 +1,177 @@
+import array
+import dataclasses
+import logging
+
+from baiocas.listener import Listener
+from baiocas.util import add_timeout
+from baiocas.util import get_numpy
+from baiocas.util import remove_timeout
+
+# Type codes for array.array columns when NumPy isn't installed
+TYPECODES = {
+    (bool,): 'b',
+    (int,): 'q',
+    (float,): 'd',
+    (float, int): 'd'
+}
+
+
+def to_array(values, dtype=None):
+    """
+    Convert a column of values to a NumPy array, or to an array.array when
+    NumPy isn't installed. The dtype (a NumPy dtype or an array type code) is
+    inferred when not given. Without NumPy, columns that aren't all numbers
+    stay lists.
+    """
+    numpy = get_numpy()
+    if numpy is not None:
+        return numpy.array(values, dtype=dtype)
+    if dtype is None:
+        dtype = TYPECODES.get(tuple(sorted(set(map(type, values)), key=lambda value_type: value_type.__name__)))
+        if dtype is None:
+            return values
+    return array.array(dtype, values)
+
+
+class ColumnBuffer(object):
+    """
+    Gathers message payloads (dicts, or objects decoded with a schema, be it
+    a field spec or a dataclass) field by field and turns them into one array
+    per field.
+
+    The fields are taken from the first payload when not given. Payloads
+    missing a field get None for it, which makes the column an object array
+    (or a list without NumPy). With a channel_field, the channel each payload
+    was received on is added as a column of that name.
+    """
+
+    def __init__(self, fields=None, dtypes=None, channel_field=None):
+        self._fields = list(fields) if fields else None
+        self._dtypes = dtypes or {}
+        self._channel_field = channel_field
+        self._channels = []
+        self._columns = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def fields(self):
+        return self._fields
+
+    def _get_fields(self, data):
+        if isinstance(data, dict):
+            return list(data)
+        if dataclasses.is_dataclass(data):
+            return [field.name for field in dataclasses.fields(data)]
+        return list(data.to_dict())
+
+    def append(self, data, channel=None):
+        if self._columns is None:
+            if self._fields is None:
+                self._fields = self._get_fields(data)
+            self._columns = [(field, []) for field in self._fields]
+        if self._channel_field:
+            self._channels.append(channel)
+        if isinstance(data, dict):
+            for field, column in self._columns:
+                column.append(data.get(field))
+        else:
+            for field, column in self._columns:
+                column.append(getattr(data, field, None))
+        self._size += 1
+
+    def flush(self):
+        if not self._size:
+            return {}
+        columns = dict((field, to_array(column, self._dtypes.get(field))) for field, column in self._columns)
+        if self._channel_field:
+            columns[self._channel_field] = to_array(self._channels, self._dtypes.get(self._channel_field))
+            self._channels = []
+        self._columns = [(field, []) for field in self._fields]
+        self._size = 0
+        return columns
+
+
+class ColumnarListener(object):
+    """
+    Subscription listener buffering the data of the messages it receives and
+    passing it on as columns: function(channel, columns, *extra_args,
+    **extra_kwargs), where columns maps each field to an array.
+
+    Without a window, the columns are delivered once all the messages that
+    arrived together (typically in one poll) have been received. With a
+    window (in milliseconds), they are delivered at most that often. Columns
+    are also delivered right away once max_size messages are buffered.
+
+    For a wildcard channel, the data of all the matching channels ends up in
+    the same columns. Pass a channel_field to get the channel of each message
+    as a column as well.
+    """
+
+    def __init__(self, client, channel, function, fields=None, window=None, max_size=None, dtypes=None,
+                 channel_field=None, extra_args=(), extra_kwargs=None):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self.__name__ = 'columnar(%s)' % getattr(function, '__name__', function)
+        self._client = client
+        self._channel = channel
+        self._function = function
+        self._extra_args = extra_args
+        self._extra_kwargs = extra_kwargs or {}
+        self._window = window
+        self._max_size = max_size
+        self._buffer = ColumnBuffer(fields=fields, dtypes=dtypes, channel_field=channel_field)
+        self._scheduled_flush = None
+
+        # The Listener this was added to the channel as (set by the channel),
+        # passed with EVENT_LISTENER_EXCEPTION like for any other listener
+        self.listener = Listener(id=None, function=self, extra_args=(), extra_kwargs={})
+
+    def __call__(self, channel, message):
+        self._buffer.append(message.data, message.channel)
+        if self._max_size and len(self._buffer) >= self._max_size:
+            self.flush()
+        elif self._scheduled_flush is None:
+            self._schedule_flush()
+
+    @property
+    def buffered(self):
+        return len(self._buffer)
+
+    def _cancel_flush(self):
+        scheduled_flush, self._scheduled_flush = self._scheduled_flush, None
+        if self._window and scheduled_flush is not None:
+            remove_timeout(self._client, scheduled_flush)
+
+    def _flush_scheduled(self):
+        self._scheduled_flush = None
+        self.flush()
+
+    def _schedule_flush(self):
+
+        # Callbacks added while handling the messages of a response only run
+        # once all of them have been handled
+        if not self._window:
+            self._client.io_loop.add_callback(self._flush_scheduled)
+            self._scheduled_flush = True
+        else:
+            self._scheduled_flush = add_timeout(self._client, self._window, self._flush_scheduled)
+
+    def cancel(self):
+        self._cancel_flush()
+        self._buffer.flush()
+
+    def flush(self):
+        self._cancel_flush()
+        if not len(self._buffer):
+            return False
+        size = len(self._buffer)
+        columns = self._buffer.flush()
+        self.log.debug('Delivering %d messages as columns to "%s"' % (size, self.__name__))
+        try:
+            self._function(self._channel, columns, *self._extra_args, **self._extra_kwargs)
+        except Exception as ex:
+            self.log.warning('Exception with listener "%s": %s' % (self.__name__, ex))
+            self._client.fire(self._client.EVENT_LISTENER_EXCEPTION, self.listener, None, ex)
+        return True
@@ -0,0 +1,94 @@
+import itertools
+import logging
+
+from baiocas.listener import Listener
+from baiocas.util import add_timeout
+from baiocas.util import get_key
+from baiocas.util import remove_timeout
+
+
+class ConflatingListener(object):
+    """
+    Subscription listener for channels carrying state updates, where only
+    the latest value matters.
+
+    Messages are held back and delivered at most once per interval (in
+    milliseconds), and a message replaces any pending message with the same
+    key: its channel and the value at the key path in its data (see
+    baiocas.util.get_key), or just its channel without a key path. A slow
+    consumer then gets the current state of each key rather than working
+    through a backlog of stale updates. Pending messages are delivered in the
+    order their keys were first updated. Messages with a key value that can't
+    be hashed (e.g. a dict) are never conflated.
+
+    The first message after a quiet period is delivered on the next IO loop
+    iteration, later ones wait for the interval since the last delivery.
+    """
+
+    def __init__(self, client, function, key=None, interval=100, extra_args=(), extra_kwargs=None):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self.__name__ = 'conflated(%s)' % getattr(function, '__name__', function)
+        self._client = client
+        self._function = function
+        self._key = key.split('.') if isinstance(key, str) else key
+        self._interval = interval
+        self._extra_args = extra_args
+        self._extra_kwargs = extra_kwargs or {}
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._scheduled_delivery = None
+        self._last_delivery = None
+        self._conflated = 0
+
+        # The Listener this was added to the channel as (set by the channel),
+        # passed with EVENT_LISTENER_EXCEPTION like for any other listener
+        self.listener = Listener(id=None, function=self, extra_args=(), extra_kwargs={})
+
+    def __call__(self, channel, message):
+        key = get_key(message.channel, message.data, self._key)
+        if key is None:
+            key = next(self._sequence)
+        elif key in self._pending:
+            self._conflated += 1
+        self._pending[key] = (channel, message)
+        if self._scheduled_delivery is None:
+            self._schedule_delivery()
+
+    @property
+    def conflated(self):
+        return self._conflated
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def _deliver_scheduled(self):
+        self._scheduled_delivery = None
+        self.deliver()
+
+    def _schedule_delivery(self):
+        delay = 0
+        if self._last_delivery is not None:
+            delay = max(0, self._interval - (self._client.io_loop.time() - self._last_delivery) * 1000)
+        self._scheduled_delivery = add_timeout(self._client, delay, self._deliver_scheduled)
+
+    def cancel(self):
+        if self._scheduled_delivery is not None:
+            remove_timeout(self._client, self._scheduled_delivery)
+            self._scheduled_delivery = None
+        self._pending = {}
+
+    def deliver(self):
+        if self._scheduled_delivery is not None:
+            remove_timeout(self._client, self._scheduled_delivery)
+            self._scheduled_delivery = None
+        pending, self._pending = self._pending, {}
+        self._last_delivery = self._client.io_loop.time()
+        self.log.debug('Delivering %d conflated messages to "%s"' % (len(pending), self.__name__))
+        for channel, message in pending.values():
+            try:
+                self._function(channel, message, *self._extra_args, **self._extra_kwargs)
+            except Exception as ex:
+                self.log.warning('Exception with listener "%s" with %s: %s' % (self.__name__, message, ex))
+                self._client.fire(self._client.EVENT_LISTENER_EXCEPTION, self.listener, message, ex)
+        return len(pending)
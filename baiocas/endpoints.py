@@ -0,0 +1,122 @@
+import logging
+
+
+class Endpoint(object):
+    """
+    Health information for a single Bayeux server URL.
+
+    The round trip time is kept as an exponentially weighted moving average of
+    the handshakes and unheld connects sent to the endpoint, and each
+    consecutive transport failure adds a fixed penalty to its score. Lower
+    scores are better.
+    """
+
+    def __init__(self, url, smoothing=0.2, error_penalty=1000):
+        self._url = url
+        self._smoothing = smoothing
+        self._error_penalty = error_penalty
+        self._rtt = None
+        self._consecutive_failures = 0
+        self._failures = 0
+        self._successes = 0
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, self._url)
+
+    @property
+    def consecutive_failures(self):
+        return self._consecutive_failures
+
+    @property
+    def failures(self):
+        return self._failures
+
+    @property
+    def is_measured(self):
+        return self._rtt is not None
+
+    @property
+    def rtt(self):
+        return self._rtt
+
+    @property
+    def successes(self):
+        return self._successes
+
+    @property
+    def url(self):
+        return self._url
+
+    def get_score(self, default_rtt=0):
+        rtt = self._rtt if self._rtt is not None else default_rtt
+        return rtt + self._consecutive_failures * self._error_penalty
+
+    def record_failure(self):
+        self._failures += 1
+        self._consecutive_failures += 1
+
+    def record_rtt(self, rtt):
+        if self._rtt is None:
+            self._rtt = float(rtt)
+        else:
+            self._rtt += self._smoothing * (rtt - self._rtt)
+        self._successes += 1
+        self._consecutive_failures = 0
+
+
+class EndpointSelector(object):
+    """
+    Picks the Bayeux server a client talks to out of a list of equivalent
+    endpoints.
+
+    Endpoints that haven't been measured yet are scored as the average of the
+    measured ones, so the configured order is used until round trip times are
+    known and an unknown endpoint is only preferred over a slow one.
+    """
+
+    def __init__(self, urls, smoothing=0.2, error_penalty=1000):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            raise ValueError('At least one endpoint is required')
+        self._endpoints = [Endpoint(url, smoothing=smoothing, error_penalty=error_penalty) for url in urls]
+        self._current = self._endpoints[0]
+
+    def __len__(self):
+        return len(self._endpoints)
+
+    @property
+    def current(self):
+        return self._current
+
+    @property
+    def endpoints(self):
+        return self._endpoints[:]
+
+    def _get_default_rtt(self):
+        rtts = [endpoint.rtt for endpoint in self._endpoints if endpoint.is_measured]
+        if not rtts:
+            return 0
+        return sum(rtts) / len(rtts)
+
+    def failover(self):
+        candidates = [endpoint for endpoint in self._endpoints if endpoint is not self._current]
+        if not candidates:
+            return self._current
+        default_rtt = self._get_default_rtt()
+        endpoint = min(candidates, key=lambda endpoint: endpoint.get_score(default_rtt))
+        self.log.info('Failing over from %s to %s' % (self._current.url, endpoint.url))
+        self._current = endpoint
+        return endpoint
+
+    def get_best(self):
+        default_rtt = self._get_default_rtt()
+        return min(self._endpoints, key=lambda endpoint: endpoint.get_score(default_rtt))
+
+    def select(self):
+        endpoint = self.get_best()
+        if endpoint is not self._current:
+            self.log.info('Switching from %s to %s' % (self._current.url, endpoint.url))
+            self._current = endpoint
+        return endpoint
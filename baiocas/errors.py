@@ -36,6 +36,10 @@ class BatchError(BayeuxError):
     """Raised when batches are not started/stopped in the right order."""
 
 
+class CircuitOpenError(BayeuxError):
+    """Raised when a send is rejected because the circuit breaker is open."""
+
+
 class CommunicationError(BayeuxError):
     """Raised when a communication error occurs with a transport."""
 
@@ -55,6 +59,16 @@ class ConnectionStringError(BayeuxError):
         self.value = value
 
 
+class SchemaError(BayeuxError):
+    """Raised when message data does not match the schema of its channel."""
+
+    def __init__(self, path, reason):
+        message = 'Invalid data at "%s": %s' % (path, reason) if path else 'Invalid data: %s' % reason
+        super(SchemaError, self).__init__(message)
+        self.path = path
+        self.reason = reason
+
+
 class ServerError(BayeuxError):
     """Raised when a server responds with a non-successful status."""
 
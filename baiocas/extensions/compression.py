@@ -0,0 +1,223 @@
+import argparse
+import base64
+import binascii
+import collections
+import json
+import re
+import sys
+import zlib
+
+from baiocas import serialization
+from baiocas.extensions.base import Extension
+from baiocas.message import RawData
+
+DEFAULT_DICTIONARY_SIZE = 32768
+
+DEFAULT_MAX_LENGTH = 1048576
+
+# Tokens of compact JSON: strings (with the colon when used as a key), numbers
+# and literals, and structural characters
+TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*":?|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?|true|false|null|[{}\[\],]')
+
+
+def encode_data(data):
+    if isinstance(data, RawData):
+        return bytes(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=serialization.default).encode('utf8')
+
+
+def get_dictionary_id(dictionary):
+    return zlib.adler32(dictionary) if dictionary else 0
+
+
+def train_dictionary(samples, size=DEFAULT_DICTIONARY_SIZE, max_tokens=6):
+    """
+    Build a preset dictionary from sample payloads (JSON encodable values or
+    RawData).
+
+    Runs of up to max_tokens JSON tokens are scored by how many samples they
+    appear in times their length, and the best ones are kept until the
+    dictionary is full. The best ones go last since deflate can refer to the
+    end of the dictionary with the shortest distances.
+    """
+    counts = collections.Counter()
+    for sample in samples:
+        tokens = TOKEN_PATTERN.findall(encode_data(sample).decode('utf8'))
+        counts.update(set(
+            ''.join(tokens[start:start + length])
+            for length in range(1, max_tokens + 1)
+            for start in range(len(tokens) - length + 1)
+        ))
+    scored = sorted(
+        ((count * len(segment), segment) for segment, count in counts.items() if count > 1 and len(segment) > 3),
+        reverse=True
+    )
+    segments = []
+    used = 0
+    for _, segment in scored:
+        segment = segment.encode('utf8')
+        if used + len(segment) > size:
+            continue
+        if any(segment in other for other in segments):
+            continue
+        segments.append(segment)
+        used += len(segment)
+        if size - used < 4:
+            break
+    return b''.join(reversed(segments))
+
+
+class CompressionExtension(Extension):
+    """
+    Compresses the data of outgoing messages with raw deflate primed with a
+    preset dictionary and sends it base64 encoded, with the adler32 checksum
+    of the dictionary in the message ext. Peers need the same extension and
+    dictionary to get the data back.
+
+    Small JSON documents compress poorly on their own since there is nothing
+    to refer back to yet, which is what the dictionary is for. One can be
+    trained from recorded traffic with train_dictionary() or from the command
+    line (the capture has one JSON message or array of messages per line):
+
+        python -m baiocas.extensions.compression capture.jsonl -o payloads.zdict
+
+    Incoming data that inflates to more than max_length bytes is rejected so
+    that a peer can't send a decompression bomb (None turns the check off).
+    """
+
+    FIELD_COMPRESSION = 'compression'
+
+    def __init__(self, dictionary=None, level=6, threshold=0, dictionaries=None, max_length=DEFAULT_MAX_LENGTH):
+        super(CompressionExtension, self).__init__()
+        self._dictionary = dictionary or b''
+        self._dictionary_id = get_dictionary_id(self._dictionary)
+        self._level = level
+        self._threshold = threshold
+        self._max_length = max_length
+        self._compressor = None
+
+        # Older dictionaries can be kept around for decompressing messages
+        # from peers that haven't switched to the new one yet. Data
+        # compressed without a dictionary can always be decompressed.
+        self._dictionaries = {0: b'', self._dictionary_id: self._dictionary}
+        for other in dictionaries or []:
+            self._dictionaries[get_dictionary_id(other)] = other
+
+    @property
+    def dictionary(self):
+        return self._dictionary
+
+    @property
+    def dictionary_id(self):
+        return self._dictionary_id
+
+    def compress(self, data):
+
+        # Priming a compressor with a dictionary means hashing all of it, so
+        # it is done once and copies of the primed compressor are used
+        if self._compressor is None:
+            if self._dictionary:
+                self._compressor = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS,
+                                                    zdict=self._dictionary)
+            else:
+                self._compressor = zlib.compressobj(self._level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        compressor = self._compressor.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data, dictionary_id):
+        dictionary = self._dictionaries.get(dictionary_id)
+        if dictionary is None:
+            raise ValueError('Unknown compression dictionary %s' % dictionary_id)
+        if dictionary:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=dictionary)
+        else:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        if not self._max_length:
+            return decompressor.decompress(data) + decompressor.flush()
+
+        # Stop inflating as soon as the limit is passed rather than finding
+        # out after the whole payload has been expanded in memory
+        data = decompressor.decompress(data, self._max_length + 1)
+        if len(data) > self._max_length or decompressor.unconsumed_tail:
+            raise ValueError('Decompressed data is larger than %d bytes' % self._max_length)
+        data += decompressor.flush()
+        if len(data) > self._max_length:
+            raise ValueError('Decompressed data is larger than %d bytes' % self._max_length)
+        return data
+
+    def receive(self, message):
+        ext = message.ext
+        if not ext or self.FIELD_COMPRESSION not in ext:
+            return message
+        data = message.data
+        if isinstance(data, RawData):
+            data = data.decode()
+        try:
+            data = base64.b64decode(data)
+        except (TypeError, binascii.Error) as ex:
+            raise ValueError('Invalid compressed data: %s' % ex)
+        message.data = json.loads(self.decompress(data, ext.pop(self.FIELD_COMPRESSION)).decode('utf8'))
+        if not ext:
+            del message[message.FIELD_EXT]
+        return message
+
+    def send(self, message):
+        if message.data is None or message.channel is None or message.channel.is_meta:
+            return message
+
+        # Messages can go through the extensions again when they are resent
+        if self.FIELD_COMPRESSION in (message.ext or {}):
+            return message
+
+        # Only replace the data when compressing actually saves space once
+        # base64 encoded, which isn't a given for very small payloads
+        data = encode_data(message.data)
+        if len(data) < self._threshold:
+            return message
+        compressed = base64.b64encode(self.compress(data))
+        if len(compressed) >= len(data):
+            self.log.debug('Compressed data is no smaller (%d -> %d bytes), sending as is' % (
+                len(data), len(compressed)))
+            return message
+
+        # The data is replaced on a copy so that the original payload is left
+        # for failure listeners and for sending the message again
+        message = message.copy()
+        message.data = compressed.decode('ascii')
+        message.ext = dict(message.ext or {})
+        message.ext[self.FIELD_COMPRESSION] = self._dictionary_id
+        return message
+
+
+def read_samples(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        messages = json.loads(line)
+        if not isinstance(messages, list):
+            messages = [messages]
+        for message in messages:
+            channel = message.get('channel') or ''
+            if message.get('data') is not None and not channel.startswith('/meta/'):
+                yield message['data']
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Train a preset dictionary for CompressionExtension.')
+    parser.add_argument('capture', help='file with one JSON message (or array of messages) per line')
+    parser.add_argument('-o', '--output', required=True, help='file to write the dictionary to')
+    parser.add_argument('-s', '--size', type=int, default=DEFAULT_DICTIONARY_SIZE, help='maximum dictionary size')
+    options = parser.parse_args(args)
+    with open(options.capture, encoding='utf8') as capture:
+        samples = list(read_samples(capture))
+    dictionary = train_dictionary(samples, size=options.size)
+    with open(options.output, 'wb') as output:
+        output.write(dictionary)
+    sys.stdout.write('Trained a %d byte dictionary (id %d) from %d samples\n' % (
+        len(dictionary), get_dictionary_id(dictionary), len(samples)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
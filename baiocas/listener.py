@@ -1,4 +1,4 @@
 from collections import namedtuple
 
 
-Listener = namedtuple('Listener', 'id function extra_args extra_kwargs')
+Listener = namedtuple('Listener', 'id function extra_args extra_kwargs raw', defaults=(False,))
@@ -1,8 +1,87 @@
-from json import dumps
+import re
+from json import JSONEncoder
 from json import loads
+from sys import intern
 
+from baiocas import serialization
 from baiocas.channel_id import ChannelId
 
+# Reused for every message instead of building a new encoder for each call.
+# Types JSON doesn't support go through the serialization fallback.
+_encoder = JSONEncoder(ensure_ascii=False, default=serialization.default)
+
+# Encoders for other fallbacks passed to Message.to_json
+_encoders = {}
+
+
+def _get_encoder(default):
+    if default is None:
+        return _encoder
+    encoder = _encoders.get(default)
+    if encoder is None:
+        if len(_encoders) >= 16:
+            _encoders.clear()
+        encoder = _encoders[default] = JSONEncoder(ensure_ascii=False, default=default)
+    return encoder
+
+
+def _intern_pairs(pairs):
+    return dict([(intern(key), value) for key, value in pairs])
+
+
+class RawData(object):
+    """
+    Message data that is already encoded as JSON.
+
+    Raw data is spliced into outgoing messages as is instead of being encoded
+    again. Raw subscriptions receive incoming data in this form, encoded once
+    per message, so that it can be passed on with Channel.publish_raw(). The
+    text is not validated. The decoded value is only computed when asked for.
+    """
+
+    __slots__ = ('value', '_decoded')
+
+    FALSE_PATTERN = re.compile(r'\s*(?:\{\s*\}|\[\s*\]|""|null|false|-?0(?:\.0*)?(?:[eE][-+]?\d+)?)\s*$')
+
+    _UNDECODED = object()
+
+    def __init__(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            value = bytes(value).decode('utf8')
+        self.value = value
+        self._decoded = self._UNDECODED
+
+    def __bool__(self):
+        return not self.FALSE_PATTERN.match(self.value)
+
+    def __bytes__(self):
+        return self.value.encode('utf8')
+
+    def __eq__(self, other):
+        return isinstance(other, RawData) and other.value == self.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.value)
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def encode(cls, value):
+        if isinstance(value, cls):
+            return value
+        raw_data = cls(_encoder.encode(value))
+        raw_data._decoded = value
+        return raw_data
+
+    def decode(self):
+        if self._decoded is self._UNDECODED:
+            self._decoded = loads(self.value)
+        return self._decoded
+
 
 class Message(dict):
     """
@@ -50,6 +129,11 @@ class Message(dict):
 
     RECONNECT_RETRY = 'retry'
 
+    # Channel IDs shared between decoded messages when interning
+    MAXIMUM_CACHED_CHANNEL_IDS = 1024
+
+    _channel_ids = {}
+
     def __init__(self, *args, **kwargs):
         for arg in [_f for _f in args if _f]:
             self.update(arg)
@@ -79,6 +163,28 @@ class Message(dict):
     def failure(self):
         return not self.successful
 
+    @classmethod
+    def _dump(cls, message, encoder=_encoder):
+        if not isinstance(message, dict) or not isinstance(message.get(cls.FIELD_DATA), RawData):
+            return encoder.encode(message)
+        return '{%s}' % ', '.join('%s: %s' % (encoder.encode(key), cls._dump_data(value, encoder))
+                                  for key, value in message.items())
+
+    @staticmethod
+    def _dump_data(data, encoder=_encoder):
+        if isinstance(data, RawData):
+            return data.value
+        return encoder.encode(data)
+
+    @classmethod
+    def _get_channel_id(cls, value):
+        channel_id = cls._channel_ids.get(value)
+        if channel_id is None:
+            if len(cls._channel_ids) >= cls.MAXIMUM_CACHED_CHANNEL_IDS:
+                cls._channel_ids.clear()
+            channel_id = cls._channel_ids[value] = ChannelId.convert(value)
+        return channel_id
+
     def _get_key_from_name(self, name):
         return getattr(self.__class__, 'FIELD_' + name.upper(), None)
 
@@ -103,19 +209,56 @@ class Message(dict):
         return Message(value)
 
     @classmethod
-    def from_json(cls, value, encoding=None):
+    def from_json(cls, value, encoding=None, intern_keys=False):
         if encoding is not None:
             value = value.decode(encoding, 'replace')
-        messages = loads(value)
+
+        # The JSON decoder only shares the strings of repeated keys within a
+        # single document. When interning, keys are shared across documents
+        # (and so across responses), as are the channel IDs of the messages,
+        # which matters when holding on to lots of decoded messages.
+        if intern_keys:
+            messages = loads(value, object_pairs_hook=_intern_pairs)
+        else:
+            messages = loads(value)
         if not isinstance(messages, (list, tuple)):
             messages = [messages]
+        if intern_keys:
+            for message in messages:
+                if isinstance(message, dict) and isinstance(message.get(cls.FIELD_CHANNEL), str):
+                    message[cls.FIELD_CHANNEL] = cls._get_channel_id(message[cls.FIELD_CHANNEL])
         return list(map(cls.from_dict, messages))
 
     @classmethod
-    def to_json(cls, messages, encoding=None):
+    def iter_json(cls, messages, encoding=None, default=None):
+        if not isinstance(messages, (list, tuple)):
+            messages = [messages]
+        encoder = _get_encoder(default)
+        separator = '['
+        for message in messages:
+            value = separator + cls._dump(message, encoder)
+            if encoding is not None:
+                value = value.encode(encoding)
+            yield value
+            separator = ', '
+        value = '[]' if separator == '[' else ']'
+        if encoding is not None:
+            value = value.encode(encoding)
+        yield value
+
+    @classmethod
+    def to_json(cls, messages, encoding=None, default=None):
         if not isinstance(messages, (list, tuple)):
             messages = [messages]
-        value = dumps(messages, ensure_ascii=False)
+        encoder = _get_encoder(default)
+
+        # Raw data is spliced in as is, which means encoding each message on
+        # its own. Anything else is cheaper to encode in a single pass.
+        if any(isinstance(message.get(cls.FIELD_DATA), RawData) for message in messages
+               if isinstance(message, dict)):
+            value = '[%s]' % ', '.join(cls._dump(message, encoder) for message in messages)
+        else:
+            value = encoder.encode(messages)
         if encoding is not None:
             value = value.encode(encoding)
         return value
@@ -0,0 +1,153 @@
+import logging
+
+from baiocas.channel_id import ChannelId
+
+
+class SubscriptionPlanner(object):
+    """
+    Decides which subscriptions the server should hold for the channels the
+    application subscribed to.
+
+    Once at least ``threshold`` sibling channels (e.g. ``/prices/AAPL`` and
+    ``/prices/MSFT``) are subscribed, they are replaced by a single wildcard
+    subscription on their parent (``/prices/*``) and messages for unsubscribed
+    siblings are filtered on the client. The wildcard is split back into the
+    individual channels once fewer than ``threshold * ratio`` siblings remain.
+    """
+
+    def __init__(self, threshold=100, ratio=0.5):
+        if threshold < 1:
+            raise ValueError('Threshold must be at least 1')
+        if not 0 <= ratio <= 1:
+            raise ValueError('Ratio must be between 0 and 1')
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self._threshold = threshold
+        self._ratio = ratio
+        self._subscribed = {}
+        self._siblings = {}
+        self._collapsed = {}
+
+    @property
+    def collapsed(self):
+        return [self._get_wildcard(prefix) for prefix in self._collapsed]
+
+    @property
+    def ratio(self):
+        return self._ratio
+
+    @property
+    def threshold(self):
+        return self._threshold
+
+    def _get_prefix(self, channel_id):
+        return channel_id.rsplit('/', 1)[0]
+
+    def _get_wildcard(self, prefix):
+        return ChannelId(prefix + '/' + ChannelId.WILD)
+
+    def _is_collapsible(self, channel_id):
+        return not (channel_id.is_meta or channel_id.is_wild or channel_id.is_wild_deep)
+
+    def get_server_subscriptions(self):
+        channel_ids = []
+        for channel_id in self._subscribed:
+            if self._is_collapsible(channel_id) and self._get_prefix(channel_id) in self._collapsed:
+                continue
+            channel_ids.append(channel_id)
+        for prefix in self._collapsed:
+            wildcard = self._get_wildcard(prefix)
+            if wildcard not in self._subscribed:
+                channel_ids.append(wildcard)
+        return channel_ids
+
+    def is_wanted(self, channel_id):
+        if not self._collapsed or channel_id in self._subscribed:
+            return True
+        channel_id = ChannelId.convert(channel_id)
+        if self._get_prefix(channel_id) not in self._collapsed:
+            return True
+        for wild in channel_id.get_wilds():
+            if wild in self._subscribed:
+                return True
+        return False
+
+    def reset(self):
+        self.log.debug('Resetting subscription plan')
+        self._subscribed = {}
+        self._siblings = {}
+        self._collapsed = {}
+
+    def subscribe(self, channel_ids):
+
+        # Record the new subscriptions, holding back those already covered by
+        # a wildcard subscription
+        to_subscribe = []
+        added = {}
+        for channel_id in map(ChannelId.convert, channel_ids):
+            if channel_id in self._subscribed:
+                continue
+            self._subscribed[channel_id] = True
+            if not self._is_collapsible(channel_id):
+                if not (channel_id.is_wild and self._get_prefix(channel_id) in self._collapsed):
+                    to_subscribe.append(channel_id)
+                continue
+            prefix = self._get_prefix(channel_id)
+            self._siblings.setdefault(prefix, {})[channel_id] = True
+            if prefix not in self._collapsed:
+                to_subscribe.append(channel_id)
+                added.setdefault(prefix, {})[channel_id] = True
+
+        # Collapse the prefixes that reached the threshold. The wildcard is
+        # subscribed before the siblings are unsubscribed so that no messages
+        # are missed in between.
+        to_unsubscribe = []
+        for prefix, new_channel_ids in added.items():
+            siblings = self._siblings[prefix]
+            if len(siblings) < self._threshold:
+                continue
+            wildcard = self._get_wildcard(prefix)
+            self.log.info('Collapsing %d subscriptions into %s' % (len(siblings), wildcard))
+            self._collapsed[prefix] = True
+            to_subscribe = [channel_id for channel_id in to_subscribe if channel_id not in new_channel_ids]
+            if wildcard not in self._subscribed:
+                to_subscribe.append(wildcard)
+            to_unsubscribe.extend(channel_id for channel_id in siblings if channel_id not in new_channel_ids)
+        return to_subscribe, to_unsubscribe
+
+    def unsubscribe(self, channel_ids):
+
+        # Forget the subscriptions, only passing on those not covered by a
+        # wildcard subscription
+        to_unsubscribe = []
+        removed = {}
+        for channel_id in map(ChannelId.convert, channel_ids):
+            if channel_id not in self._subscribed:
+                continue
+            del self._subscribed[channel_id]
+            if not self._is_collapsible(channel_id):
+                if not (channel_id.is_wild and self._get_prefix(channel_id) in self._collapsed):
+                    to_unsubscribe.append(channel_id)
+                continue
+            prefix = self._get_prefix(channel_id)
+            self._siblings[prefix].pop(channel_id, None)
+            if prefix in self._collapsed:
+                removed[prefix] = True
+            else:
+                to_unsubscribe.append(channel_id)
+            if not self._siblings[prefix]:
+                del self._siblings[prefix]
+
+        # Split the prefixes that dropped below the threshold, subscribing
+        # the remaining siblings before dropping the wildcard
+        to_subscribe = []
+        for prefix in removed:
+            siblings = self._siblings.get(prefix, {})
+            if siblings and len(siblings) >= self._threshold * self._ratio:
+                continue
+            wildcard = self._get_wildcard(prefix)
+            self.log.info('Splitting %s into %d subscriptions' % (wildcard, len(siblings)))
+            del self._collapsed[prefix]
+            to_subscribe.extend(siblings)
+            if wildcard not in self._subscribed:
+                to_unsubscribe.append(wildcard)
+        return to_subscribe, to_unsubscribe
@@ -0,0 +1,168 @@
+import logging
+import zlib
+from contextlib import contextmanager
+from contextlib import ExitStack
+
+from baiocas.channel_id import ChannelId
+from baiocas.client import Client
+from baiocas.schema import compile_schema
+
+
+class ClientPool(object):
+    """
+    Runs several independent Bayeux sessions against the same server.
+
+    Each channel is assigned to one session by hashing its ID, so publishes to
+    a channel always go through the same session and stay in order, and
+    subscriptions are partitioned across the sessions. All the sessions share
+    the IO loop, so the listeners of every session are dispatched from the
+    same thread as if there was a single client. Meta channel listeners and
+    event listeners, as well as payload schemas, decoders, extensions and
+    publish limits, are registered with every session.
+
+    Unless a client factory is given, the sessions share an HTTP client
+    context of their own, with room for a held connect and another request
+    in flight per session.
+    """
+
+    CONNECTIONS_PER_SESSION = 2
+
+    def __init__(self, url, size=2, client_factory=None, **options):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        if size < 1:
+            raise ValueError('Pool size must be at least 1')
+        self._http_context = None
+        if client_factory is None:
+            from baiocas.transports.context import HttpClientContext
+            self._http_context = HttpClientContext(max_clients=size * self.CONNECTIONS_PER_SESSION)
+            client_factory = self._create_client
+        self._clients = [client_factory(url, **options) for _ in range(size)]
+
+    def __iter__(self):
+        return iter(self._clients)
+
+    def __len__(self):
+        return len(self._clients)
+
+    @property
+    def clients(self):
+        return self._clients[:]
+
+    @property
+    def http_context(self):
+        return self._http_context
+
+    def _create_client(self, url, **options):
+
+        # The transport is only imported once a client needs it, as in
+        # get_client
+        from baiocas.transports.long_polling import LongPollingHttpTransport
+        client = Client(url, **options)
+        client.register_transport(LongPollingHttpTransport(http_context=self._http_context))
+        return client
+
+    def add_listener(self, channel_id, function, *extra_args, **extra_kwargs):
+        return [client.get_channel(channel_id).add_listener(function, *extra_args, **extra_kwargs)
+                for client in self._clients]
+
+    @contextmanager
+    def batch(self):
+        with ExitStack() as stack:
+            for client in self._clients:
+                stack.enter_context(client.batch())
+            yield
+
+    def configure(self, **options):
+        for client in self._clients:
+            client.configure(**options)
+
+    def disconnect(self, properties=None, sync=True):
+        self.log.debug('Disconnecting %d sessions' % len(self._clients))
+        for client in self._clients:
+            client.disconnect(properties=properties, sync=sync)
+
+    def get_channel(self, channel_id):
+        return self.get_client(channel_id).get_channel(channel_id)
+
+    def get_client(self, channel_id):
+        channel_id = ChannelId.convert(channel_id)
+        index = zlib.crc32(channel_id.encode('utf8')) % len(self._clients)
+        return self._clients[index]
+
+    def handshake(self, properties=None):
+        self.log.debug('Starting handshake for %d sessions' % len(self._clients))
+        for client in self._clients:
+            client.handshake(properties=properties)
+
+    def publish(self, channel_id, data, properties=None):
+        self.get_channel(channel_id).publish(data, properties=properties)
+
+    def register_decoder(self, channel_id, decoder):
+        return [client.register_decoder(channel_id, decoder) for client in self._clients]
+
+    def register_extension(self, extension_factory, *args, **kwargs):
+
+        # Extensions keep the state of the session they are registered with,
+        # so each session gets its own
+        extensions = []
+        for client in self._clients:
+            extension = extension_factory(*args, **kwargs)
+            client.register_extension(extension)
+            extensions.append(extension)
+        return extensions
+
+    def register_listener(self, event, function, *extra_args, **extra_kwargs):
+        return [client.register_listener(event, function, *extra_args, **extra_kwargs)
+                for client in self._clients]
+
+    def register_publish_limit(self, channel_id, limiter, coalesce=False, key=None):
+
+        # The limiter is shared, so the limit holds across all the sessions
+        for client in self._clients:
+            client.register_publish_limit(channel_id, limiter, coalesce=coalesce, key=key)
+
+    def register_schema(self, channel_id, schema, name=None):
+
+        # Wildcard channels span sessions, so schemas go to all of them
+        schema = compile_schema(schema, name=name)
+        for client in self._clients:
+            client.register_schema(channel_id, schema)
+        return schema
+
+    def remove_listener(self, channel_id, ids=None, function=None):
+        results = []
+        for index, client in enumerate(self._clients):
+            results.append(client.get_channel(channel_id).remove_listener(
+                id=ids[index] if ids else None,
+                function=function
+            ))
+        return any(results)
+
+    def subscribe(self, channel_id, function, *extra_args, **extra_kwargs):
+        return self.get_channel(channel_id).subscribe(function, *extra_args, **extra_kwargs)
+
+    def unregister_decoder(self, channel_id):
+        return any([client.unregister_decoder(channel_id) for client in self._clients])
+
+    def unregister_extension(self, extensions):
+        return any([client.unregister_extension(extension)
+                    for client, extension in zip(self._clients, extensions)])
+
+    def unregister_listener(self, ids=None, event=None, function=None):
+        results = []
+        for index, client in enumerate(self._clients):
+            results.append(client.unregister_listener(
+                id=ids[index] if ids else None,
+                event=event,
+                function=function
+            ))
+        return any(results)
+
+    def unregister_publish_limit(self, channel_id):
+        return any([client.unregister_publish_limit(channel_id) for client in self._clients])
+
+    def unregister_schema(self, channel_id):
+        return any([client.unregister_schema(channel_id) for client in self._clients])
+
+    def unsubscribe(self, channel_id, id=None, function=None, properties=None):
+        return self.get_channel(channel_id).unsubscribe(id=id, function=function, properties=properties)
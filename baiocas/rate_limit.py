@@ -0,0 +1,220 @@
+import collections
+import itertools
+import threading
+import time
+
+from baiocas.util import find_channel_entry
+from baiocas.util import get_key
+
+# Limit on the publishes to a channel: the bucket and how to coalesce the
+# publishes held back
+PublishLimit = collections.namedtuple('PublishLimit', 'limiter coalesce key')
+
+
+class TokenBucket(object):
+    """
+    Token bucket rate limiter, implemented with the generic cell rate
+    algorithm so that only a timestamp needs to be kept.
+
+    Besides checking for a token right away with consume(), callers can
+    reserve() the next token and get back the time they need to wait for it,
+    which spreads a burst of simultaneous callers evenly instead of letting
+    them retry in lockstep. Callers with an action already scheduled in the
+    future add that delay on top of the wait, so that one caller's delay has
+    no effect on the others. Instances are thread safe so a single bucket can
+    be shared process-wide.
+    """
+
+    def __init__(self, rate, burst=1, clock=None):
+        self._lock = threading.Lock()
+        self._clock = clock or time.monotonic
+        self._arrival_time = None
+        self.configure(rate, burst)
+
+    def __repr__(self):
+        return '%s(rate=%s, burst=%s)' % (self.__class__.__name__, self._rate, self._burst)
+
+    @property
+    def burst(self):
+        return self._burst
+
+    @property
+    def rate(self):
+        return self._rate
+
+    def _get_wait(self, now):
+        arrival_time = max(self._arrival_time if self._arrival_time is not None else now, now)
+        return arrival_time, max(0.0, arrival_time - self._tolerance - now)
+
+    def configure(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+        if burst < 1:
+            raise ValueError('Burst must be at least 1')
+        with self._lock:
+            self._rate = rate
+            self._burst = burst
+            self._interval = 1.0 / rate
+            self._tolerance = (burst - 1) * self._interval
+
+    def consume(self):
+        with self._lock:
+            now = self._clock()
+            arrival_time, wait = self._get_wait(now)
+            if wait > 0:
+                return False
+            self._arrival_time = arrival_time + self._interval
+            return True
+
+    def get_wait(self):
+        with self._lock:
+            return self._get_wait(self._clock())[1]
+
+    def reserve(self):
+        with self._lock:
+            arrival_time, wait = self._get_wait(self._clock())
+            self._arrival_time = arrival_time + self._interval
+            return wait
+
+
+class PublishThrottle(object):
+    """
+    Holds back outgoing publishes that go over their rate limits until they
+    can be sent.
+
+    Limits are token buckets registered per channel (wildcards allowed) plus
+    an optional bucket for all the publishes of a client. Publishes that have
+    to wait are queued in order, and once anything is queued for a channel
+    (or anything at all with an overall limit), later publishes queue up
+    behind it so that they still go out in order. When a limit coalesces,
+    a publish replaces the queued one with the same key (its channel, plus
+    the value at the key path in its data if there is one), keeping its
+    place in the queue, so that only the latest value goes out. Publishes
+    with a key value that can't be hashed (e.g. a dict) are never coalesced.
+    """
+
+    def __init__(self):
+        self._limits = {}
+        self._limit_cache = {}
+        self._queue = collections.OrderedDict()
+        self._channels = collections.Counter()
+        self._sequence = itertools.count()
+        self._coalesced = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    @property
+    def coalesced(self):
+        return self._coalesced
+
+    def _get_wait(self, limit, limiter):
+        wait = limit.limiter.get_wait() if limit is not None else 0.0
+        if limiter is not None:
+            wait = max(wait, limiter.get_wait())
+        return wait
+
+    def _hold(self, message, limit):
+        key = None
+        if limit is not None and limit.coalesce:
+            key = get_key(message.channel, message.data, limit.key)
+            if key in self._queue:
+                self._coalesced += 1
+                self._queue[key] = message
+                return
+        if key is None:
+            key = next(self._sequence)
+        self._queue[key] = message
+        self._channels[message.channel] += 1
+
+    def _release(self, key, limit, limiter):
+        message = self._queue.pop(key)
+        self._channels[message.channel] -= 1
+        if not self._channels[message.channel]:
+            del self._channels[message.channel]
+        self._take(limit, limiter)
+        return message
+
+    def _take(self, limit, limiter):
+        if limit is not None:
+            limit.limiter.consume()
+        if limiter is not None:
+            limiter.consume()
+
+    def add_limit(self, channel_id, limiter, coalesce=False, key=None):
+        self._limits[channel_id] = PublishLimit(limiter, coalesce, key.split('.') if isinstance(key, str) else key)
+        self._limit_cache.clear()
+
+    def admit(self, messages, limiter=None):
+        """
+        Split messages about to be sent into the ones that can go now and the
+        ones that have to wait, which are queued. Returns the ones to send and
+        how long (in seconds) until the queue can be drained, or None if
+        nothing is queued.
+        """
+        if not self._limits and limiter is None and not self._queue:
+            return messages, None
+        admitted = []
+        for message in messages:
+            channel_id = message.channel
+            if channel_id is None or channel_id.is_meta:
+                admitted.append(message)
+                continue
+            limit = find_channel_entry(self._limits, self._limit_cache, channel_id)
+            if limit is None and limiter is None:
+                admitted.append(message)
+            elif channel_id in self._channels or (limiter is not None and self._queue) or \
+                    self._get_wait(limit, limiter) > 0:
+                self._hold(message, limit)
+            else:
+                self._take(limit, limiter)
+                admitted.append(message)
+        return admitted, self.get_wait(limiter)
+
+    def clear(self):
+        messages = list(self._queue.values())
+        self._queue.clear()
+        self._channels.clear()
+        return messages
+
+    def drain(self, limiter=None):
+        """
+        Take the queued messages that can now be sent, in order. A channel
+        that still has to wait holds back its later messages but not those of
+        other channels, unless the overall limit is the one to wait for.
+        Returns the messages to send and how long (in seconds) until the next
+        drain, or None if the queue is empty.
+        """
+        released = []
+        blocked = set()
+        for key, message in list(self._queue.items()):
+            if message.channel in blocked:
+                continue
+            limit = find_channel_entry(self._limits, self._limit_cache, message.channel)
+            if limiter is not None and limiter.get_wait() > 0:
+                break
+            if limit is not None and limit.limiter.get_wait() > 0:
+                blocked.add(message.channel)
+                continue
+            released.append(self._release(key, limit, limiter))
+        return released, self.get_wait(limiter)
+
+    def get_wait(self, limiter=None):
+        if not self._queue:
+            return None
+        if limiter is not None and limiter.get_wait() > 0:
+            return limiter.get_wait()
+        waits = [self._get_wait(find_channel_entry(self._limits, self._limit_cache, channel_id), None)
+                 for channel_id in self._channels]
+        return min(waits) if waits else 0.0
+
+    def remove_limit(self, channel_id):
+        if self._limits.pop(channel_id, None) is None:
+            return False
+        self._limit_cache.clear()
+        return True
+
+
+# Limiter shared by every client in the process for automatic re-handshakes,
+# unless their handshake_limiter option is set to another limiter or to None.
+HANDSHAKE_LIMITER = TokenBucket(rate=20, burst=20)
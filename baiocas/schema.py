@@ -0,0 +1,283 @@
+import copy
+import dataclasses
+import keyword
+import typing
+
+from baiocas import errors
+
+# Type checks done inline in the generated converters. Anything else goes
+# through a converter function of its own.
+_INLINE_CHECKS = {
+    bool: 'if {value} is not True and {value} is not False:\n'
+          '    raise _invalid({path}, "expected bool", {value})',
+    dict: 'if type({value}) is not dict:\n'
+          '    raise _invalid({path}, "expected object", {value})',
+    float: 'if type({value}) is not float:\n'
+           '    if type({value}) is not int:\n'
+           '        raise _invalid({path}, "expected float", {value})\n'
+           '    {value} = float({value})',
+    int: 'if type({value}) is not int:\n'
+         '    raise _invalid({path}, "expected int", {value})',
+    list: 'if type({value}) is not list:\n'
+          '    raise _invalid({path}, "expected array", {value})',
+    str: 'if type({value}) is not str:\n'
+         '    raise _invalid({path}, "expected str", {value})'
+}
+
+# Defaults of these types can be shared between instances, others are copied
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, tuple, frozenset)
+
+_MISSING = object()
+
+
+def _invalid(path, reason, value):
+    return errors.SchemaError(path, '%s, got %s' % (reason, type(value).__name__))
+
+
+def _join(path, name):
+    return '%s.%s' % (path, name) if path else name
+
+
+class SchemaObject(object):
+    """Base class of the __slots__ classes created for field spec schemas."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        unknown = set(values) - set(self.__slots__)
+        if unknown:
+            raise TypeError('Unknown fields for %s: %s' % (self.__class__.__name__, ', '.join(sorted(unknown))))
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+    def __eq__(self, other):
+        return type(other) is type(self) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name in self.__slots__
+        ))
+
+    def to_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class Schema(object):
+    """
+    A compiled payload schema. Calling it converts decoded message data into
+    an instance of its type, raising SchemaError if the data doesn't match.
+    """
+
+    def __init__(self, name, type, fields):
+        self.name = name
+        self.type = type
+        self.fields = fields
+        self.convert = None
+        self.source = None
+
+    def __call__(self, data):
+        return self.convert(data, '')
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, self.name)
+
+
+def _compile_type(field_type, namespace, schemas):
+
+    # Returns the code checking and converting a value of the given type
+    # (with {value} and {path} placeholders), adding whatever it needs to the
+    # namespace of the generated function
+    if isinstance(field_type, dict):
+        converter_name = '_convert_%d' % len(namespace)
+        namespace[converter_name] = _compile_converter(field_type, namespace, schemas)
+        return '{value} = %s({value}, {path})' % converter_name
+    if field_type in (typing.Any, object):
+        return ''
+    if field_type in _INLINE_CHECKS:
+        return _INLINE_CHECKS[field_type]
+    origin = typing.get_origin(field_type)
+    args = typing.get_args(field_type)
+    if origin is typing.Union and len(args) == 2 and type(None) in args:
+        other_type = args[0] if args[1] is type(None) else args[1]
+        check = _compile_type(other_type, namespace, schemas)
+        if not check:
+            return ''
+        return 'if {value} is not None:\n' + '\n'.join('    ' + line for line in check.split('\n'))
+    if origin in (list, dict) or dataclasses.is_dataclass(field_type):
+        converter_name = '_convert_%d' % len(namespace)
+        namespace[converter_name] = _compile_converter(field_type, namespace, schemas)
+        return '{value} = %s({value}, {path})' % converter_name
+    if isinstance(field_type, type) and origin is None:
+        type_name = '_type_%d' % len(namespace)
+        namespace[type_name] = field_type
+        return 'if not isinstance({value}, %s):\n' \
+            '    raise _invalid({path}, "expected %s", {value})' % (type_name, field_type.__name__)
+    raise TypeError('Unsupported schema type: %r' % (field_type,))
+
+
+def _compile_converter(field_type, namespace, schemas):
+    origin = None if isinstance(field_type, dict) else typing.get_origin(field_type)
+    args = typing.get_args(field_type)
+
+    # Nested schemas are looked up when called so that schemas can refer to
+    # themselves
+    if origin is None:
+        schema = compile_schema(field_type, _schemas=schemas)
+        return lambda value, path: schema.convert(value, path)
+
+    # Containers check their items with a converter of their own
+    item_type = args[-1] if args else typing.Any
+    item_namespace = {'_invalid': _invalid, '_join': _join}
+    check = _compile_type(item_type, item_namespace, schemas)
+    if origin is list:
+        lines = [
+            'def convert(value, path):',
+            '    if type(value) is not list:',
+            '        raise _invalid(path, "expected array", value)',
+        ]
+        if check:
+            lines.append('    result = []')
+            lines.append('    for index, item in enumerate(value):')
+            lines.extend('        ' + line for line in check.format(
+                value='item', path='"%s[%d]" % (path, index)').split('\n'))
+            lines.append('        result.append(item)')
+            lines.append('    return result')
+        else:
+            lines.append('    return value')
+    else:
+        lines = [
+            'def convert(value, path):',
+            '    if type(value) is not dict:',
+            '        raise _invalid(path, "expected object", value)',
+        ]
+        if check:
+            lines.append('    result = {}')
+            lines.append('    for key, item in value.items():')
+            lines.extend('        ' + line for line in check.format(value='item', path='_join(path, key)').split('\n'))
+            lines.append('        result[key] = item')
+            lines.append('    return result')
+        else:
+            lines.append('    return value')
+    exec('\n'.join(lines), item_namespace)
+    return item_namespace['convert']
+
+
+def _get_fields(spec):
+    if dataclasses.is_dataclass(spec):
+        hints = typing.get_type_hints(spec)
+        fields = []
+        for field in dataclasses.fields(spec):
+            if not field.init:
+                continue
+            has_default = field.default is not dataclasses.MISSING or \
+                field.default_factory is not dataclasses.MISSING
+            fields.append((field.name, hints.get(field.name, typing.Any), _MISSING if not has_default else None))
+        return fields
+    fields = []
+    for name, field_type in spec.items():
+
+        # Fields become attributes of the generated class
+        if not isinstance(name, str) or not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError('Field names must be identifiers that are not keywords, got %r' % (name,))
+        default = _MISSING
+        if isinstance(field_type, tuple):
+            field_type, default = field_type
+        fields.append((name, field_type, default))
+    return fields
+
+
+def compile_schema(spec, name=None, _schemas=None):
+    """
+    Compile a payload schema from a dataclass or a field spec.
+
+    A field spec maps field names (which must be identifiers and not Python
+    keywords) to types, or to (type, default) tuples for optional fields, and
+    gives instances of a generated __slots__ class. Mutable defaults are
+    copied for each instance.
+    Supported types are bool, int, float (ints are converted), str, list,
+    dict, typing.Any, Optional, List and Dict of those, nested field specs and
+    dataclasses. Other classes are checked with isinstance, for data that
+    went through a decoder first (see baiocas.serialization.FieldDecoder).
+    The converter checking the fields is generated once when compiling so
+    converting a payload runs straight-line code. Unknown fields in the data
+    are ignored.
+    """
+    if isinstance(spec, Schema):
+        return spec
+    is_dataclass = dataclasses.is_dataclass(spec) and isinstance(spec, type)
+    if not is_dataclass and not isinstance(spec, dict):
+        raise TypeError('Expected a dataclass or a field spec, got %r' % (spec,))
+
+    # Schemas of dataclasses are shared so that nested and recursive types
+    # only get compiled once
+    schemas = {} if _schemas is None else _schemas
+    if is_dataclass and spec in schemas:
+        return schemas[spec]
+    fields = _get_fields(spec)
+    if is_dataclass:
+        schema_type = spec
+        schema = Schema(name or spec.__name__, spec, [field[0] for field in fields])
+        schemas[spec] = schema
+    else:
+        schema_type = type(name or 'Payload', (SchemaObject,), {'__slots__': tuple(field[0] for field in fields)})
+        schema = Schema(schema_type.__name__, schema_type, [field[0] for field in fields])
+
+    # Generate the converter, one block per field
+    namespace = {
+        '_copy': copy.deepcopy,
+        '_invalid': _invalid,
+        '_join': _join,
+        '_new': object.__new__,
+        '_type': schema_type,
+        'SchemaError': errors.SchemaError
+    }
+    lines = [
+        'def convert(data, path):',
+        '    if type(data) is not dict:',
+        '        raise _invalid(path, "expected object", data)',
+        '    kwargs = {}' if is_dataclass else '    result = _new(_type)'
+    ]
+    for index, (field_name, field_type, default) in enumerate(fields):
+        path = '_join(path, %r)' % field_name
+        lines.append('    value = data.get(%r, _missing)' % field_name)
+        lines.append('    if value is _missing:')
+        if default is _MISSING:
+            lines.append('        raise SchemaError(%s, "missing field")' % path)
+        elif is_dataclass:
+            lines.append('        pass')
+        else:
+            namespace['_default_%d' % index] = default
+            if isinstance(default, _IMMUTABLE_TYPES):
+                lines.append('        result.%s = _default_%d' % (field_name, index))
+            else:
+                lines.append('        result.%s = _copy(_default_%d)' % (field_name, index))
+        lines.append('    else:')
+        check = _compile_type(field_type, namespace, schemas)
+        if check:
+            lines.extend('        ' + line for line in check.format(value='value', path=path).split('\n'))
+        if is_dataclass:
+            lines.append('        kwargs[%r] = value' % field_name)
+        else:
+            lines.append('        result.%s = value' % field_name)
+    if is_dataclass:
+
+        # Errors from the dataclass itself (e.g. a check in __post_init__)
+        # are reported like any other invalid data
+        lines.extend([
+            '    try:',
+            '        return _type(**kwargs)',
+            '    except Exception as ex:',
+            '        raise SchemaError(path, "%s: %s" % (ex.__class__.__name__, ex)) from ex'
+        ])
+    else:
+        lines.append('    return result')
+    namespace['_missing'] = _MISSING
+    schema.source = '\n'.join(lines)
+    exec(schema.source, namespace)
+    schema.convert = namespace['convert']
+    return schema
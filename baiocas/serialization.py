@@ -0,0 +1,199 @@
+"""
+Encoding of the common non-JSON types found in message data, and the hooks to
+decode them back.
+
+The encoder used for messages falls back to :func:`default` for values the
+JSON module doesn't support, so NumPy arrays and scalars, bytes, dates and
+times and decimals can be published without converting them first:
+
+* NumPy arrays become nested lists (in a single ``tolist`` call), or with
+  :data:`ARRAY_BASE64` an object with the dtype, shape and base64 encoded
+  buffer, which is much smaller and faster for large numeric arrays
+* bytes become base64 strings
+* dates and times become ISO 8601 strings
+* decimals become strings, so that no precision is lost
+* objects decoded with a schema (see baiocas.schema) become objects again,
+  as do other dataclasses
+
+Incoming data is only ever plain JSON. A :class:`FieldDecoder` registered for
+a channel (see Client.register_decoder) turns fields back into richer types.
+"""
+import array
+import base64
+import binascii
+import dataclasses
+import datetime
+import decimal
+import sys
+
+from baiocas import errors
+from baiocas.schema import SchemaObject
+from baiocas.util import get_numpy
+
+ARRAY_BASE64 = 'base64'
+
+ARRAY_LIST = 'list'
+
+# Keys of the object a base64 encoded array is sent as
+FIELD_DTYPE = 'dtype'
+
+FIELD_SHAPE = 'shape'
+
+FIELD_BUFFER = 'buffer'
+
+# array.array type codes for NumPy dtypes, when decoding without NumPy
+TYPECODES = {
+    'int8': 'b',
+    'uint8': 'B',
+    'int16': 'h',
+    'uint16': 'H',
+    'int32': 'i',
+    'uint32': 'I',
+    'int64': 'q',
+    'uint64': 'Q',
+    'float32': 'f',
+    'float64': 'd'
+}
+
+
+def _encode_array_buffer(numpy, value):
+
+    # Arrays are sent little-endian and C-contiguous whatever their layout
+    if value.dtype.byteorder == '>' or (value.dtype.byteorder == '=' and sys.byteorder == 'big'):
+        value = value.astype(value.dtype.newbyteorder('<'))
+    return {
+        FIELD_DTYPE: value.dtype.name,
+        FIELD_SHAPE: list(value.shape),
+        FIELD_BUFFER: base64.b64encode(numpy.ascontiguousarray(value).data).decode('ascii')
+    }
+
+
+def _encode_base64(value):
+    return base64.b64encode(value).decode('ascii')
+
+
+def create_default(array_format=ARRAY_LIST):
+    """
+    Create a fallback for JSON encoders (the default argument of
+    json.JSONEncoder) encoding NumPy arrays in the given format.
+    """
+    if array_format not in (ARRAY_BASE64, ARRAY_LIST):
+        raise ValueError('Unknown array format "%s"' % array_format)
+
+    def default(value):
+
+        # Values can only be NumPy arrays or scalars once NumPy is imported,
+        # so there is no need to import it here
+        numpy = sys.modules.get('numpy')
+        if numpy is not None:
+            if isinstance(value, numpy.ndarray):
+                if array_format == ARRAY_BASE64 and value.dtype.kind in 'biuf':
+                    return _encode_array_buffer(numpy, value)
+                return value.tolist()
+            if isinstance(value, numpy.generic):
+                return value.item()
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return _encode_base64(value)
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        if isinstance(value, array.array):
+            return value.tolist()
+        if isinstance(value, SchemaObject):
+            return value.to_dict()
+        if dataclasses.is_dataclass(value) and not isinstance(value, type):
+            return dict((field.name, getattr(value, field.name)) for field in dataclasses.fields(value))
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        raise TypeError('Object of type %s is not JSON serializable' % value.__class__.__name__)
+
+    return default
+
+
+default = create_default()
+
+
+def decode_array(value):
+    """
+    Decode an array sent as nested lists or with ARRAY_BASE64, giving a NumPy
+    array (or an array.array of the flattened values without NumPy).
+    """
+    numpy = get_numpy()
+    if isinstance(value, dict):
+        try:
+            buffer = base64.b64decode(value[FIELD_BUFFER])
+            dtype = value[FIELD_DTYPE]
+        except (KeyError, TypeError, binascii.Error) as ex:
+            raise ValueError('Invalid array: %s' % ex)
+        if numpy is not None:
+            return numpy.frombuffer(buffer, dtype=numpy.dtype(dtype).newbyteorder('<')).reshape(value[FIELD_SHAPE])
+        if dtype not in TYPECODES:
+            raise ValueError('Unsupported array dtype "%s"' % dtype)
+        result = array.array(TYPECODES[dtype])
+        result.frombytes(buffer)
+        if sys.byteorder == 'big':
+            result.byteswap()
+        return result
+    if numpy is not None:
+        return numpy.array(value)
+    return value
+
+
+def decode_bytes(value):
+    try:
+        return base64.b64decode(value)
+    except (TypeError, binascii.Error) as ex:
+        raise ValueError('Invalid base64 data: %s' % ex)
+
+
+def decode_date(value):
+    return datetime.date.fromisoformat(value)
+
+
+def decode_datetime(value):
+
+    # Python before 3.11 doesn't accept the Z suffix
+    if isinstance(value, str) and value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.datetime.fromisoformat(value)
+
+
+def decode_decimal(value):
+    try:
+        return decimal.Decimal(value if isinstance(value, str) else repr(value))
+    except decimal.InvalidOperation:
+        raise ValueError('Invalid decimal: %r' % (value,))
+
+
+class FieldDecoder(object):
+    """
+    Decodes message data by applying a hook to each of the given fields of
+    the data object, for instance:
+
+        FieldDecoder({'timestamp': decode_datetime, 'samples': decode_array})
+
+    Fields that are missing or null are left alone. The data is copied rather
+    than changed in place since the same message is shared by all listeners.
+    A hook failing raises SchemaError for the field.
+    """
+
+    def __init__(self, hooks):
+        self.hooks = list(hooks.items())
+
+    def __call__(self, data):
+        if not isinstance(data, dict):
+            raise errors.SchemaError('', 'expected object, got %s' % type(data).__name__)
+        data = data.copy()
+        for field, hook in self.hooks:
+            value = data.get(field)
+            if value is None:
+                continue
+            try:
+                data[field] = hook(value)
+            except (AttributeError, TypeError, ValueError) as ex:
+                raise errors.SchemaError(field, str(ex))
+        return data
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(field for field, _ in self.hooks))
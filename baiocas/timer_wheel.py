@@ -0,0 +1,152 @@
+import logging
+import math
+import time
+
+from tornado.ioloop import IOLoop
+
+
+class Timer(object):
+
+    __slots__ = ('wheel', 'callback', 'expiration', 'cancelled')
+
+    def __init__(self, wheel, callback, expiration):
+        self.wheel = wheel
+        self.callback = callback
+        self.expiration = expiration
+        self.cancelled = False
+
+    def __repr__(self):
+        return '%s(expiration=%s, cancelled=%s)' % (self.__class__.__name__, self.expiration, self.cancelled)
+
+    def cancel(self):
+        return self.wheel.remove_timeout(self)
+
+
+class TimerWheel(object):
+    """
+    Hierarchical timer wheel that can be shared by many clients running on the
+    same IO loop.
+
+    Timeouts are rounded up to a whole number of ticks of ``granularity``
+    milliseconds and kept in buckets, so adding and cancelling a timeout is
+    constant time and the IO loop only ever has a single timeout for the
+    whole wheel (the next tick) instead of one per pending timeout. Each level
+    has ``slots`` buckets and covers ``slots`` times the range of the level
+    below it. Timeouts further out than the top level can cover are cascaded
+    again until they are close enough.
+    """
+
+    def __init__(self, granularity=100, slots=64, levels=4, io_loop=None, clock=None):
+        if granularity <= 0:
+            raise ValueError('Granularity must be positive')
+        if slots < 2 or levels < 1:
+            raise ValueError('Need at least 2 slots and 1 level')
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self.io_loop = io_loop or IOLoop.current()
+        self._granularity = granularity
+        self._slots = slots
+        self._levels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._clock = clock or time.monotonic
+        self._start = self._clock()
+        self._tick = 0
+        self._count = 0
+        self._scheduled_tick = None
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def granularity(self):
+        return self._granularity
+
+    def _add(self, timer):
+
+        # Find the lowest level that covers the expiration tick
+        ticks = timer.expiration - self._tick
+        span = 1
+        for level in self._levels[:-1]:
+            if ticks < span * self._slots:
+                break
+            span *= self._slots
+        else:
+            level = self._levels[-1]
+        level[(timer.expiration // span) % self._slots].append(timer)
+
+    def _get_current_tick(self):
+        return int((self._clock() - self._start) * 1000 // self._granularity)
+
+    def _run_tick(self):
+        self._scheduled_tick = None
+        current_tick = self._get_current_tick()
+        while self._tick < current_tick and self._count:
+            self._tick += 1
+
+            # Move the timers of higher level buckets that are now in range
+            # down the hierarchy before expiring the lowest level bucket
+            span = self._slots ** (len(self._levels) - 1)
+            for level in reversed(self._levels[1:]):
+                if self._tick % span == 0:
+                    index = (self._tick // span) % self._slots
+                    timers = level[index]
+                    level[index] = []
+                    for timer in timers:
+                        if not timer.cancelled:
+                            self._add(timer)
+                span //= self._slots
+            index = self._tick % self._slots
+            timers = self._levels[0][index]
+            self._levels[0][index] = []
+            for timer in timers:
+                if timer.cancelled:
+                    continue
+                self._count -= 1
+                timer.cancelled = True
+                try:
+                    timer.callback()
+                except Exception:
+                    self.log.exception('Exception in timer callback %s' % timer.callback)
+        if self._count:
+            self._schedule_tick()
+        else:
+            self._tick = current_tick
+
+    def _schedule_tick(self):
+        if self._scheduled_tick is not None:
+            return
+        delay = (self._tick + 1) * self._granularity / 1000.0 - (self._clock() - self._start)
+        self._scheduled_tick = self.io_loop.call_later(max(0, delay), self._run_tick)
+
+    def add_timeout(self, delay, callback):
+
+        # Catch up with the clock if the wheel was idle. The expiration is
+        # rounded up to the next tick so that timeouts never fire early.
+        if not self._count:
+            self._tick = self._get_current_tick()
+        elapsed = (self._clock() - self._start) * 1000
+        expiration = max(self._tick + 1, int(math.ceil((elapsed + delay) / self._granularity)))
+        timer = Timer(self, callback, expiration)
+        self._add(timer)
+        self._count += 1
+        self._schedule_tick()
+        return timer
+
+    def close(self):
+        if self._scheduled_tick is not None:
+            self.io_loop.remove_timeout(self._scheduled_tick)
+            self._scheduled_tick = None
+        for level in self._levels:
+            for bucket in level:
+                for timer in bucket:
+                    timer.cancelled = True
+                del bucket[:]
+        self._count = 0
+
+    def remove_timeout(self, timer):
+        if timer.cancelled:
+            return False
+        timer.cancelled = True
+        self._count -= 1
+        if not self._count and self._scheduled_tick is not None:
+            self.io_loop.remove_timeout(self._scheduled_tick)
+            self._scheduled_tick = None
+        return True
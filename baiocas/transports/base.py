@@ -4,24 +4,36 @@ import urllib.parse
 from baiocas import errors
 from baiocas.channel_id import ChannelId
 from baiocas.message import Message
+from baiocas.transports.circuit_breaker import CircuitBreaker
 
 
 class Transport(object):
 
     DEFAULT_MAXIMUM_NETWORK_DELAY = 10000
 
+    DEFAULT_SPOOL_SIZE = 0
+
+    OPTION_CIRCUIT_BREAKER = 'circuit_breaker'
+
     OPTION_MAXIMUM_NETWORK_DELAY = 'maximum_network_delay'
 
+    OPTION_SPOOL_SIZE = 'spool_size'
+
     def __init__(self, **options):
         self.log = logging.getLogger('%s.%s' % (self.__module__, self.name))
         self._client = None
         self._options = {}
+        self._spool = []
         self.url = None
         self.configure(**options)
 
     def __repr__(self):
         return self.name
 
+    @property
+    def circuit_breaker(self):
+        return self._options.get(self.OPTION_CIRCUIT_BREAKER)
+
     @property
     def name(self):
         raise NotImplementedError('Must be implemented by child classes')
@@ -34,9 +46,61 @@ class Transport(object):
     def options(self):
         return self._options.copy()
 
+    def _check_circuit(self, messages):
+
+        # Let the messages through unless the circuit breaker is open
+        breaker = self.circuit_breaker
+        if breaker is None or breaker.allow_request():
+            return True
+
+        # Spool publishes until the circuit closes again (if enabled) and fail
+        # everything else right away instead of waiting for a timeout
+        spool_size = self._options.get(self.OPTION_SPOOL_SIZE, self.DEFAULT_SPOOL_SIZE)
+        failed_messages = []
+        for message in messages:
+            if not message.channel.is_meta and len(self._spool) < spool_size:
+                self._spool.append(message)
+            else:
+                failed_messages.append(message)
+        self.log.debug('Circuit open, spooled %d and failed %d messages' %
+                       (len(messages) - len(failed_messages), len(failed_messages)))
+        if failed_messages:
+            self._client.fail_messages(failed_messages, errors.CircuitOpenError())
+        return False
+
+    def _fail_spooled_messages(self, exception):
+        if not self._spool:
+            return
+        self.log.debug('Failing %d spooled messages' % len(self._spool))
+        messages = self._spool
+        self._spool = []
+        if self._client:
+            self._client.fail_messages(messages, exception)
+
     def _get_url(self):
         return self._url
 
+    def _handle_circuit_state_change(self, old_state, new_state):
+        if self._client:
+            self._client.fire(self._client.EVENT_CIRCUIT_STATE_CHANGE, self, old_state, new_state)
+        if new_state == CircuitBreaker.STATE_CLOSED and self._spool:
+            self.log.debug('Circuit closed, sending %d spooled messages' % len(self._spool))
+            messages = self._spool
+            self._spool = []
+            self.send(messages)
+
+    def _record_result(self, error=None):
+
+        # Client errors mean that the server is up and responding, so only
+        # timeouts, server errors and communication errors count as failures
+        breaker = self.circuit_breaker
+        if breaker is None:
+            return
+        if error is None or (isinstance(error, errors.ServerError) and error.code < 500):
+            breaker.record_success()
+        else:
+            breaker.record_failure(timeout=isinstance(error, errors.TimeoutError))
+
     def _set_url(self, url):
         parsed_url = urllib.parse.urlparse(url or '')
         if url is not None:
@@ -49,6 +113,12 @@ class Transport(object):
 
     def abort(self):
         self.log.debug('Transport aborted')
+        self._fail_spooled_messages(errors.CircuitOpenError())
+
+        # The results of aborted requests are never recorded, so a probe
+        # request in flight wouldn't ever let the circuit close
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.cancel_probe()
 
     def accept(self, bayeux_version):
         raise NotImplementedError('Must be implemented by child classes')
@@ -56,6 +126,11 @@ class Transport(object):
     def configure(self, **options):
         if not options:
             return
+        breaker = options.get(self.OPTION_CIRCUIT_BREAKER)
+        if self.circuit_breaker is not None and self.OPTION_CIRCUIT_BREAKER in options:
+            self.circuit_breaker.remove_listener(self._handle_circuit_state_change)
+        if breaker is not None:
+            breaker.add_listener(self._handle_circuit_state_change)
         self._options.update(options)
         self.log.debug('Options changed to: %s' % self._options)
 
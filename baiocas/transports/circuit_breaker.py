@@ -0,0 +1,137 @@
+import logging
+import time
+from collections import deque
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker guarding the sends of a transport.
+
+    The circuit opens when the error rate over the last ``window`` requests
+    reaches ``error_rate`` (once at least ``minimum_requests`` were made) or
+    after ``consecutive_timeouts`` timeouts in a row. While open, requests are
+    rejected until ``probe_interval`` milliseconds have passed, at which point
+    a single probe request is let through (half-open): its success closes the
+    circuit and its failure opens it again. A probe whose result will never
+    be recorded (e.g. because its transport was aborted) must be cancelled
+    with cancel_probe() so that another one can be let through.
+    """
+
+    STATE_CLOSED = 'closed'
+
+    STATE_HALF_OPEN = 'half-open'
+
+    STATE_OPEN = 'open'
+
+    def __init__(self, error_rate=0.5, minimum_requests=10, window=20, consecutive_timeouts=3,
+                 probe_interval=5000, clock=None):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self._error_rate = error_rate
+        self._minimum_requests = minimum_requests
+        self._consecutive_timeouts = consecutive_timeouts
+        self._probe_interval = probe_interval
+        self._clock = clock or time.monotonic
+        self._outcomes = deque(maxlen=window)
+        self._timeouts = 0
+        self._state = self.STATE_CLOSED
+        self._opened_at = None
+        self._probing = False
+        self._listeners = []
+        self._metrics = dict(
+            requests=0,
+            successes=0,
+            failures=0,
+            timeouts=0,
+            rejected=0,
+            state_changes=0
+        )
+
+    @property
+    def error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / float(len(self._outcomes))
+
+    @property
+    def is_open(self):
+        return self._state == self.STATE_OPEN
+
+    @property
+    def metrics(self):
+        metrics = self._metrics.copy()
+        metrics.update(state=self._state, error_rate=self.error_rate)
+        return metrics
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state):
+        if state == self._state:
+            return
+        old_state = self._state
+        self._state = state
+        self._metrics['state_changes'] += 1
+        if state == self.STATE_OPEN:
+            self._opened_at = self._clock()
+        elif state == self.STATE_CLOSED:
+            self._outcomes.clear()
+            self._timeouts = 0
+        self._probing = False
+        self.log.info('Circuit %s -> %s' % (old_state, state))
+        for listener in self._listeners:
+            listener(old_state, state)
+
+    def add_listener(self, function):
+        self._listeners.append(function)
+
+    def allow_request(self):
+        if self._state == self.STATE_OPEN:
+            if self._clock() - self._opened_at >= self._probe_interval / 1000.0:
+                self._set_state(self.STATE_HALF_OPEN)
+        if self._state == self.STATE_HALF_OPEN:
+            if self._probing:
+                self._metrics['rejected'] += 1
+                return False
+            self.log.debug('Letting probe request through')
+            self._probing = True
+        elif self._state == self.STATE_OPEN:
+            self._metrics['rejected'] += 1
+            return False
+        self._metrics['requests'] += 1
+        return True
+
+    def cancel_probe(self):
+        if not self._probing:
+            return False
+        self.log.debug('Probe request cancelled')
+        self._probing = False
+        return True
+
+    def record_failure(self, timeout=False):
+        self._metrics['failures'] += 1
+        if timeout:
+            self._metrics['timeouts'] += 1
+        if self._state == self.STATE_HALF_OPEN:
+            self._set_state(self.STATE_OPEN)
+            return
+        self._outcomes.append(1)
+        self._timeouts = self._timeouts + 1 if timeout else 0
+        if self._timeouts >= self._consecutive_timeouts or (
+            len(self._outcomes) >= self._minimum_requests and self.error_rate >= self._error_rate
+        ):
+            self._set_state(self.STATE_OPEN)
+
+    def record_success(self):
+        self._metrics['successes'] += 1
+        if self._state == self.STATE_HALF_OPEN:
+            self._set_state(self.STATE_CLOSED)
+            return
+        self._outcomes.append(0)
+        self._timeouts = 0
+
+    def remove_listener(self, function):
+        if function not in self._listeners:
+            return False
+        self._listeners.remove(function)
+        return True
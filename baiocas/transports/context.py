@@ -0,0 +1,171 @@
+import logging
+import threading
+
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPClient
+from tornado.ioloop import IOLoop
+from tornado.simple_httpclient import _HTTPConnection
+from tornado.simple_httpclient import HTTPStreamClosedError
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+
+# The curl client needs pycurl
+try:
+    from tornado.curl_httpclient import CurlAsyncHTTPClient
+# Can't use ModuleNotFoundError because it was added in Python 3.6
+except ImportError:
+    CurlAsyncHTTPClient = None
+
+
+class _CancellableConnection(_HTTPConnection):
+
+    def __init__(self, client, request, *args, **kwargs):
+        client.connections[request.request] = self
+        super(_CancellableConnection, self).__init__(client, request, *args, **kwargs)
+
+    def _release(self):
+        self.client.connections.pop(self.request.request, None)
+        super(_CancellableConnection, self)._release()
+
+    def cancel(self):
+        try:
+            raise HTTPStreamClosedError('Request cancelled')
+        except HTTPStreamClosedError as ex:
+            self._handle_exception(HTTPStreamClosedError, ex, None)
+
+
+class _CancellableHTTPClient(SimpleAsyncHTTPClient):
+    """
+    The simple HTTP client, keeping track of the connection of each request
+    so that requests can be cancelled one at a time instead of closing the
+    whole client.
+    """
+
+    def initialize(self, *args, **kwargs):
+        super(_CancellableHTTPClient, self).initialize(*args, **kwargs)
+        self.connections = {}
+
+    def _connection_class(self):
+        return _CancellableConnection
+
+    def cancel(self, request):
+
+        # Requests still waiting for a free connection are taken out of the
+        # queue, the others have their connection closed. Either way, the
+        # request fails with a 599 error and its slot is freed.
+        for key, (waiting_request, callback, timeout_handle) in list(self.waiting.items()):
+            if waiting_request.request is request:
+                self._on_timeout(key, 'cancelled')
+                return True
+        connection = self.connections.get(request)
+        if connection is None:
+            return False
+        connection.cancel()
+        return True
+
+
+class HttpClientContext(object):
+    """
+    HTTP clients shared by any number of long-polling transports.
+
+    Each context owns its clients: an AsyncHTTPClient created just for it
+    (rather than the instance Tornado caches per IO loop) and the blocking
+    client used for synchronous sends, which runs its own private IO loop.
+    Transports sharing a context share its connections and its limit on
+    simultaneous requests, while separate contexts are fully isolated from
+    each other. Since the clients are shared, transports must never close
+    them when aborting; they are closed with the context.
+
+    The curl client is used when pycurl is installed, otherwise the client
+    implementation configured on AsyncHTTPClient. The max_clients setting
+    limits the number of simultaneous requests of the context. With the
+    default of 10, only 10 sessions can have a connect held by the server at
+    any time, so it needs to be raised when running many clients per context.
+
+    Single requests can be cancelled (when a transport aborts) with the
+    simple HTTP client only. With the curl client, they run until they
+    complete or time out. The curl client also can't stream request bodies.
+    """
+
+    _default = None
+
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_clients=None):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self._max_clients = max_clients
+        self._http_client = None
+        self._blocking_http_client = None
+
+    @property
+    def blocking_http_client(self):
+        self.open()
+        return self._blocking_http_client
+
+    @property
+    def http_client(self):
+
+        # The client is bound to the IO loop it was created on
+        io_loop = IOLoop.current()
+        if self._http_client is not None and self._http_client.io_loop is not io_loop:
+            self._close_http_client()
+        if self._http_client is None:
+            client_class = self._get_client_class()
+            self.log.debug('Creating %s (max_clients = %s)' % (client_class.__name__, self._max_clients))
+            self._http_client = client_class(force_instance=True, **self._get_client_options())
+        return self._http_client
+
+    @property
+    def max_clients(self):
+        return self._max_clients
+
+    @property
+    def supports_body_producer(self):
+
+        # The curl client needs the whole body up front
+        return issubclass(self._get_client_class(), SimpleAsyncHTTPClient)
+
+    @classmethod
+    def get_default(cls):
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _close_http_client(self):
+        self.log.debug('Closing %s' % self._http_client.__class__.__name__)
+        self._http_client.close()
+        self._http_client = None
+
+    def _get_client_class(self):
+        if CurlAsyncHTTPClient is None:
+            client_class = AsyncHTTPClient.configured_class()
+            if client_class is SimpleAsyncHTTPClient:
+                return _CancellableHTTPClient
+            return client_class
+        return CurlAsyncHTTPClient
+
+    def _get_client_options(self):
+        options = {}
+        if self._max_clients is not None:
+            options['max_clients'] = self._max_clients
+        return options
+
+    def cancel(self, request):
+        if self._http_client is None or not isinstance(self._http_client, _CancellableHTTPClient):
+            return False
+        return self._http_client.cancel(request)
+
+    def close(self):
+        if self._http_client is not None:
+            self._close_http_client()
+        if self._blocking_http_client is not None:
+            self._blocking_http_client.close()
+            self._blocking_http_client = None
+
+    def open(self):
+        if self._blocking_http_client is None:
+            self.log.debug('Creating blocking HTTP client')
+            self._blocking_http_client = HTTPClient(
+                async_client_class=self._get_client_class(),
+                **self._get_client_options()
+            )
@@ -0,0 +1,221 @@
+import heapq
+import http.cookies
+import itertools
+import logging
+import time
+from email.utils import formatdate
+
+from baiocas.transports.util import get_cookie_expiration
+
+
+class Cookie(object):
+    """A single cookie with its expiration already parsed into a timestamp."""
+
+    __slots__ = ('name', 'value', 'domain', 'path', 'expires', 'secure', 'host_only', 'morsel')
+
+    def __init__(self, name, value, domain='', path='/', expires=None, secure=False, host_only=True, morsel=None):
+        self.name = name
+        self.value = value
+        self.domain = domain.lower().lstrip('.')
+        self.path = path or '/'
+        self.expires = expires
+        self.secure = secure
+        self.host_only = host_only
+        self.morsel = morsel
+
+    def __repr__(self):
+        return '%s(%s=%s, domain=%s, path=%s)' % (self.__class__.__name__, self.name, self.value,
+                                                  self.domain, self.path)
+
+    @property
+    def key(self):
+        return (self.domain, self.path, self.name)
+
+    @property
+    def state(self):
+        return (self.value, self.expires, self.secure, self.host_only)
+
+    def is_expired(self, now=None):
+        return self.expires is not None and self.expires <= (time.time() if now is None else now)
+
+    def matches(self, host, path='/', secure=False):
+        if self.secure and not secure:
+            return False
+        host = host.lower()
+        if host != self.domain and (self.host_only or not host.endswith('.' + self.domain)):
+            return False
+        if path == self.path or not self.path:
+            return True
+        return path.startswith(self.path) and (self.path.endswith('/') or path[len(self.path)] == '/')
+
+    def output(self):
+        return '%s=%s' % (self.name, self.value)
+
+    def to_morsel(self):
+        if self.morsel is None:
+            morsel = http.cookies.Morsel()
+            morsel.set(self.name, self.value, self.value)
+            morsel['path'] = self.path
+            if not self.host_only:
+                morsel['domain'] = self.domain
+            if self.expires is not None:
+                morsel['expires'] = formatdate(self.expires, usegmt=True)
+            if self.secure:
+                morsel['secure'] = True
+            self.morsel = morsel
+        return self.morsel
+
+
+class CookieJar(object):
+    """
+    Cookie storage for HTTP transports.
+
+    Expirations are parsed once when a cookie is stored and kept in a heap, so
+    dropping expired cookies only looks at the cookie expiring first. The
+    Cookie header sent for a given host and path is cached until the jar
+    changes or one of its cookies expires. Domain and path are matched as per
+    RFC 6265 so that a transport moving between endpoints only sends each
+    server its own cookies.
+    """
+
+    def __init__(self):
+        self.log = logging.getLogger('%s.%s' % (self.__module__, self.__class__.__name__))
+        self._cookies = {}
+        self._expirations = []
+        self._sequence = itertools.count()
+        self._headers = {}
+        self._version = 0
+
+    def __iter__(self):
+        return iter(sorted(self._cookies.values(), key=lambda cookie: (-len(cookie.path), cookie.name)))
+
+    def __len__(self):
+        return len(self._cookies)
+
+    @property
+    def next_expiration(self):
+        while self._expirations:
+            expires, _, key, cookie = self._expirations[0]
+            if self._cookies.get(key) is cookie:
+                return expires
+            heapq.heappop(self._expirations)
+        return None
+
+    @property
+    def version(self):
+        return self._version
+
+    def _changed(self):
+        self._version += 1
+        self._headers.clear()
+
+    def _create_cookie(self, morsel, host, request_path):
+
+        # Without a Path attribute, the default path is the directory of the
+        # request path. Without a Domain attribute, the cookie is only sent
+        # back to the host that set it. A Domain attribute has to cover the
+        # host, otherwise one endpoint could set cookies for another.
+        if not morsel['path'] or not morsel['path'].startswith('/'):
+            path = request_path[:request_path.rfind('/')] if request_path.count('/') > 1 else '/'
+        else:
+            path = morsel['path']
+        domain = morsel['domain'].lower().lstrip('.')
+        host = host.lower()
+        if domain and host and host != domain and not host.endswith('.' + domain):
+            return None
+        return Cookie(
+            morsel.key,
+            morsel.value,
+            domain=domain or host,
+            path=path,
+            expires=get_cookie_expiration(morsel),
+            secure=bool(morsel['secure']),
+            host_only=not domain,
+            morsel=morsel
+        )
+
+    def add(self, cookie, now=None):
+
+        # A cookie that is already expired deletes the stored one
+        if cookie.is_expired(now):
+            self.log.debug('Cookie %s already expired, removing' % cookie.name)
+            if self._cookies.pop(cookie.key, None) is not None:
+                self._changed()
+            return cookie
+
+        # Servers often send the same cookie with every response, which
+        # shouldn't throw away the cached headers
+        existing = self._cookies.get(cookie.key)
+        if existing is not None and existing.state == cookie.state:
+            return existing
+        self._cookies[cookie.key] = cookie
+        if cookie.expires is not None:
+            heapq.heappush(self._expirations, (cookie.expires, next(self._sequence), cookie.key, cookie))
+        self._changed()
+        return cookie
+
+    def clear(self):
+        self._cookies.clear()
+        del self._expirations[:]
+        self._changed()
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        expired = 0
+        while self._expirations and self._expirations[0][0] <= now:
+            expires, _, key, cookie = heapq.heappop(self._expirations)
+            if self._cookies.get(key) is cookie:
+                del self._cookies[key]
+                expired += 1
+        if expired:
+            self.log.debug('Removed %d expired cookies' % expired)
+            self._changed()
+        return expired
+
+    def get(self, name, host=None, path='/'):
+        for cookie in self:
+            if cookie.name == name and (host is None or cookie.matches(host, path, secure=True)):
+                return cookie
+        return None
+
+    def get_cookies(self, host, path='/', secure=False, include_expired=False, now=None):
+        now = time.time() if now is None else now
+        return [cookie for cookie in self
+                if cookie.matches(host, path, secure) and (include_expired or not cookie.is_expired(now))]
+
+    def get_header(self, host, path='/', secure=False, now=None):
+        self.expire(now)
+        key = (host, path, secure)
+        header = self._headers.get(key)
+        if header is None:
+            header = '; '.join(cookie.output() for cookie in self.get_cookies(host, path, secure, now=now))
+            self._headers[key] = header
+        return header or None
+
+    def set(self, name, value, host='', request_path='/', time_received=None, **attrs):
+        morsel = http.cookies.Morsel()
+        morsel.set(name, value, value)
+        morsel.update(attrs)
+        morsel.time_received = time.time() if time_received is None else time_received
+        cookie = self._create_cookie(morsel, host, request_path)
+        if cookie is None:
+            raise ValueError('Cookie domain %s does not match host %s' % (morsel['domain'], host))
+        return self.add(cookie, now=morsel.time_received)
+
+    def update(self, values, host='', request_path='/', time_received=None):
+        if not values:
+            return []
+        time_received = time.time() if time_received is None else time_received
+        morsels = http.cookies.SimpleCookie()
+        for value in values:
+            morsels.load(value)
+        cookies = []
+        for morsel in morsels.values():
+            morsel.time_received = time_received
+            cookie = self._create_cookie(morsel, host, request_path)
+            if cookie is None:
+                self.log.warning('Ignoring cookie %s for domain %s set by host %s' % (
+                    morsel.key, morsel['domain'], host))
+                continue
+            cookies.append(self.add(cookie, now=time_received))
+        return cookies
@@ -1,10 +1,9 @@
-import http.cookies
 import time
 from email.utils import mktime_tz
 from email.utils import parsedate_tz
 
 from baiocas.transports.base import Transport
-from baiocas.transports.util import is_cookie_expired
+from baiocas.transports.cookies import CookieJar
 
 
 class HttpTransport(Transport):
@@ -17,36 +16,56 @@ class HttpTransport(Transport):
 
     def __init__(self, *args, **kwargs):
         super(HttpTransport, self).__init__(*args, **kwargs)
-        self._cookies = http.cookies.SimpleCookie()
+        self._cookies = CookieJar()
+
+        # Bumped whenever the headers or cookies change so that subclasses
+        # can cache anything built from them
+        self._headers_version = 0
 
     def add_header(self, name, value):
         headers = self._options.setdefault(self.OPTION_HEADERS, {})
         headers.setdefault(name.lower(), []).append(value)
+        self._headers_version += 1
 
     def configure(self, **options):
         if self.OPTION_HEADERS in options:
             headers = dict((name.lower(), values) for name, values
                            in options[self.OPTION_HEADERS].items())
             options[self.OPTION_HEADERS] = headers
+            self._headers_version += 1
         super(HttpTransport, self).configure(**options)
 
+    @property
+    def cookies(self):
+        return self._cookies
+
+    def _get_cookie_scope(self):
+        parsed_url = self.parsed_url
+        return (
+            parsed_url.hostname or '',
+            parsed_url.path or '/',
+            parsed_url.scheme in ('https', 'wss')
+        )
+
     def get_cookie(self, name):
         self.log.debug('Getting cookie with name "%s"' % name)
-        return self._cookies.get(name)
+        cookie = self._cookies.get(name)
+        return cookie.to_morsel() if cookie is not None else None
 
     def get_cookie_headers(self, include_expired=False):
-        cookies = []
-        for key, cookie in sorted(self._cookies.items()):
-            if include_expired or not is_cookie_expired(cookie):
-                cookies.append(cookie.OutputString(attrs=[]))
-        return cookies
+        host, path, secure = self._get_cookie_scope()
+        return [cookie.output() for cookie
+                in self._cookies.get_cookies(host, path, secure, include_expired=include_expired)]
+
+    def get_cookie_expiration(self):
+        return self._cookies.next_expiration
 
     def get_headers(self):
         headers = self.DEFAULT_HEADERS.copy()
         headers.update(self._options.get(self.OPTION_HEADERS, {}))
-        cookies = self.get_cookie_headers()
-        if cookies:
-            headers.setdefault('cookie', []).extend(cookies)
+        cookie_header = self._cookies.get_header(*self._get_cookie_scope())
+        if cookie_header:
+            headers['cookie'] = headers.get('cookie', []) + [cookie_header]
         return headers
 
     def remove_header(self, name, value):
@@ -54,15 +73,17 @@ class HttpTransport(Transport):
         if name not in headers:
             return False
         del headers[name]
+        self._headers_version += 1
         return True
 
     def set_cookie(self, name, value, **attrs):
-        self._cookies[name] = value
-        cookie = self._cookies[name]
-        cookie.update(attrs)
-        cookie.time_received = time.time()
+        host, path, secure = self._get_cookie_scope()
+        version = self._cookies.version
+        cookie = self._cookies.set(name, value, host=host, request_path=path, **attrs)
+        if self._cookies.version != version:
+            self._headers_version += 1
         self.log.debug('Set cookie %s = %s' % (name, value))
-        return cookie
+        return cookie.to_morsel()
 
     def set_header(self, name, values):
         if not isinstance(values, (list, tuple)):
@@ -71,9 +92,11 @@ class HttpTransport(Transport):
             values = list(values)
         headers = self._options.setdefault(self.OPTION_HEADERS, {})
         headers[name.lower()] = values
+        self._headers_version += 1
 
     def update_cookies(self, values, time_received=None):
-        cookies = http.cookies.SimpleCookie()
+        if not values:
+            return
         if isinstance(time_received, (list, tuple)):
             time_received = time_received[0] if time_received else None
         if isinstance(time_received, str):
@@ -82,9 +105,9 @@ class HttpTransport(Transport):
                 time_received = mktime_tz(time_received)
         if time_received is None:
             time_received = time.time()
-        for value in values:
-            cookies.load(value)
-        for cookie in cookies.values():
-            cookie.time_received = time_received
-        self._cookies.update(cookies)
+        host, path, secure = self._get_cookie_scope()
+        version = self._cookies.version
+        self._cookies.update(values, host=host, request_path=path, time_received=time_received)
+        if self._cookies.version != version:
+            self._headers_version += 1
         self.log.debug('Updated cookie headers: %s' % values)
@@ -1,61 +1,199 @@
+import logging
+import time
+import zlib
+
 from tornado import gen
-from tornado.httpclient import AsyncHTTPClient
-from tornado.httpclient import HTTPClient
 from tornado.httpclient import HTTPError
 from tornado.httpclient import HTTPRequest
 from tornado.httputil import HTTPHeaders
 
 from baiocas import errors
 from baiocas.message import Message
+from baiocas.transports.context import HttpClientContext
 from baiocas.transports.http import HttpTransport
+from baiocas.transports.streaming import StreamingResponse
+from baiocas.transports.util import parse_accept_encoding
 
 
 class LongPollingHttpTransport(HttpTransport):
 
+    COMPRESSION_AUTO = 'auto'
+
+    COMPRESSION_LEVEL = 6
+
+    DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+    ENCODING_DEFLATE = 'deflate'
+
+    ENCODING_GZIP = 'gzip'
+
+    # zlib window bits giving the container format for each content coding
+    ENCODINGS = {
+        ENCODING_DEFLATE: zlib.MAX_WBITS,
+        ENCODING_GZIP: zlib.MAX_WBITS | 16
+    }
+
+    OPTION_COMPRESSION_THRESHOLD = 'compression_threshold'
+
+    OPTION_DECOMPRESS_RESPONSES = 'decompress_responses'
+
+    OPTION_HTTP_CONTEXT = 'http_context'
+
+    OPTION_INTERN_KEYS = 'intern_keys'
+
+    OPTION_JSON_DEFAULT = 'json_default'
+
+    OPTION_REQUEST_COMPRESSION = 'request_compression'
+
+    OPTION_STREAMING_REQUESTS = 'streaming_requests'
+
+    OPTION_STREAMING_RESPONSES = 'streaming_responses'
+
+    REQUEST_CHUNK_SIZE = 65536
+
     def __init__(self, *args, **kwargs):
         super(LongPollingHttpTransport, self).__init__(*args, **kwargs)
         self._append_message_type = False
-        self._create_http_clients()
+        self._generation = 0
+
+        # Requests sent and not answered yet, cancelled when aborting
+        self._pending_requests = set()
+
+        # Content codings the server said it accepts for request bodies, and
+        # whether it refused a compressed request
+        self._accepted_encodings = {}
+        self._compression_rejected = False
+
+        # Request headers and URLs are built once and reused until the headers,
+        # the cookies or the URL change (or a cookie expires)
+        self._request_headers = None
+        self._request_headers_version = None
+        self._request_headers_expiration = None
+        self._request_headers_url = None
+        self._request_urls = {}
+        self._request_urls_base = None
+
+    @property
+    def context(self):
+        return self._options.get(self.OPTION_HTTP_CONTEXT) or HttpClientContext.get_default()
 
     @property
     def name(self):
         return 'long-polling'
 
-    def _reset_http_clients(self):
-        self._http_client.close()
-        self._blocking_http_client.close()
-        self._create_http_clients()
+    def _handle_error(self, exception, messages):
+        if isinstance(exception, HTTPError):
+            if exception.code == 599:
+                error = errors.TimeoutError()
+            else:
+                error = errors.ServerError(exception.code)
+        else:
+            error = errors.CommunicationError(exception)
+        self.log.debug('Failed to send messages: %s' % error)
+        self._record_result(error)
+        self._client.fail_messages(messages, error)
+
+    def _compress(self, body, encoding):
+        compressor = zlib.compressobj(self.COMPRESSION_LEVEL, zlib.DEFLATED, self.ENCODINGS[encoding])
+        return compressor.compress(body) + compressor.flush()
 
-    def _create_http_clients(self):
-        try:
-            AsyncHTTPClient.configure("tornado.curl_httpclient.CurlAsyncHTTPClient")
-        # Can't use ModuleNotFoundError because it was added in Python 3.6
-        except ImportError:
-            pass
-        self._http_client = AsyncHTTPClient()
-        self._blocking_http_client = HTTPClient(
-            async_client_class=AsyncHTTPClient
-        )
+    def _get_body_producer(self, messages, encoding=None):
+        compressor = None
+        if encoding is not None:
+            compressor = zlib.compressobj(self.COMPRESSION_LEVEL, zlib.DEFLATED, self.ENCODINGS[encoding])
+
+        # Serialize the messages one at a time as the body is written, joining
+        # small ones so that they don't each go out in a chunk of their own
+        @gen.coroutine
+        def produce(write):
+            chunks = []
+            size = 0
+            for chunk in Message.iter_json(messages, encoding='utf8',
+                                           default=self._options.get(self.OPTION_JSON_DEFAULT)):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.REQUEST_CHUNK_SIZE:
+                    data = b''.join(chunks)
+                    chunks = []
+                    size = 0
+                    if compressor is not None:
+                        data = compressor.compress(data)
+                        if not data:
+                            continue
+                    yield write(data)
+            data = b''.join(chunks)
+            if compressor is not None:
+                data = compressor.compress(data) + compressor.flush()
+            if data:
+                yield write(data)
+
+        return produce
+
+    def _get_request_encoding(self):
+        encoding = self._options.get(self.OPTION_REQUEST_COMPRESSION)
+        if not encoding or self._compression_rejected:
+            return None
+        if encoding != self.COMPRESSION_AUTO:
+            return encoding
 
-    def _handle_response(self, response, messages):
+        # Only compress once the server has advertised support for it with
+        # an Accept-Encoding response header (RFC 7694), picking the coding
+        # it prefers. A quality of 0 means the coding is not acceptable.
+        best_encoding = None
+        best_quality = 0.0
+        for encoding in (self.ENCODING_GZIP, self.ENCODING_DEFLATE):
+            quality = self._accepted_encodings.get(encoding, self._accepted_encodings.get('*', 0.0))
+            if quality > best_quality:
+                best_encoding = encoding
+                best_quality = quality
+        return best_encoding
+
+    def _get_request_headers(self):
+        expiration = self._request_headers_expiration
+        if self._request_headers is not None and self._request_headers_version == self._headers_version and \
+                self._request_headers_url == self.url and (expiration is None or expiration > time.time()):
+            return self._request_headers
+        headers = HTTPHeaders()
+        for header, values in self.get_headers().items():
+            for value in values:
+                headers.add(header, value)
+        if self.log.isEnabledFor(logging.DEBUG):
+            for header, value in headers.get_all():
+                self.log.debug('Request header %s: %s' % (header, value))
+        self._request_headers = headers
+        self._request_headers_version = self._headers_version
+        self._request_headers_url = self.url
+        self._request_headers_expiration = self.get_cookie_expiration()
+        return headers
+
+    def _get_request_url(self, messages):
+        url = self.url
+        if not self._append_message_type or len(messages) != 1 or not messages[0].channel.is_meta:
+            return url
+        if url != self._request_urls_base:
+            self._request_urls = {}
+            self._request_urls_base = url
+        channel = messages[0].channel
+        request_url = self._request_urls.get(channel)
+        if request_url is None:
+            request_url = url if url.endswith('/') else url + '/'
+            request_url += '/'.join(channel.parts[1:])
+            self._request_urls[channel] = request_url
+        return request_url
+
+    def _handle_response(self, response, messages, stream=None):
 
         # Log the received response code and headers
         self.log.debug('Received response: %s' % response.code)
-        for header, value in response.headers.get_all():
-            self.log.debug('Response header %s: %s' % (header, value))
+        if self.log.isEnabledFor(logging.DEBUG):
+            for header, value in response.headers.get_all():
+                self.log.debug('Response header %s: %s' % (header, value))
 
         # If there was an error, report the sent messages as failed
         if response.error:
-            if isinstance(response.error, HTTPError):
-                if response.error.code == 599:
-                    error = errors.TimeoutError()
-                else:
-                    error = errors.ServerError(response.error.code)
-            else:
-                error = errors.CommunicationError(response.error)
-            self.log.debug('Failed to send messages: %s' % error)
-            self._client.fail_messages(messages, error)
+            self._handle_error(response.error, stream.pending_messages if stream else messages)
             return
+        self._record_result()
 
         # Update the cookies
         self.update_cookies(
@@ -63,32 +201,63 @@ class LongPollingHttpTransport(HttpTransport):
             time_received=response.headers.get('Date')
         )
 
+        # Remember which content codings the server accepts for requests
+        accept_encoding = response.headers.get('Accept-Encoding')
+        if accept_encoding is not None:
+            self._accepted_encodings = parse_accept_encoding(accept_encoding)
+
+        # When streaming, the messages have already been passed on as they
+        # arrived, so only check that the body was complete
+        if stream is not None:
+            stream.close()
+            return
+
         # Get the received messages
-        self.log.debug('Received body: %s' % response.body)
-        messages = Message.from_json(response.body, encoding='utf8')
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('Received body: %s' % response.body)
+        messages = Message.from_json(
+            response.body,
+            encoding='utf8',
+            intern_keys=self._options.get(self.OPTION_INTERN_KEYS, False)
+        )
         self._client.receive_messages(messages)
 
     def _prepare_request(self, messages):
 
         # Determine the URL for the messages
-        url = self.url
-        if self._append_message_type and len(messages) == 1 and messages[0].channel.is_meta():
-            message_type = '/'.join(messages[0].channel.parts()[1:])
-            if not url.endswith('/'):
-                url += '/'
-            url += message_type
+        url = self._get_request_url(messages)
 
-        # Get the headers for the request
-        headers = HTTPHeaders()
-        for header, values in self.get_headers().items():
-            for value in values:
-                headers.add(header, value)
-        for header, value in headers.get_all():
-            self.log.debug('Request header %s: %s' % (header, value))
+        # Get the headers for the request. The cached headers can be passed
+        # as is since the Tornado client copies them before making changes.
+        headers = self._get_request_headers()
+
+        # Get the body for the request. When streaming, the body is sent with
+        # chunked transfer encoding and only the largest message is ever held
+        # in memory serialized instead of the whole batch. Streamed bodies are
+        # always compressed (if enabled) since their size isn't known up
+        # front, buffered ones only above the threshold.
+        body = body_producer = None
+        encoding = self._get_request_encoding()
+        if self._options.get(self.OPTION_STREAMING_REQUESTS) and self.context.supports_body_producer:
+            body_producer = self._get_body_producer(messages, encoding=encoding)
+            self.log.debug('Streaming request body (%d messages)' % len(messages))
+        else:
+            body = Message.to_json(messages, encoding='utf8', default=self._options.get(self.OPTION_JSON_DEFAULT))
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug('Request body (length: %d): %s' % (len(body), body))
+            threshold = self._options.get(self.OPTION_COMPRESSION_THRESHOLD, self.DEFAULT_COMPRESSION_THRESHOLD)
+            if encoding is not None and len(body) >= threshold:
+                length = len(body)
+                body = self._compress(body, encoding)
+                self.log.debug('Compressed request body with %s (length: %d -> %d)' % (encoding, length, len(body)))
+            else:
+                encoding = None
 
-        # Get the body for the request
-        body = Message.to_json(messages, encoding='utf8')
-        self.log.debug('Request body (length: %d): %s' % (len(body), body))
+        # The cached headers are shared, so copy them before adding the
+        # content coding
+        if encoding is not None:
+            headers = HTTPHeaders(headers)
+            headers['Content-Encoding'] = encoding
 
         # Get the timeout (in seconds)
         timeout = self.get_timeout(messages) / 1000.0
@@ -100,8 +269,10 @@ class LongPollingHttpTransport(HttpTransport):
             method='POST',
             headers=headers,
             body=body,
+            body_producer=body_producer,
             connect_timeout=timeout,
-            request_timeout=timeout
+            request_timeout=timeout,
+            decompress_response=self._options.get(self.OPTION_DECOMPRESS_RESPONSES, True)
         )
 
     def _set_url(self, url):
@@ -113,35 +284,92 @@ class LongPollingHttpTransport(HttpTransport):
             len(self.parsed_url.fragment.strip()) == 0
         )
 
+    def configure(self, **options):
+        encoding = options.get(self.OPTION_REQUEST_COMPRESSION)
+        if encoding and encoding != self.COMPRESSION_AUTO and encoding not in self.ENCODINGS:
+            raise ValueError('Unsupported request compression: %s' % encoding)
+        if self.OPTION_REQUEST_COMPRESSION in options:
+            self._compression_rejected = False
+        super(LongPollingHttpTransport, self).configure(**options)
+        if options.get(self.OPTION_STREAMING_REQUESTS) and not self.context.supports_body_producer:
+            self.log.warning('The HTTP client of the context needs whole request bodies (e.g. curl), '
+                             'request bodies will not be streamed')
+
     def abort(self):
+
+        # The HTTP clients are shared with other transports, so instead of
+        # closing them, the pending requests are cancelled one by one to free
+        # their connections. Clients that can't cancel requests leave them to
+        # complete, and the responses to requests sent before the abort are
+        # dropped when they come back.
         super(LongPollingHttpTransport, self).abort()
-        self.log.debug('Cancelling pending requests')
-        self._reset_http_clients()
+        self.log.debug('Cancelling %d pending requests' % len(self._pending_requests))
+        self._generation += 1
+        for request in list(self._pending_requests):
+            self.context.cancel(request)
+        self._pending_requests.clear()
 
     def accept(self, bayeux_version):
         return True
 
     @gen.coroutine
     def send(self, messages, sync=False):
+        if not self._check_circuit(messages):
+            return
         request = self._prepare_request(messages)
 
-        # Send the message. For synchronous requests, the Tornado client doesn't
-        # return the actual response object if there is an error even though it
-        # generates it internally. Instead of recreating it, we'll grab it.
-        self.log.debug('Sending message to %s' % request.url)
-        if sync:
+        generation = self._generation
+
+        # In streaming mode, each message is passed on to the client as soon
+        # as it has been parsed instead of once the whole body has arrived
+        stream = None
+        if self._options.get(self.OPTION_STREAMING_RESPONSES):
+            def receive(message):
+                if generation == self._generation:
+                    self._client.receive_messages([message])
+            stream = StreamingResponse(
+                messages,
+                receive,
+                intern_keys=self._options.get(self.OPTION_INTERN_KEYS, False)
+            )
+
+        # Send the message. Error responses are returned like any other, but
+        # timeouts and connection errors are still raised. If the server
+        # refuses a compressed body, compression is turned off and the
+        # messages are sent again uncompressed.
+        while True:
+            if stream is not None:
+                request.streaming_callback = stream.handle_chunk
+                request.header_callback = stream.handle_header
+            self.log.debug('Sending message to %s' % request.url)
             try:
-                response = self._blocking_http_client.fetch(request)
-            except HTTPError:
-                response = self._blocking_http_client._response
-        else:
-            response = yield self._http_client.fetch(request)
+                if sync:
+                    response = self.context.blocking_http_client.fetch(request, raise_error=False)
+                else:
+                    self._pending_requests.add(request)
+                    try:
+                        response = yield self.context.http_client.fetch(request, raise_error=False)
+                    finally:
+                        self._pending_requests.discard(request)
+            except Exception as ex:
+                if generation == self._generation:
+                    self._handle_error(ex, stream.pending_messages if stream else messages)
+                return
+            if generation != self._generation:
+                self.log.debug('Transport aborted since the request was sent, discarding response')
+                return
+            if response.code != 415 or 'Content-Encoding' not in request.headers:
+                break
+            self.log.warning('Server does not accept %s request bodies, disabling compression' %
+                             request.headers['Content-Encoding'])
+            self._compression_rejected = True
+            request = self._prepare_request(messages)
 
         # Handle the response. We catch all exceptions here so that a bad
         # response doesn't end up crashing the Tornado async framework.
         try:
-            self._handle_response(response, messages)
+            self._handle_response(response, messages, stream=stream)
         except Exception as ex:
             error = errors.CommunicationError(ex)
             self.log.debug('Exception handling response: %s' % error)
-            self._client.fail_messages(messages, error)
+            self._client.fail_messages(stream.pending_messages if stream else messages, error)
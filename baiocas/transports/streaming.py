@@ -0,0 +1,165 @@
+import codecs
+import re
+
+from tornado.httputil import parse_response_start_line
+
+from baiocas.message import Message
+
+
+class MessageStreamParser(object):
+    """
+    Incremental parser for a JSON array of messages (or a single message).
+
+    Chunks of bytes are fed as they arrive and every message is returned as
+    soon as its closing brace has been seen. Only the text of the message
+    currently being received is kept between chunks, so memory is bounded by
+    the largest single message rather than by the whole response. Each chunk
+    is scanned once: the scanner only tracks nesting depth and whether it is
+    inside a string, jumping between interesting characters with regular
+    expressions, and each complete message is then decoded with the standard
+    JSON module.
+
+    With intern_keys, keys and channel IDs are shared between the decoded
+    messages (see Message.from_json).
+    """
+
+    STRING_PATTERN = re.compile(r'["\\]')
+
+    STRUCTURE_PATTERN = re.compile(r'["\[\]{}]')
+
+    def __init__(self, encoding='utf8', intern_keys=False):
+        self._intern_keys = intern_keys
+        self._decoder = codecs.getincrementaldecoder(encoding)('replace')
+        self._parts = []
+        self._depth = 0
+        self._element_depth = 2
+        self._in_string = False
+        self._escaped = False
+        self._done = False
+
+    @property
+    def is_done(self):
+        return self._done
+
+    def _scan(self, text):
+        messages = []
+        position = 0
+        done_position = 0
+
+        # The message being received carries on from the previous chunks
+        start = 0 if self._parts else None
+        if self._escaped:
+            self._escaped = False
+            position = 1
+        while True:
+
+            # Skip to the end of the current string, minding escapes
+            if self._in_string:
+                match = self.STRING_PATTERN.search(text, position)
+                if not match:
+                    break
+                if match.group() == '\\':
+                    if match.end() >= len(text):
+                        self._escaped = True
+                        break
+                    position = match.end() + 1
+                    continue
+                self._in_string = False
+                position = match.end()
+                continue
+
+            # Skip to the next structural character
+            match = self.STRUCTURE_PATTERN.search(text, position)
+            if not match:
+                break
+            character = match.group()
+            index = match.start()
+            position = index + 1
+            if self._done:
+                raise ValueError('Unexpected data after the end of the response: %r' % text[index:index + 20])
+            if character == '"':
+                if self._depth < self._element_depth:
+                    raise ValueError('Expected a message, got a string')
+                self._in_string = True
+            elif character in '[{':
+                if self._depth == 0 and character == '{':
+                    self._element_depth = 1
+                self._depth += 1
+                if self._depth == self._element_depth:
+                    start = index
+            else:
+                self._depth -= 1
+                if self._depth < 0:
+                    raise ValueError('Unbalanced %r in response' % character)
+                if self._depth == self._element_depth - 1 and start is not None:
+                    if self._parts:
+                        self._parts.append(text[start:position])
+                        message_text = ''.join(self._parts)
+                        self._parts = []
+                    else:
+                        message_text = text[start:position]
+                    messages.append(Message.from_json(message_text, intern_keys=self._intern_keys)[0])
+                    start = None
+                if self._depth == 0:
+                    self._done = True
+                    done_position = position
+
+        # Only keep the text of the message being received
+        if start is not None:
+            self._parts.append(text[start:])
+        elif self._done and text[done_position:].strip():
+            raise ValueError('Unexpected data after the end of the response: %r' % text[done_position:][:20])
+        return messages
+
+    def close(self):
+        messages = []
+        text = self._decoder.decode(b'', final=True)
+        if text:
+            messages = self._scan(text)
+        if not self._done or self._in_string or self._parts:
+            raise ValueError('Response ended before the end of the messages')
+        return messages
+
+    def feed(self, data):
+        text = self._decoder.decode(data)
+        if not text:
+            return []
+        return self._scan(text)
+
+
+class StreamingResponse(object):
+    """
+    Glue between a streaming HTTP request and the client: it parses the body
+    as it arrives and passes each message on right away, keeping track of the
+    sent messages that have been replied to so that only the others are
+    failed if the request breaks down halfway through.
+    """
+
+    def __init__(self, messages, receive, encoding='utf8', intern_keys=False):
+        self.code = None
+        self._messages = messages
+        self._pending_ids = set(message.id for message in messages)
+        self._receive = receive
+        self._parser = MessageStreamParser(encoding=encoding, intern_keys=intern_keys)
+
+    @property
+    def pending_messages(self):
+        return [message for message in self._messages if message.id in self._pending_ids]
+
+    def _dispatch(self, messages):
+        for message in messages:
+            if message.successful is not None:
+                self._pending_ids.discard(message.id)
+            self._receive(message)
+
+    def close(self):
+        self._dispatch(self._parser.close())
+
+    def handle_chunk(self, chunk):
+        if self.code != 200:
+            return
+        self._dispatch(self._parser.feed(chunk))
+
+    def handle_header(self, line):
+        if line.startswith('HTTP/'):
+            self.code = parse_response_start_line(line.strip()).code
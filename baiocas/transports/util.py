@@ -3,21 +3,48 @@ from email.utils import mktime_tz
 from email.utils import parsedate_tz
 
 
-def is_cookie_expired(cookie):
+def get_cookie_expiration(cookie):
     value = None
     if cookie['max-age']:
         value = cookie['max-age']
     elif cookie['expires']:
         value = cookie['expires']
     if not value:
-        return False
+        return None
     if value.isdigit():
         time_received = getattr(cookie, 'time_received', time.time())
-        expires = time_received + int(value)
-    else:
-        expires = parsedate_tz(value)
-        if expires:
-            expires = mktime_tz(expires)
+        return time_received + int(value)
+    expires = parsedate_tz(value)
+    if expires:
+        return mktime_tz(expires)
+    return None
+
+
+def parse_accept_encoding(value):
+    """
+    Parse an Accept-Encoding header into a dict of quality values (0 to 1)
+    by content coding. Codings without a q parameter get 1.
+    """
+    qualities = {}
+    for item in value.split(','):
+        parts = item.split(';')
+        coding = parts[0].strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for parameter in parts[1:]:
+            name, _, parameter_value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = min(max(float(parameter_value.strip()), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def is_cookie_expired(cookie):
+    expires = get_cookie_expiration(cookie)
     if expires and expires <= time.time():
         return True
     return False
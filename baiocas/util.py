@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from baiocas.timer_wheel import Timer
+
+_MISSING = object()
+
+_numpy = []
+
+
+def add_timeout(client, delay, callback):
+    """
+    Call back after delay milliseconds on the IO loop of the client, going
+    through its timer wheel when it has one.
+    """
+    timer_wheel = client.options['timer_wheel']
+    if timer_wheel is not None:
+        return timer_wheel.add_timeout(delay, callback)
+    return client.io_loop.add_timeout(timedelta(seconds=delay / 1000.0), callback)
+
+
+def find_channel_entry(entries, cache, channel_id):
+    """
+    Find what is registered for a channel in a dict keyed by channel ID,
+    where entries can be registered for wildcard channels and the most
+    specific one wins. What was found for each channel is kept in the cache,
+    which needs clearing whenever the entries change.
+    """
+    if not entries:
+        return None
+    try:
+        return cache[channel_id]
+    except KeyError:
+        pass
+    entry = entries.get(channel_id)
+    if entry is None:
+        for wild in channel_id.get_wilds():
+            entry = entries.get(wild)
+            if entry is not None:
+                break
+    cache[channel_id] = entry
+    return entry
+
+
+def get_key(channel_id, data, path=None):
+    """
+    Get the key under which messages replace each other when conflating or
+    coalescing: the channel, plus the value at the path in the data if there
+    is one. Returns None when that value can't be hashed (e.g. a dict or a
+    list), in which case the message shouldn't replace any other.
+    """
+    if path is None:
+        return channel_id
+    key = (channel_id, get_path(data, path))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def get_numpy():
+    """
+    Get the NumPy module, or None when it isn't installed. NumPy is optional
+    and slow to import, so it is only imported the first time it's needed
+    rather than whenever baiocas is.
+    """
+    if not _numpy:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy.append(numpy)
+    return _numpy[0]
+
+
+def get_path(data, path, default=None):
+    """
+    Get the value at a dotted path (e.g. "quote.symbol") in message data,
+    looking up keys of dicts, indexes of lists and attributes of other
+    objects such as the ones decoded with a schema.
+    """
+    for name in path.split('.') if isinstance(path, str) else path:
+        if isinstance(data, dict):
+            data = data.get(name, _MISSING)
+        elif isinstance(data, (list, tuple)):
+            try:
+                data = data[int(name)]
+            except (IndexError, ValueError):
+                return default
+        else:
+            data = getattr(data, name, _MISSING)
+        if data is _MISSING:
+            return default
+    return data
+
+
+def remove_timeout(client, timeout):
+    if isinstance(timeout, Timer):
+        timeout.cancel()
+    else:
+        client.io_loop.remove_timeout(timeout)
@@ -0,0 +1,146 @@
+"""
+Minimal stand-in Bayeux server used by the benchmarks.
+
+It implements just enough of the long-polling protocol for the client to
+handshake, connect, subscribe and publish against it: connects are held until
+a message is queued for the client or the connect timeout expires, and each
+subscribe queues a snapshot message for the subscribed channel. An artificial
+per-request latency can be added to make round trips visible.
+"""
+import asyncio
+import itertools
+import json
+import time
+import zlib
+
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.web import Application
+from tornado.web import RequestHandler
+
+
+class Session(object):
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.queue = []
+        self.subscriptions = set()
+        self.event = asyncio.Event()
+
+    def deliver(self, message):
+        self.queue.append(message)
+        self.event.set()
+
+    def drain(self):
+        messages = self.queue
+        self.queue = []
+        self.event.clear()
+        return messages
+
+
+class BayeuxServer(object):
+
+    def __init__(self, latency=0, connect_timeout=10000, snapshot=None, **settings):
+        self.latency = latency
+        self.connect_timeout = connect_timeout
+        self.snapshot = snapshot if snapshot is not None else {'snapshot': True}
+        self.sessions = {}
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self._client_ids = itertools.count(1)
+        self._application = Application([(r'/cometd.*', BayeuxHandler, {'server': self})], **settings)
+        self._http_server = None
+
+    def listen(self, decompress_request=False):
+        sockets = bind_sockets(0, '127.0.0.1')
+        self._http_server = HTTPServer(self._application, decompress_request=decompress_request)
+        self._http_server.add_sockets(sockets)
+        return 'http://127.0.0.1:%d/cometd' % sockets[0].getsockname()[1]
+
+    def stop(self):
+        if self._http_server:
+            self._http_server.stop()
+
+    def publish(self, channel, data):
+        for session in self.sessions.values():
+            if channel in session.subscriptions:
+                session.deliver({'channel': channel, 'data': data})
+
+    async def handle(self, messages):
+        if self.latency:
+            await asyncio.sleep(self.latency / 1000.0)
+        replies = []
+        connect = None
+        session = None
+        for message in messages:
+            channel = message.get('channel')
+            reply = {'channel': channel, 'id': message.get('id'), 'successful': True}
+            session = self.sessions.get(message.get('clientId'), session)
+            if channel == '/meta/handshake':
+                session = Session(str(next(self._client_ids)))
+                self.sessions[session.client_id] = session
+                reply.update(
+                    clientId=session.client_id,
+                    version='1.0',
+                    supportedConnectionTypes=['long-polling'],
+                    advice={'reconnect': 'retry', 'interval': 0, 'timeout': self.connect_timeout}
+                )
+            elif session is None:
+                reply.update(successful=False, error='402::Unknown client', advice={'reconnect': 'handshake'})
+            elif channel == '/meta/connect':
+                connect = (message, reply)
+                continue
+            elif channel in ('/meta/subscribe', '/meta/unsubscribe'):
+                subscription = message.get('subscription')
+                reply['subscription'] = subscription
+                if not isinstance(subscription, list):
+                    subscription = [subscription]
+                for channel_id in subscription:
+                    if channel == '/meta/subscribe':
+                        session.subscriptions.add(channel_id)
+                        session.deliver({'channel': channel_id, 'data': self.snapshot})
+                    else:
+                        session.subscriptions.discard(channel_id)
+            elif channel == '/meta/disconnect':
+                self.sessions.pop(session.client_id, None)
+            else:
+                self.publish(channel, message.get('data'))
+            replies.append(reply)
+
+        # Hold the connect until there is something to deliver
+        if connect is not None:
+            message, reply = connect
+            timeout = (message.get('advice') or {}).get('timeout', self.connect_timeout)
+            if timeout and not session.queue:
+                try:
+                    await asyncio.wait_for(session.event.wait(), timeout / 1000.0)
+                except asyncio.TimeoutError:
+                    pass
+            replies.append(reply)
+            replies.extend(session.drain())
+        return replies
+
+
+class BayeuxHandler(RequestHandler):
+
+    def initialize(self, server):
+        self.server = server
+
+    async def post(self):
+        self.server.requests += 1
+        self.server.request_bytes += int(self.request.headers.get('Content-Length') or len(self.request.body))
+        body = self.request.body
+        if self.request.headers.get('Content-Encoding') in ('gzip', 'deflate'):
+            body = zlib.decompress(body, zlib.MAX_WBITS | 32)
+        replies = await self.server.handle(json.loads(body))
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        body = json.dumps(replies).encode('utf8')
+        self.server.response_bytes += len(body)
+        self.write(body)
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -0,0 +1,87 @@
+"""
+Compare per-message listeners with columnar subscriptions when computing a
+volume weighted average price over every poll of quote messages.
+
+Uses NumPy for the columns when it is installed and array.array otherwise.
+
+Usage: python benchmarks/columnar.py [--messages N] [--batch N]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from tornado.ioloop import IOLoop
+
+from baiocas.client import Client
+from baiocas.message import Message
+from baiocas.util import get_numpy
+
+numpy = get_numpy()
+
+
+def create_polls(count, batch):
+    random.seed(count)
+    return [[
+        Message(channel='/quotes/%s' % random.choice(['AAPL', 'MSFT', 'GOOG', 'AMZN']), data={
+            'price': round(random.uniform(100, 200), 2),
+            'size': random.randint(1, 1000),
+            'timestamp': 1700000000000 + index
+        }) for index in range(start, min(start + batch, count))
+    ] for start in range(0, count, batch)]
+
+
+def per_message(client, totals):
+
+    def listener(channel, message):
+        totals[0] += message.data['price'] * message.data['size']
+        totals[1] += message.data['size']
+    listener.__name__ = 'per_message'
+    client.get_channel('/quotes/*').subscribe(listener)
+
+
+def vectorized(client, totals):
+
+    def listener(channel, columns):
+        prices = columns['price']
+        sizes = columns['size']
+        if numpy is not None:
+            totals[0] += float(numpy.dot(prices, sizes))
+            totals[1] += int(sizes.sum())
+        else:
+            totals[0] += sum(map(float.__mul__, prices, map(float, sizes)))
+            totals[1] += sum(sizes)
+    listener.__name__ = 'vectorized'
+    client.get_channel('/quotes/*').subscribe_columnar(listener, fields=['price', 'size'])
+
+
+async def run(polls, count, subscribe):
+    client = Client('http://www.example.com')
+    client.start_batch()
+    totals = [0.0, 0]
+    subscribe(client, totals)
+    start = time.perf_counter()
+    for poll in polls:
+        client.receive_messages(poll)
+
+        # Let the columns of the poll be delivered
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    return elapsed, totals
+
+
+def main(count, batch):
+    polls = create_polls(count, batch)
+    print('Listener time per message (%d messages in polls of %d, %s columns)' % (
+        count, batch, 'NumPy' if numpy is not None else 'array.array'))
+    for name, subscribe in (('per-message', per_message), ('columnar', vectorized)):
+        elapsed, totals = IOLoop.current().run_sync(lambda: run(polls, count, subscribe))
+        print('  %-12s %6.2f us/message  (VWAP %.4f)' % (name, elapsed * 1e6 / count, totals[0] / totals[1]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--batch', type=int, default=100)
+    options = parser.parse_args()
+    main(options.messages, options.batch)
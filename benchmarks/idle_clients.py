@@ -0,0 +1,90 @@
+"""
+Measure the memory and CPU cost of idle clients, with every transport using
+its own HTTP client context (and so its own HTTP clients) versus all of them
+sharing one context.
+
+Memory is the traced allocation growth (tracemalloc) per client after
+creating the clients. CPU is the process time spent per client while all the
+clients are connected with their connects held by the local stand-in server.
+
+Usage: python benchmarks/idle_clients.py [--clients N] [--idle SECONDS]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from bayeux_server import BayeuxServer
+from tornado.ioloop import IOLoop
+
+from baiocas.client import Client
+from baiocas.status import ClientStatus
+from baiocas.transports.context import HttpClientContext
+from baiocas.transports.long_polling import LongPollingHttpTransport
+
+
+def create_clients(url, count, shared):
+
+    # Raise the simultaneous request limit so that every client can have a
+    # connect held at the same time, as well as a publish or disconnect
+    contexts = [HttpClientContext(max_clients=count * 2)] if shared else []
+    clients = []
+    for _ in range(count):
+        if not shared:
+            contexts.append(HttpClientContext(max_clients=2))
+        client = Client(url)
+        client.register_transport(LongPollingHttpTransport(http_context=contexts[-1]))
+        clients.append(client)
+    return clients, contexts
+
+
+async def idle(server, clients, seconds):
+    for client in clients:
+        client.handshake()
+    while any(client.status != ClientStatus.CONNECTED or not client._connected for client in clients):
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)
+    start = time.process_time()
+    await asyncio.sleep(seconds)
+    elapsed = time.process_time() - start
+    for client in clients:
+        client.disconnect(sync=False)
+    await asyncio.sleep(0.2)
+    return elapsed
+
+
+def run(url, server, count, seconds, shared):
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    clients, contexts = create_clients(url, count, shared)
+    created = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in snapshot.compare_to(baseline, 'filename'))
+    cpu = IOLoop.current().run_sync(lambda: idle(server, clients, seconds))
+    for context in contexts:
+        context.close()
+    print('  %-8s %8.1f KiB/client  %7.1f us/client to create  %7.2f us CPU/client/s idle' % (
+        'shared' if shared else 'isolated',
+        memory / 1024.0 / count,
+        created * 1e6 / count,
+        cpu * 1e6 / count / seconds
+    ))
+
+
+def main(count, seconds):
+    server = BayeuxServer(connect_timeout=60000)
+    url = server.listen()
+    print('Idle clients (%d clients, %ss idle)' % (count, seconds))
+    for shared in (False, True):
+        run(url, server, count, seconds, shared)
+    server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--idle', type=float, default=2.0)
+    options = parser.parse_args()
+    main(options.clients, options.idle)
@@ -0,0 +1,74 @@
+"""
+Measure the memory held by decoded messages and the decoding time, with and
+without key interning, when buffering many messages decoded from separate
+responses.
+
+Memory is the traced allocation growth (tracemalloc) per message kept.
+
+Usage: python benchmarks/intern_keys.py [--messages N] [--batch N]
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+from baiocas.message import Message
+
+
+def create_responses(count, batch):
+    random.seed(count)
+    responses = []
+    for start in range(0, count, batch):
+        responses.append(json.dumps([{
+            'channel': '/quotes/%s' % random.choice(['AAPL', 'MSFT', 'GOOG', 'AMZN']),
+            'id': str(index),
+            'data': {
+                'symbol': random.choice(['AAPL', 'MSFT', 'GOOG', 'AMZN']),
+                'bid': round(random.uniform(100, 200), 2),
+                'ask': round(random.uniform(100, 200), 2),
+                'bidSize': random.randint(1, 1000),
+                'askSize': random.randint(1, 1000),
+                'timestamp': 1700000000000 + index
+            }
+        } for index in range(start, min(start + batch, count))]).encode('utf8'))
+    return responses
+
+
+def run(responses, count, intern_keys):
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    start = time.perf_counter()
+    messages = []
+    for response in responses:
+        messages.extend(Message.from_json(response, encoding='utf8', intern_keys=intern_keys))
+    elapsed = time.perf_counter() - start
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    memory = sum(stat.size_diff for stat in snapshot.compare_to(baseline, 'filename'))
+    print('  intern_keys=%-5s %7.1f bytes/message  %6.2f us/message to decode' % (
+        intern_keys, memory / float(count), elapsed * 1e6 / count))
+    return messages
+
+
+def main(count, batch):
+    responses = create_responses(count, batch)
+    print('Decoded message memory (%d messages in responses of %d)' % (count, batch))
+    for intern_keys in (False, True):
+        run(responses, count, intern_keys)
+
+    # Timing without tracemalloc, which slows down allocations
+    for intern_keys in (False, True):
+        start = time.perf_counter()
+        for response in responses:
+            Message.from_json(response, encoding='utf8', intern_keys=intern_keys)
+        print('  intern_keys=%-5s %6.2f us/message to decode (untraced)' % (
+            intern_keys, (time.perf_counter() - start) * 1e6 / count))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=1)
+    options = parser.parse_args()
+    main(options.messages, options.batch)
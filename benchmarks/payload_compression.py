@@ -0,0 +1,80 @@
+"""
+Measure the compression ratio and per-message latency of CompressionExtension
+with and without a trained preset dictionary, compared to sending payloads
+uncompressed. Half of the synthetic payloads are used to train the
+dictionary and the other half are measured.
+
+Usage: python benchmarks/payload_compression.py [--messages N]
+"""
+import argparse
+import json
+import random
+import time
+
+from baiocas.extensions.compression import CompressionExtension
+from baiocas.extensions.compression import train_dictionary
+from baiocas.message import Message
+
+
+def create_payloads(count):
+    random.seed(count)
+    payloads = []
+    for index in range(count):
+        payloads.append({
+            'type': random.choice(['quote', 'trade']),
+            'symbol': random.choice(['AAPL', 'MSFT', 'GOOG', 'AMZN', 'NVDA', 'META']),
+            'price': round(random.uniform(100, 500), 2),
+            'size': random.randint(1, 5000),
+            'exchange': random.choice(['NASDAQ', 'NYSE', 'ARCA']),
+            'conditions': random.sample(['regular', 'odd_lot', 'opening', 'closing'], 2),
+            'sequence': index
+        })
+    return payloads
+
+
+def measure(name, extension, payloads):
+    original = 0
+    sent = 0
+    send_time = 0.0
+    receive_time = 0.0
+    for payload in payloads:
+        message = Message(channel='/quotes', data=payload)
+        original += len(json.dumps(payload))
+        if extension is not None:
+            start = time.perf_counter()
+            extension.send(message)
+            send_time += time.perf_counter() - start
+        sent += len(json.dumps(message.data))
+        if 'ext' in message:
+            sent += len(json.dumps({'ext': message['ext']})) - 2
+        if extension is not None:
+            start = time.perf_counter()
+            extension.receive(message)
+            receive_time += time.perf_counter() - start
+            assert message.data == payload
+    print('  %-18s %6.1f bytes/message  ratio %5.2f  send %6.1f us  receive %6.1f us' % (
+        name,
+        sent / len(payloads),
+        original / float(sent),
+        send_time * 1e6 / len(payloads),
+        receive_time * 1e6 / len(payloads)
+    ))
+
+
+def main(count):
+    payloads = create_payloads(count * 2)
+    training, payloads = payloads[:count], payloads[count:]
+    start = time.perf_counter()
+    dictionary = train_dictionary(training)
+    print('Payload compression (%d messages, %d byte dictionary trained in %.0fms)' % (
+        count, len(dictionary), (time.perf_counter() - start) * 1000))
+    measure('uncompressed', None, payloads)
+    measure('no dictionary', CompressionExtension(), payloads)
+    measure('trained dictionary', CompressionExtension(dictionary), payloads)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=5000)
+    options = parser.parse_args()
+    main(options.messages)
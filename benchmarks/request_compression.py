@@ -0,0 +1,87 @@
+"""
+Compare request body compression settings of the long-polling transport at
+several payload sizes against a local stand-in server: bytes on the wire per
+request, client CPU time to build each request (serialization plus
+compression) and the round trip time of a publish.
+
+Usage: python benchmarks/request_compression.py [--requests N]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from bayeux_server import BayeuxServer
+from tornado.ioloop import IOLoop
+
+from baiocas.client import Client
+from baiocas.message import Message
+from baiocas.status import ClientStatus
+from baiocas.transports.long_polling import LongPollingHttpTransport
+
+SIZES = (256, 2048, 16384, 131072)
+
+ENCODINGS = (None, 'gzip', 'deflate')
+
+
+def create_payload(size):
+
+    # Repetitive records, like a batch of quotes
+    random.seed(size)
+    payload = []
+    while len(Message.to_json(payload)) < size:
+        payload.append({
+            'symbol': random.choice(['AAPL', 'MSFT', 'GOOG', 'AMZN']),
+            'price': round(random.uniform(100, 200), 2),
+            'volume': random.randint(1, 10000),
+            'exchange': 'NASDAQ'
+        })
+    return payload
+
+
+async def measure(client, transport, server, payload, requests):
+    messages = [Message({'channel': '/bench', 'data': payload, 'clientId': client.client_id, 'id': '1'})]
+    server.requests = 0
+    server.request_bytes = 0
+    cpu = []
+    round_trips = []
+    for _ in range(requests):
+        start = time.process_time()
+        transport._prepare_request(messages)
+        cpu.append(time.process_time() - start)
+        start = time.perf_counter()
+        await transport.send(messages)
+        round_trips.append(time.perf_counter() - start)
+    return server.request_bytes / server.requests, statistics.median(cpu), statistics.median(round_trips)
+
+
+async def run(url, server, requests):
+    for size in SIZES:
+        payload = create_payload(size)
+        print('Payload of %d bytes' % len(Message.to_json(payload)))
+        for encoding in ENCODINGS:
+            transport = LongPollingHttpTransport(request_compression=encoding, compression_threshold=0)
+            client = Client(url)
+            client.register_transport(transport)
+            client.handshake()
+            while client.status != ClientStatus.CONNECTED:
+                await asyncio.sleep(0.01)
+            wire_bytes, cpu, round_trip = await measure(client, transport, server, payload, requests)
+            print('  %-8s %9.0f bytes/request  %8.1f us CPU/request  %7.2f ms round trip' % (
+                encoding or 'none', wire_bytes, cpu * 1e6, round_trip * 1000))
+            client.disconnect(sync=False)
+
+
+def main(requests):
+    server = BayeuxServer()
+    url = server.listen()
+    IOLoop.current().run_sync(lambda: run(url, server, requests))
+    server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50)
+    options = parser.parse_args()
+    main(options.requests)
@@ -0,0 +1,66 @@
+"""
+Measure the time from handshake() to the first message delivered to a
+subscription, with and without the fast_start option, against a local
+stand-in server with an artificial per-request latency.
+
+Usage: python benchmarks/session_startup.py [--latency MS] [--runs N]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from bayeux_server import BayeuxServer
+from tornado.ioloop import IOLoop
+
+from baiocas.client import get_client
+
+
+async def time_to_first_message(client, channels):
+    received = asyncio.Event()
+    start = time.perf_counter()
+    client.handshake()
+    for channel_id in channels:
+        client.get_channel(channel_id).subscribe(lambda channel, message: received.set())
+    await received.wait()
+    elapsed = time.perf_counter() - start
+    client.disconnect(sync=False)
+    return elapsed
+
+
+async def run(server, clients, channels):
+    channel_ids = ['/startup/%d' % index for index in range(channels)]
+    for fast_start in (False, True):
+        timings = []
+        for client in clients[fast_start]:
+            timings.append(await time_to_first_message(client, channel_ids))
+            await asyncio.sleep(0.05)
+        print('  fast_start=%-5s median %7.1fms  min %7.1fms  (%d requests)' % (
+            fast_start,
+            statistics.median(timings) * 1000,
+            min(timings) * 1000,
+            server.requests
+        ))
+        server.requests = 0
+
+
+def main(latency, runs, channels):
+
+    server = BayeuxServer(latency=latency)
+    url = server.listen()
+    clients = dict(
+        (fast_start, [get_client(url, fast_start=fast_start) for _ in range(runs)])
+        for fast_start in (False, True)
+    )
+    print('Time to first message (latency %dms, %d channels, %d runs)' % (latency, channels, runs))
+    IOLoop.current().run_sync(lambda: run(server, clients, channels))
+    server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=int, default=50, help='per-request latency in ms')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--channels', type=int, default=10)
+    options = parser.parse_args()
+    main(options.latency, options.runs, options.channels)
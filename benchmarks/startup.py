@@ -0,0 +1,66 @@
+"""
+Measure the cold start cost of the client: the time to import baiocas.client
+and the time from get_client() to the first request reaching a local
+stand-in server. Every run happens in a fresh interpreter.
+
+Usage: python benchmarks/startup.py [--runs N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def child():
+    start = time.perf_counter()
+    import baiocas.client
+    imported = time.perf_counter() - start
+
+    from bayeux_server import BayeuxServer
+    from tornado.ioloop import IOLoop
+
+    server = BayeuxServer()
+    url = server.listen()
+    timings = {}
+
+    async def first_send():
+        start = time.perf_counter()
+        client = baiocas.client.get_client(url)
+        timings['get_client'] = time.perf_counter() - start
+        client.handshake()
+        while not server.requests:
+            await asyncio.sleep(0)
+        timings['first_send'] = time.perf_counter() - start
+        client.disconnect(sync=False)
+
+    IOLoop.current().run_sync(first_send)
+    server.stop()
+    timings['import'] = imported
+    print(json.dumps(timings))
+
+
+def main(runs):
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, __file__, '--child'], cwd=directory)
+        for name, value in json.loads(output.decode('utf8').strip().splitlines()[-1]).items():
+            results.setdefault(name, []).append(value * 1000)
+    print('Cold start (%d runs)' % runs)
+    for name in ('import', 'get_client', 'first_send'):
+        print('  %-11s median %7.2fms  min %7.2fms' % (name, statistics.median(results[name]), min(results[name])))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.child:
+        child()
+    else:
+        main(options.runs)
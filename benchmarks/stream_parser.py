@@ -0,0 +1,58 @@
+"""
+Measure the time to decode buffered long polling responses with the streaming
+parser and with Message.from_json, for growing numbers of messages, to check
+that streamed decoding stays linear in the size of the body.
+
+Usage: python benchmarks/stream_parser.py [--chunk N] [--repeat N]
+"""
+import argparse
+import json
+import time
+
+from baiocas.message import Message
+from baiocas.transports.streaming import MessageStreamParser
+
+
+def create_body(count):
+    return json.dumps([{
+        'channel': '/quotes/AAPL',
+        'id': str(index),
+        'data': {'symbol': 'AAPL', 'bid': 150.25, 'ask': 150.5, 'timestamp': 1700000000000 + index}
+    } for index in range(count)]).encode('utf8')
+
+
+def parse(body, chunk):
+    parser = MessageStreamParser()
+    messages = []
+    for index in range(0, len(body), chunk):
+        messages.extend(parser.feed(body[index:index + chunk]))
+    messages.extend(parser.close())
+    return messages
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(chunk, repeat):
+    print('Decoding time per response (chunks of %d bytes, best of %d)' % (chunk, repeat))
+    for count in (1, 10, 200, 2000, 32000):
+        body = create_body(count)
+        buffered = measure(lambda: Message.from_json(body, encoding='utf8'), repeat)
+        streamed = measure(lambda: parse(body, chunk), repeat)
+        print('  %6d messages %9d bytes  from_json %9.2f ms  stream %9.2f ms  %5.2f us/message streamed' % (
+            count, len(body), buffered * 1e3, streamed * 1e3, streamed * 1e6 / count))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--chunk', type=int, default=16384)
+    parser.add_argument('--repeat', type=int, default=3)
+    options = parser.parse_args()
+    main(options.chunk, options.repeat)
@@ -0,0 +1,59 @@
+import random
+from unittest import TestCase
+
+from baiocas import backoff
+
+
+class TestBackoffStrategy(TestCase):
+
+    def test_init(self):
+        strategy = backoff.BackoffStrategy()
+        assert strategy.initial == 1000
+        assert strategy.maximum == 60000
+        assert repr(strategy) == 'BackoffStrategy(initial=1000, maximum=60000)'
+        self.assertRaises(NotImplementedError, strategy.get_period, 0, 1)
+
+
+class TestLinearBackoff(TestCase):
+
+    def test_get_period(self):
+        strategy = backoff.LinearBackoff(initial=1000, maximum=2500)
+        assert strategy.get_period(0, 1) == 1000
+        assert strategy.get_period(1000, 2) == 2000
+        assert strategy.get_period(2000, 3) == 3000
+        assert strategy.get_period(3000, 4) == 3000
+
+
+class TestExponentialBackoff(TestCase):
+
+    def test_get_period(self):
+        strategy = backoff.ExponentialBackoff(initial=100, maximum=1000, factor=3)
+        assert strategy.factor == 3
+        assert [strategy.get_period(0, attempt) for attempt in range(1, 5)] == [100, 300, 900, 1000]
+
+    def test_get_period_many_attempts(self):
+        strategy = backoff.ExponentialBackoff(initial=100, maximum=1000, factor=1.5)
+        assert strategy.get_period(0, 10000) == 1000
+        assert backoff.FullJitterBackoff(initial=100, maximum=1000).get_period(0, 10 ** 6) <= 1000
+
+
+class TestFullJitterBackoff(TestCase):
+
+    def test_get_period(self):
+        strategy = backoff.FullJitterBackoff(initial=100, maximum=1000, random_source=random.Random(1))
+        for attempt in range(1, 10):
+            ceiling = min(1000, 100 * 2 ** (attempt - 1))
+            periods = set(strategy.get_period(0, attempt) for _ in range(20))
+            assert all(0 <= period <= ceiling for period in periods)
+            assert len(periods) > 1
+
+
+class TestDecorrelatedJitterBackoff(TestCase):
+
+    def test_get_period(self):
+        strategy = backoff.DecorrelatedJitterBackoff(initial=100, maximum=1000, random_source=random.Random(1))
+        period = 0
+        for attempt in range(1, 20):
+            new_period = strategy.get_period(period, attempt)
+            assert 100 <= new_period <= min(1000, max(100, period * 3))
+            period = new_period
@@ -0,0 +1,72 @@
+from mock import Mock
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from baiocas.bulk import BulkRequest
+from baiocas.channel_id import ChannelId
+from baiocas.message import FailureMessage
+from baiocas.message import Message
+
+
+class TestBulkRequest(AsyncTestCase):
+
+    def setUp(self):
+        super(TestBulkRequest, self).setUp()
+        self.messages = [
+            Message(channel=ChannelId.META_SUBSCRIBE, subscription=['/test1', '/test2']),
+            Message(channel=ChannelId.META_SUBSCRIBE, subscription='/test3')
+        ]
+
+    def test_empty(self):
+        callback = Mock()
+        request = BulkRequest([], callback=callback)
+        assert request.is_done
+        assert request.result() == {}
+        callback.assert_called_once_with({})
+
+    def test_handle(self):
+        request = BulkRequest(self.messages, subscription_ids={'/test1': 1})
+        assert request.subscription_ids == {'/test1': 1}
+        assert not request.handle(Message(channel=ChannelId.META_SUBSCRIBE, id='1'))
+        self.messages[0].id = '1'
+        reply = Message(channel=ChannelId.META_SUBSCRIBE, id='1', successful=True)
+        assert request.handle(reply)
+        assert not request.is_done
+        assert not request.handle(reply)
+        failure = FailureMessage.from_message(self.messages[1])
+        assert request.handle(failure)
+        assert request.is_done
+        assert request.result() == {
+            '/test1': reply,
+            '/test2': reply,
+            '/test3': failure
+        }
+
+    def test_channel_ids(self):
+        request = BulkRequest(self.messages, channel_ids={'/test1': ['/test1', '/test1/a'], '/test3': ['/test3']})
+        for message in self.messages:
+            request.handle(FailureMessage.from_message(message))
+        assert sorted(request.result().keys()) == ['/test1', '/test1/a', '/test3']
+
+    def test_discard(self):
+        request = BulkRequest(self.messages)
+        assert request.discard(self.messages[0])
+        assert not request.discard(self.messages[0])
+        assert request.handle(FailureMessage.from_message(self.messages[1]))
+        assert request.is_done
+        assert sorted(request.result().keys()) == ['/test3']
+
+    def test_callback_exception(self):
+        callback = Mock(side_effect=ValueError())
+        request = BulkRequest(self.messages[1:], callback=callback)
+        assert request.handle(FailureMessage.from_message(self.messages[1]))
+        assert request.is_done
+        assert callback.called
+
+    @gen_test
+    def test_await(self):
+        request = BulkRequest(self.messages)
+        self.io_loop.add_callback(request.handle, FailureMessage.from_message(self.messages[0]))
+        self.io_loop.add_callback(request.handle, FailureMessage.from_message(self.messages[1]))
+        result = yield request
+        assert sorted(result.keys()) == ['/test1', '/test2', '/test3']
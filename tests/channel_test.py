@@ -7,6 +7,7 @@ from baiocas.channel_id import ChannelId
 from baiocas.client import Client
 from baiocas.listener import Listener
 from baiocas.message import Message
+from baiocas.message import RawData
 
 
 class TestChannel(TestCase):
@@ -83,6 +84,17 @@ class TestChannel(TestCase):
         mock_listener.assert_called_once_with(self.channel, self.mock_message, 1, foo='bar')
         assert self.channel.remove_listener(id=listener_id)
 
+    def test_add_subscription(self):
+        mock_subscription = self.create_mock_function()
+        subscription_id = self.channel.add_subscription(mock_subscription, 1, foo='bar')
+        assert not self.client.send.called
+        assert self.channel.has_subscriptions
+        self.channel.notify_listeners(self.channel, self.mock_message)
+        mock_subscription.assert_called_once_with(self.channel, self.mock_message, 1, foo='bar')
+        assert self.channel.remove_subscription(id=subscription_id)
+        assert not self.channel.has_subscriptions
+        assert not self.client.send.called
+
     def test_clear_listeners(self):
         self.channel.clear_listeners()
         mock_listener = self.create_mock_function()
@@ -182,6 +194,52 @@ class TestChannel(TestCase):
             'id': '1'
         })
 
+    def test_publish_raw(self):
+        self.channel.publish_raw(b'{"value": 1}')
+        message = self.client.send.call_args[0][0]
+        assert message == {'channel': '/test', 'data': RawData('{"value": 1}')}
+        data = RawData('[1, 2]')
+        self.channel.publish_raw(data, properties={'id': '1'})
+        assert self.client.send.call_args[0][0] == {'channel': '/test', 'data': data, 'id': '1'}
+
+    def test_subscribe_raw(self):
+        mock_raw_subscription = self.create_mock_function()
+        mock_subscription = self.create_mock_function()
+        self.channel.subscribe(mock_raw_subscription, 1, raw=True)
+        self.channel.subscribe(mock_subscription, foo='bar')
+
+        # Decoded data is encoded for raw subscriptions
+        self.mock_message.data = {'value': 1}
+        self.channel.notify_listeners(self.channel, self.mock_message)
+        message = mock_raw_subscription.call_args[0][1]
+        assert message.data == RawData('{"value": 1}')
+        assert mock_raw_subscription.call_args[0][2:] == (1,)
+        mock_subscription.assert_called_once_with(self.channel, self.mock_message, foo='bar')
+
+        # Raw data is decoded for the other subscriptions
+        raw_message = Message(data=RawData('{"value": 2}'))
+        self.channel.notify_listeners(self.channel, raw_message)
+        mock_raw_subscription.assert_called_with(self.channel, raw_message, 1)
+        message = mock_subscription.call_args[0][1]
+        assert message.data == {'value': 2}
+        assert raw_message.data == RawData('{"value": 2}')
+
+    def test_add_listener_raw(self):
+        mock_listener = self.create_mock_function()
+        self.channel.add_listener(mock_listener, 1, raw=True, foo='bar')
+        self.mock_message.data = {'value': 1}
+        self.channel.notify_listeners(self.channel, self.mock_message)
+        args, kwargs = mock_listener.call_args
+        assert args[1].data == RawData('{"value": 1}')
+        assert args[2:] == (1,)
+        assert kwargs == {'foo': 'bar'}
+
+    def test_subscribe_raw_empty_data(self):
+        mock_subscription = self.create_mock_function()
+        self.channel.subscribe(mock_subscription)
+        self.channel.notify_listeners(self.channel, Message(data=RawData('{ }')))
+        assert not mock_subscription.called
+
     def test_remove_listener(self):
 
         # Add a listener
@@ -1,7 +1,9 @@
 import logging
+import random
 from collections import defaultdict
 from collections import namedtuple
 from contextlib import contextmanager
+from datetime import datetime
 from datetime import timedelta
 
 from mock import Mock
@@ -10,12 +12,20 @@ from tornado.ioloop import IOLoop
 from tornado.testing import AsyncTestCase
 
 from baiocas import errors
+from baiocas.backoff import ExponentialBackoff
+from baiocas.backoff import FullJitterBackoff
 from baiocas.channel_id import ChannelId
 from baiocas.client import Client
 from baiocas.extensions.base import Extension
 from baiocas.message import FailureMessage
 from baiocas.message import Message
+from baiocas.planner import SubscriptionPlanner
+from baiocas.rate_limit import HANDSHAKE_LIMITER
+from baiocas.rate_limit import TokenBucket
+from baiocas.serialization import decode_datetime
+from baiocas.serialization import FieldDecoder
 from baiocas.status import ClientStatus
+from baiocas.timer_wheel import TimerWheel
 from baiocas.transports.base import Transport
 
 
@@ -68,6 +78,7 @@ class MockTransport(Transport):
         self.__name = name
         self.__only_versions = only_versions
         self.sent_messages = []
+        self.send_calls = []
         super(MockTransport, self).__init__()
 
     @property
@@ -81,6 +92,7 @@ class MockTransport(Transport):
 
     def clear_sent_messages(self):
         self.sent_messages = []
+        self.send_calls = []
 
     def receive(self, messages):
         for message in messages:
@@ -91,14 +103,24 @@ class MockTransport(Transport):
         for message in messages:
             print(('Send: %s' % message))
         self.sent_messages += messages
+        self.send_calls.append(messages)
 
 
 class TestClient(AsyncTestCase):
 
     DEFAULT_OPTIONS = {
         'backoff_period_increment': 1000,
+        'backoff_strategy': None,
+        'fast_start': False,
+        'handshake_limiter': HANDSHAKE_LIMITER,
         'maximum_backoff_period': 60000,
+        'maximum_endpoint_failures': 3,
+        'maximum_subscriptions_per_message': 100,
+        'publish_limiter': None,
+        'resubscribe_on_handshake': False,
         'reverse_incoming_extensions': True,
+        'subscription_planner': None,
+        'timer_wheel': None,
         'advice': {
             'timeout': 60000,
             'interval': 0,
@@ -222,6 +244,23 @@ class TestClient(AsyncTestCase):
         options['temp'] = 'dummy'
         assert self.client.options == self.DEFAULT_OPTIONS
 
+    def test_backoff_strategy(self):
+        self.client.configure(backoff_strategy=ExponentialBackoff(initial=500, maximum=1500))
+        self.connect_client()
+        connect = Message(channel=ChannelId.META_CONNECT, client_id=self.client.client_id)
+        with self.capture_timeouts() as timeouts:
+            for _ in range(3):
+                self.client.fail_messages([connect])
+        assert [timeout.deadline for timeout in timeouts] == [timedelta(milliseconds=1500)]
+        assert self.client.backoff_period == 1500
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_CONNECT,
+                successful=True
+            )
+        ])
+        assert self.client.backoff_period == 0
+
     def test_clear_subscriptions(self):
         mock_listener = self.create_mock_function()
         mock_subscription = self.create_mock_function()
@@ -342,6 +381,77 @@ class TestClient(AsyncTestCase):
             assert mock_flush_batch.call_count == 1
         self.assertRaises(errors.BatchError, self.client.end_batch)
 
+    def test_endpoint_failover(self):
+
+        # Subscribe on an established session with the first endpoint
+        client = Client(['http://one.example.com', 'http://two.example.com'])
+        client.io_loop = self.io_loop
+        client.register_transport(self.transport)
+        self.client = client
+        self.connect_client()
+        assert [endpoint.url for endpoint in client.endpoints] == ['http://one.example.com', 'http://two.example.com']
+        assert client.endpoints[0].is_measured
+        channel = client.get_channel('/test')
+        channel.subscribe(self.create_mock_function())
+        self.transport.clear_sent_messages()
+        mock_listener = self.create_mock_function()
+        client.register_listener(client.EVENT_ENDPOINT_CHANGE, mock_listener)
+
+        # Connect failures below the threshold keep the endpoint
+        connect = Message(channel=ChannelId.META_CONNECT, connection_type=self.transport.name)
+        with self.capture_timeouts():
+            client.fail_messages([connect.copy()], errors.TimeoutError())
+            client.fail_messages([connect.copy()], errors.TimeoutError())
+        assert client.url == 'http://one.example.com'
+        assert client.endpoints[0].consecutive_failures == 2
+
+        # Another failure moves to the next endpoint and re-handshakes there
+        # right away
+        self.transport.clear_sent_messages()
+        client.fail_messages([connect.copy()], errors.TimeoutError())
+        assert client.url == 'http://two.example.com'
+        assert self.transport.url == 'http://two.example.com'
+        mock_listener.assert_called_once_with(client, 'http://one.example.com', 'http://two.example.com')
+        assert [message.channel for message in self.transport.sent_messages] == [ChannelId.META_HANDSHAKE]
+        assert channel.has_subscriptions
+
+        # The subscriptions are replayed on the new session
+        self.transport.clear_sent_messages()
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_HANDSHAKE,
+                successful=True,
+                client_id='client-2',
+                supported_connection_types=[self.transport.name],
+                version=Client.BAYEUX_VERSION
+            )
+        ])
+        assert [message.channel for message in self.transport.sent_messages] == [
+            ChannelId.META_CONNECT,
+            ChannelId.META_SUBSCRIBE
+        ]
+        assert self.transport.sent_messages[1].subscription == '/test'
+        assert client.endpoints[1].is_measured
+
+    def test_endpoint_selection(self):
+        client = Client(['http://one.example.com', 'http://two.example.com'])
+        client.register_transport(self.transport)
+        one, two = client.endpoints
+        one.record_rtt(200)
+        two.record_rtt(50)
+        client.handshake()
+        assert client.url == 'http://two.example.com'
+        assert self.transport.url == 'http://two.example.com'
+
+    def test_endpoint_single(self):
+        connect = Message(channel=ChannelId.META_CONNECT, connection_type=self.transport.name)
+        self.connect_client()
+        with self.capture_timeouts():
+            for _ in range(5):
+                self.client.fail_messages([connect.copy()], errors.TimeoutError())
+        assert self.client.url == 'http://www.example.com'
+        assert self.client.endpoints[0].consecutive_failures == 5
+
     def test_fail_messages(self):
         self.connect_client()
         mock_message_1 = self.mock_message.copy()
@@ -358,6 +468,30 @@ class TestClient(AsyncTestCase):
             ]
         })
 
+    def test_fail_messages_copied_by_extension(self):
+        self.connect_client()
+        extension = MockExtension('mock-extension')
+        extension.send = lambda message: Message(message.copy(), data='encoded')
+        self.client.register_extension(extension)
+        mock_message = self.mock_message.copy()
+        self.client.get_channel('/test').publish(mock_message.data)
+        sent_message = self.transport.sent_messages[-1]
+        assert sent_message.data == 'encoded'
+        exception = Exception()
+        with self.capture_messages() as messages:
+            self.client.fail_messages([sent_message], exception=exception)
+        failure = messages[ChannelId.META_PUBLISH][0]
+        assert failure.request.data == 'dummy'
+        assert failure.id == sent_message.id
+        assert self.client._original_messages == {}
+
+        # Replies clear the original messages that were kept
+        self.client.get_channel('/test').publish(mock_message.data)
+        sent_message = self.transport.sent_messages[-1]
+        assert list(self.client._original_messages) == [sent_message.id]
+        self.transport.receive([Message(channel='/test', id=sent_message.id, successful=True)])
+        assert self.client._original_messages == {}
+
     def test_fail_messages_connect(self):
         self.connect_client()
         mock_message_1 = Message(
@@ -487,6 +621,257 @@ class TestClient(AsyncTestCase):
         assert self.client.get_transport('bad-transport') is None
         assert self.client.get_transport(self.transport.name.upper()) is None
 
+    def test_handshake_fast_start(self):
+        self.client.configure(fast_start=True)
+        mock_subscription = self.create_mock_function()
+        self.client.handshake()
+        self.client.get_channel('/test').subscribe(mock_subscription)
+        self.client.get_channel('/test').publish('dummy')
+        self.transport.clear_sent_messages()
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_HANDSHAKE,
+                successful=True,
+                client_id='client-1',
+                supported_connection_types=[self.transport.name],
+                version=Client.BAYEUX_VERSION
+            )
+        ])
+
+        # The held messages and the connect should go out as one batch
+        assert self.transport.sent_messages == [
+            self.create_sent_message(
+                channel=ChannelId.META_SUBSCRIBE,
+                subscription='/test',
+                id='2'
+            ),
+            self.create_sent_message(
+                channel='/test',
+                data='dummy',
+                id='3'
+            ),
+            self.create_sent_message(
+                channel=ChannelId.META_CONNECT,
+                connection_type=self.transport.name,
+                advice={Message.FIELD_TIMEOUT: 0},
+                id='4'
+            )
+        ]
+        assert len(self.transport.send_calls) == 1
+        assert self.client.status == ClientStatus.CONNECTED
+        assert not self.client.is_batching
+
+    def test_handshake_fast_start_with_interval(self):
+        self.client.configure(fast_start=True)
+        self.client.handshake()
+        self.client.get_channel('/test').publish('dummy')
+        self.transport.clear_sent_messages()
+        with self.capture_timeouts() as timeouts:
+            self.transport.receive([
+                Message(
+                    channel=ChannelId.META_HANDSHAKE,
+                    successful=True,
+                    client_id='client-1',
+                    supported_connection_types=[self.transport.name],
+                    version=Client.BAYEUX_VERSION,
+                    advice={Message.FIELD_INTERVAL: 1000}
+                )
+            ])
+        assert len(timeouts) == 1
+        assert [message.channel for message in self.transport.sent_messages] == ['/test']
+
+    def test_handshake_limiter_default(self):
+        self.client.handshake()
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_HANDSHAKE,
+                successful=True,
+                client_id='client-1',
+                supported_connection_types=[self.transport.name],
+                version=Client.BAYEUX_VERSION
+            )
+        ])
+        reconnect = Message(
+            channel=ChannelId.META_CONNECT,
+            successful=False,
+            advice={Message.FIELD_RECONNECT: Message.RECONNECT_HANDSHAKE}
+        )
+
+        # Clients share the global limiter unless it is turned off
+        with patch.object(HANDSHAKE_LIMITER, 'reserve', return_value=0.0) as reserve:
+            self.transport.receive([reconnect])
+            assert reserve.call_count == 1
+            self.client.configure(handshake_limiter=None)
+            with patch.object(self.client, '_schedule_send') as schedule_send:
+                self.transport.receive([reconnect])
+            assert schedule_send.called
+            assert reserve.call_count == 1
+
+    def test_handshake_limiter(self):
+
+        # Simulate a server restart forcing many clients to re-handshake
+        limiter = TokenBucket(rate=10, burst=5, clock=lambda: 0.0)
+        strategy = FullJitterBackoff(initial=1000, maximum=8000, random_source=random.Random(1))
+        clients = []
+        for index in range(50):
+            client = Client(
+                'http://www.example.com',
+                handshake_limiter=limiter,
+                backoff_strategy=strategy
+            )
+            client.io_loop = self.io_loop
+            transport = MockTransport('mock-transport')
+            client.register_transport(transport)
+            client.handshake()
+            transport.receive([
+                Message(
+                    channel=ChannelId.META_HANDSHAKE,
+                    successful=True,
+                    client_id='client-%d' % index,
+                    supported_connection_types=[transport.name],
+                    version=Client.BAYEUX_VERSION
+                )
+            ])
+            transport.clear_sent_messages()
+            clients.append((client, transport))
+        with self.capture_timeouts() as timeouts:
+            for client, transport in clients:
+                transport.receive([
+                    Message(
+                        channel=ChannelId.META_CONNECT,
+                        successful=False,
+                        advice={Message.FIELD_RECONNECT: Message.RECONNECT_HANDSHAKE}
+                    )
+                ])
+
+        # Only the burst handshakes right away, the rest are evenly spread out
+        sent = [client for client, transport in clients if transport.sent_messages]
+        assert len(sent) == 5
+        assert sorted(timeout.deadline for timeout in timeouts) == [
+            timedelta(milliseconds=100 * index) for index in range(1, 46)
+        ]
+
+        # Have every handshake fail; the jittered backoff keeps the retries
+        # from happening in lockstep
+        for timeout in timeouts:
+            timeout.callback()
+        with self.capture_timeouts() as timeouts:
+            for client, transport in clients:
+                assert transport.sent_messages[-1].channel == ChannelId.META_HANDSHAKE
+                transport.receive([
+                    Message(
+                        channel=ChannelId.META_HANDSHAKE,
+                        successful=False
+                    )
+                ])
+        assert len(timeouts) == 50
+        deadlines = set(timeout.deadline for timeout in timeouts)
+        assert len(deadlines) == 50
+        assert max(deadlines) >= timedelta(milliseconds=5000)
+
+    def test_handshake_resubscribe(self):
+
+        # Subscribe to a few channels on an established session
+        self.client.configure(resubscribe_on_handshake=True, maximum_subscriptions_per_message=2)
+        self.connect_client()
+        mock_subscription = self.create_mock_function()
+        for channel_id in ('/test1', '/test2', '/test3'):
+            self.client.get_channel(channel_id).subscribe(mock_subscription)
+        assert len(self.transport.sent_messages) == 3
+        self.transport.clear_sent_messages()
+
+        # Have the server force a re-handshake
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_CONNECT,
+                successful=False,
+                advice={Message.FIELD_RECONNECT: Message.RECONNECT_HANDSHAKE}
+            )
+        ])
+        assert [message.channel for message in self.transport.sent_messages] == [ChannelId.META_HANDSHAKE]
+        self.transport.clear_sent_messages()
+
+        # Subscribe to another channel while the handshake is in progress
+        self.client.get_channel('/test4').subscribe(mock_subscription)
+        assert self.transport.sent_messages == []
+
+        # Check that the subscriptions are replayed in chunks after the
+        # handshake, ahead of the subscribe queued by the application
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_HANDSHAKE,
+                successful=True,
+                client_id='client-2',
+                supported_connection_types=[self.transport.name],
+                version=Client.BAYEUX_VERSION
+            )
+        ])
+        messages = self.transport.sent_messages
+        assert [message.channel for message in messages] == [
+            ChannelId.META_CONNECT,
+            ChannelId.META_SUBSCRIBE,
+            ChannelId.META_SUBSCRIBE,
+            ChannelId.META_SUBSCRIBE
+        ]
+        assert [message.subscription for message in messages[1:]] == [
+            ['/test1', '/test2'],
+            '/test3',
+            '/test4'
+        ]
+        assert all(message.client_id == 'client-2' for message in messages)
+
+        # The listeners should still be in place
+        channel = self.client.get_channel('/test1')
+        channel.notify_listeners(channel, self.mock_message)
+        mock_subscription.assert_called_once_with(channel, self.mock_message)
+
+    def test_handshake_resubscribe_after_disconnect(self):
+        self.client.configure(resubscribe_on_handshake=True)
+        self.connect_client()
+        channel = self.client.get_channel('/test')
+        channel.subscribe(self.create_mock_function())
+        self.disconnect_client()
+        self.connect_client()
+        assert not channel.has_subscriptions
+
+    def test_handshake_without_resubscribe(self):
+        self.connect_client()
+        channel = self.client.get_channel('/test')
+        channel.subscribe(self.create_mock_function())
+        self.transport.clear_sent_messages()
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_CONNECT,
+                successful=False,
+                advice={Message.FIELD_RECONNECT: Message.RECONNECT_HANDSHAKE}
+            )
+        ])
+        assert not channel.has_subscriptions
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_HANDSHAKE,
+                successful=True,
+                client_id='client-2',
+                supported_connection_types=[self.transport.name],
+                version=Client.BAYEUX_VERSION
+            )
+        ])
+        assert [message.channel for message in self.transport.sent_messages] == [
+            ChannelId.META_HANDSHAKE,
+            ChannelId.META_CONNECT
+        ]
+
+    def test_publish_limiter(self):
+        clock = Mock(return_value=0.0)
+        self.client.configure(publish_limiter=TokenBucket(rate=10, burst=2, clock=clock))
+        self.connect_client()
+        for index in range(3):
+            self.client.get_channel('/test%d' % index).publish('dummy')
+        assert [message.channel for message in self.transport.sent_messages] == ['/test0', '/test1']
+        clock.return_value = 0.1
+        self.client._drain_throttled()
+        assert [message.channel for message in self.transport.sent_messages] == ['/test0', '/test1', '/test2']
+
     def test_register_extension(self):
 
         # Register extensions
@@ -547,12 +932,351 @@ class TestClient(AsyncTestCase):
         assert mock_listener_1.call_count == 1
         assert mock_listener_2.call_count == 2
 
+    def test_register_decoder(self):
+        decoder = self.client.register_decoder('/quotes/*', {'at': decode_datetime})
+        assert isinstance(decoder, FieldDecoder)
+        self.client.register_schema('/quotes/**', {'at': datetime})
+        mock_subscription = self.create_mock_function()
+        self.client.get_channel('/quotes/*').subscribe(mock_subscription)
+        mock_listener = self.create_mock_function()
+        self.client.register_listener(self.client.EVENT_LISTENER_EXCEPTION, mock_listener)
+
+        # The decoder runs before the schema
+        message = Message(channel='/quotes/abc', data={'at': '2024-01-02T03:04:05'})
+        self.client.receive_messages([message, Message(channel='/quotes/abc', data={'at': 'never'})])
+        assert mock_subscription.call_count == 1
+        assert mock_subscription.call_args[0][1].data.at == datetime(2024, 1, 2, 3, 4, 5)
+        assert message.data == {'at': '2024-01-02T03:04:05'}
+        assert mock_listener.call_count == 1
+        assert isinstance(mock_listener.call_args[0][3], errors.SchemaError)
+
+        # Decoders failing in other ways are reported as schema errors
+        self.client.register_decoder('/quotes/bad', lambda data: data['missing'])
+        self.client.receive_messages([Message(channel='/quotes/bad', data={'at': 'never'}), message])
+        assert mock_subscription.call_count == 2
+        assert mock_listener.call_count == 2
+        error = mock_listener.call_args[0][3]
+        assert isinstance(error, errors.SchemaError)
+        assert error.reason == "KeyError: 'missing'"
+        assert isinstance(error.__cause__, KeyError)
+        assert self.client.unregister_decoder('/quotes/bad')
+
+        # Without the decoder, the schema rejects the data
+        assert self.client.unregister_decoder('/quotes/*')
+        assert not self.client.unregister_decoder('/quotes/*')
+        self.client.receive_messages([message])
+        assert mock_subscription.call_count == 2
+        assert mock_listener.call_count == 3
+
+    def test_register_publish_limit(self):
+        clock = Mock(return_value=0.0)
+        self.client.register_publish_limit('/quotes/*', TokenBucket(rate=10, clock=clock), coalesce=True, key='symbol')
+        self.connect_client()
+        channel = self.client.get_channel('/quotes/x')
+        with patch.object(self.client, '_schedule_drain') as mock_schedule_drain:
+            for price, symbol in enumerate(['A', 'A', 'B', 'A']):
+                channel.publish({'symbol': symbol, 'price': price})
+            self.client.get_channel('/other').publish('dummy')
+        assert [message.channel for message in self.transport.sent_messages] == ['/quotes/x', '/other']
+        assert mock_schedule_drain.call_args[0][0] > 0
+        assert self.client._throttle.coalesced == 1
+
+        # Held back publishes are released as tokens come in
+        self.transport.clear_sent_messages()
+        clock.return_value = 0.1
+        self.client._drain_throttled()
+        clock.return_value = 0.2
+        self.client._drain_throttled()
+        assert [message.data['price'] for message in self.transport.sent_messages] == [3, 2]
+
+        # Batches go through the limits too
+        self.transport.clear_sent_messages()
+        clock.return_value = 0.5
+        mock_message = Message(channel='/quotes/x', data={'symbol': 'A', 'price': 5})
+        with self.client.batch():
+            channel.publish({'symbol': 'A', 'price': 4})
+            self.client.send(mock_message)
+            self.client.get_channel('/other').publish('dummy')
+        assert [message.data for message in self.transport.sent_messages] == [{'symbol': 'A', 'price': 4}, 'dummy']
+        assert len(self.client._throttle) == 1
+
+        # Held back publishes fail on disconnect
+        with self.capture_messages(only_failures=True) as messages:
+            self.disconnect_client()
+        self.check_failure_messages(messages, {
+            ChannelId.META_PUBLISH: [
+                FailureMessage.from_message(
+                    mock_message,
+                    exception=errors.StatusError(ClientStatus.DISCONNECTED)
+                )
+            ]
+        })
+        assert len(self.client._throttle) == 0
+        assert self.client.unregister_publish_limit('/quotes/*')
+        assert not self.client.unregister_publish_limit('/quotes/*')
+
+    def test_register_schema(self):
+        schema = self.client.register_schema('/quotes/*', {'symbol': str, 'price': float}, name='Quote')
+        exact_schema = self.client.register_schema('/quotes/special', {'symbol': str})
+        mock_subscription = self.create_mock_function()
+        raw_subscription = self.create_mock_function()
+        self.client.get_channel('/quotes/**').subscribe(mock_subscription)
+        self.client.get_channel('/quotes/**').subscribe(raw_subscription, raw=True)
+        mock_listener = self.create_mock_function()
+        self.client.register_listener(self.client.EVENT_LISTENER_EXCEPTION, mock_listener)
+
+        # Data is decoded with the schema for every listener
+        self.client.receive_messages([
+            Message(channel='/quotes/abc', data={'symbol': 'ABC', 'price': 5, 'size': 1}),
+            Message(channel='/quotes/special', data={'symbol': 'DEF', 'price': 'n/a'})
+        ])
+        assert [args[1].data for args, _ in mock_subscription.call_args_list] == [
+            schema.type(symbol='ABC', price=5.0),
+            exact_schema.type(symbol='DEF')
+        ]
+        assert raw_subscription.call_args_list == mock_subscription.call_args_list
+        assert not mock_listener.called
+
+        # Invalid data fires the listener exception event instead
+        mock_subscription.reset_mock()
+        message = Message(channel='/quotes/abc', data={'symbol': 'ABC', 'price': 'n/a'})
+        self.client.receive_messages([message])
+        assert not mock_subscription.called
+        error = errors.SchemaError('price', 'expected float, got str')
+        subscriptions = self.client.get_channel('/quotes/**')._subscriptions
+        assert [listener.function for listener in subscriptions] == [mock_subscription, raw_subscription]
+        assert mock_listener.call_args_list == [
+            ((self.client, listener, message, error),) for listener in subscriptions
+        ]
+
+        # Channels without a schema are unaffected, as is unregistering
+        self.client.receive_messages([Message(channel='/other', data={'price': 'n/a'})])
+        assert self.client.unregister_schema('/quotes/*')
+        assert not self.client.unregister_schema('/quotes/*')
+        self.client.receive_messages([message])
+        assert mock_subscription.call_args[0][1].data == {'symbol': 'ABC', 'price': 'n/a'}
+
     def test_register_transport(self):
         transport2 = MockTransport('mock-transport-2')
         assert not self.client.register_transport(self.transport)
         assert self.client.register_transport(transport2)
         assert transport2.name in self.client.get_known_transports()
 
+    def test_send_with_subscription_planner(self):
+
+        # Subscribing past the threshold collapses the siblings in one batch
+        planner = SubscriptionPlanner(threshold=3)
+        self.client.configure(subscription_planner=planner)
+        self.connect_client()
+        mock_subscription = self.create_mock_function()
+        for channel_id in ('/prices/a', '/prices/b'):
+            self.client.get_channel(channel_id).subscribe(mock_subscription)
+        assert [message.subscription for message in self.transport.sent_messages] == ['/prices/a', '/prices/b']
+        self.transport.clear_sent_messages()
+        self.client.get_channel('/prices/c').subscribe(mock_subscription, properties={'ext': {'foo': 'bar'}})
+        assert [(message.channel, message.subscription, message.ext) for message in self.transport.sent_messages] == [
+            (ChannelId.META_SUBSCRIBE, '/prices/*', {'foo': 'bar'}),
+            (ChannelId.META_UNSUBSCRIBE, ['/prices/a', '/prices/b'], {'foo': 'bar'})
+        ]
+        self.transport.clear_sent_messages()
+
+        # Messages for siblings that weren't subscribed are filtered out
+        wild_listener = self.create_mock_function()
+        self.client.get_channel('/prices/*').add_listener(wild_listener)
+        self.transport.receive([
+            Message(channel='/prices/a', data='a'),
+            Message(channel='/prices/z', data='z')
+        ])
+        assert mock_subscription.call_count == 1
+        assert wild_listener.call_count == 1
+        assert '/prices/z' not in [channel_id for channel_id in self.client._channels]
+
+        # Subscriptions covered by the wildcard are not sent
+        self.client.get_channel('/prices/d').subscribe(mock_subscription)
+        self.client.get_channel('/prices/a').unsubscribe(function=mock_subscription)
+        assert self.transport.sent_messages == []
+
+        # Dropping below the threshold splits the wildcard back out
+        self.client.unsubscribe_many(['/prices/b', '/prices/c'])
+        assert [(message.channel, message.subscription) for message in self.transport.sent_messages] == [
+            (ChannelId.META_SUBSCRIBE, '/prices/d'),
+            (ChannelId.META_UNSUBSCRIBE, '/prices/*')
+        ]
+
+    def test_subscribe_many(self):
+
+        # Subscribe to a set of channels, one of which already has a subscription
+        self.client.configure(maximum_subscriptions_per_message=2)
+        self.connect_client()
+        mock_subscription = self.create_mock_function()
+        mock_callback = self.create_mock_function()
+        self.client.get_channel('/test0').subscribe(mock_subscription)
+        self.transport.clear_sent_messages()
+        request = self.client.subscribe_many(
+            ['/test0', '/test1', '/test2', '/test3'],
+            mock_subscription,
+            1,
+            foo='bar',
+            callback=mock_callback
+        )
+        assert sorted(request.subscription_ids.keys()) == ['/test0', '/test1', '/test2', '/test3']
+
+        # Check that the subscribes went out as chunked arrays in one batch
+        messages = self.transport.sent_messages
+        assert [message.subscription for message in messages] == [
+            ['/test1', '/test2'],
+            '/test3'
+        ]
+        assert not request.is_done
+
+        # Reply to the subscribes and check the aggregated result
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_SUBSCRIBE,
+                id=messages[0].id,
+                successful=True,
+                subscription=['/test1', '/test2']
+            )
+        ])
+        assert not request.is_done
+        reply = Message(
+            channel=ChannelId.META_SUBSCRIBE,
+            id=messages[1].id,
+            successful=False,
+            subscription='/test3'
+        )
+        self.transport.receive([reply])
+        assert request.is_done
+        result = request.result()
+        assert sorted(result.keys()) == ['/test1', '/test2', '/test3']
+        assert result['/test1'].successful
+        assert result['/test2'].successful
+        assert result['/test3'] is reply
+        mock_callback.assert_called_once_with(result)
+
+        # Make sure the listeners were added to every channel
+        channel = self.client.get_channel('/test2')
+        channel.notify_listeners(channel, self.mock_message)
+        mock_subscription.assert_called_once_with(channel, self.mock_message, 1, foo='bar')
+
+    def test_subscribe_many_already_subscribed(self):
+        self.connect_client()
+        self.client.get_channel('/test').subscribe(self.create_mock_function())
+        self.transport.clear_sent_messages()
+        request = self.client.subscribe_many(['/test'], self.create_mock_function())
+        assert request.is_done
+        assert request.result() == {}
+        assert self.transport.sent_messages == []
+
+    def test_subscribe_many_cancelled_by_extension(self):
+        self.client.configure(maximum_subscriptions_per_message=1)
+        self.connect_client()
+        extension = MockExtension('mock-extension')
+        extension.send = lambda message: None if message.subscription == '/test2' else message
+        self.client.register_extension(extension)
+        request = self.client.subscribe_many(['/test1', '/test2'], self.create_mock_function())
+        assert [message.subscription for message in self.transport.sent_messages] == ['/test1']
+        reply = Message(
+            channel=ChannelId.META_SUBSCRIBE,
+            id=self.transport.sent_messages[0].id,
+            successful=True,
+            subscription='/test1'
+        )
+        self.transport.receive([reply])
+        assert request.is_done
+        assert request.result() == {'/test1': reply}
+        assert self.client._bulk_requests == []
+
+    def test_subscribe_many_with_subscription_planner(self):
+        self.client.configure(subscription_planner=SubscriptionPlanner(threshold=3))
+        self.connect_client()
+        self.client.get_channel('/prices/a').subscribe(self.create_mock_function())
+        self.transport.clear_sent_messages()
+
+        # The requested channels get the reply for the wildcard covering
+        # them, not the unsubscribe of the sibling it replaced
+        request = self.client.subscribe_many(['/prices/b', '/prices/c', '/other'], self.create_mock_function())
+        messages = self.transport.sent_messages
+        assert [(message.channel, message.subscription) for message in messages] == [
+            (ChannelId.META_SUBSCRIBE, ['/other', '/prices/*']),
+            (ChannelId.META_UNSUBSCRIBE, '/prices/a')
+        ]
+        subscribe_reply = Message(
+            channel=ChannelId.META_SUBSCRIBE,
+            id=messages[0].id,
+            successful=True,
+            subscription=['/other', '/prices/*']
+        )
+        self.transport.receive([subscribe_reply])
+        assert not request.is_done
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_UNSUBSCRIBE,
+                id=messages[1].id,
+                successful=True,
+                subscription='/prices/a'
+            )
+        ])
+        assert request.is_done
+        assert request.result() == {
+            '/prices/b': subscribe_reply,
+            '/prices/c': subscribe_reply,
+            '/other': subscribe_reply
+        }
+
+    def test_subscribe_many_failure(self):
+        request = self.client.subscribe_many(['/test1', '/test2'], self.create_mock_function())
+        assert request.is_done
+        result = request.result()
+        assert sorted(result.keys()) == ['/test1', '/test2']
+        assert result['/test1'] is result['/test2']
+        assert isinstance(result['/test1'], FailureMessage)
+        assert result['/test1'].exception == errors.StatusError(ClientStatus.UNCONNECTED)
+
+    def test_unsubscribe_many(self):
+        self.connect_client()
+        mock_subscription_1 = self.create_mock_function()
+        mock_subscription_2 = self.create_mock_function()
+        self.client.subscribe_many(['/test1', '/test2'], mock_subscription_1)
+        self.client.get_channel('/test2').subscribe(mock_subscription_2)
+        self.client.get_channel('/test3').subscribe(mock_subscription_2)
+        self.transport.clear_sent_messages()
+
+        # Only the channels left without subscriptions get unsubscribed
+        request = self.client.unsubscribe_many(['/test1', '/test2', '/test4'], mock_subscription_1)
+        assert [message.subscription for message in self.transport.sent_messages] == ['/test1']
+        assert self.client.get_channel('/test2').has_subscriptions
+        self.transport.receive([
+            Message(
+                channel=ChannelId.META_UNSUBSCRIBE,
+                id=self.transport.sent_messages[0].id,
+                successful=True,
+                subscription='/test1'
+            )
+        ])
+        assert list(request.result().keys()) == ['/test1']
+        self.transport.clear_sent_messages()
+
+        # Without a function, all subscriptions are removed
+        self.client.unsubscribe_many(['/test2', '/test3'])
+        assert [message.subscription for message in self.transport.sent_messages] == [['/test2', '/test3']]
+        assert not self.client.get_channel('/test2').has_subscriptions
+        assert not self.client.get_channel('/test3').has_subscriptions
+
+    def test_timer_wheel(self):
+        wheel = TimerWheel(granularity=50, io_loop=self.io_loop)
+        self.client.configure(timer_wheel=wheel)
+        self.connect_client()
+        connect = Message(channel=ChannelId.META_CONNECT, connection_type=self.transport.name)
+        with self.capture_timeouts() as timeouts:
+            self.client.fail_messages([connect], errors.TimeoutError())
+        assert timeouts == []
+        assert len(wheel) == 1
+        timer = self.client._scheduled_send
+        self.disconnect_client()
+        assert timer.cancelled
+        assert len(wheel) == 0
+
     def test_unregister_extension(self):
 
         # Connect the client to test sending messages
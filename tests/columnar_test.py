@@ -0,0 +1,191 @@
+import array
+from dataclasses import dataclass
+from unittest import TestCase
+
+from mock import Mock
+from mock import patch
+from tornado import gen
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from baiocas import columnar
+from baiocas.channel_id import ChannelId
+from baiocas.client import Client
+from baiocas.columnar import ColumnarListener
+from baiocas.columnar import ColumnBuffer
+from baiocas.columnar import to_array
+from baiocas.listener import Listener
+from baiocas.message import Message
+from baiocas.schema import compile_schema
+from baiocas.timer_wheel import TimerWheel
+
+
+@dataclass
+class Quote(object):
+    price: float
+    size: int
+
+
+class TestToArray(TestCase):
+
+    def test_without_numpy(self):
+        with patch.object(columnar, 'get_numpy', return_value=None):
+            assert to_array([1, 2]) == array.array('q', [1, 2])
+            assert to_array([1, 2.5]) == array.array('d', [1.0, 2.5])
+            assert to_array([True, False]) == array.array('b', [1, 0])
+            assert to_array([1, 2], 'd').typecode == 'd'
+            assert to_array(['a', 'b']) == ['a', 'b']
+            assert to_array([1, None]) == [1, None]
+
+    def test_with_numpy(self):
+        numpy = Mock()
+        with patch.object(columnar, 'get_numpy', return_value=numpy):
+            assert to_array([1, 2], 'int32') is numpy.array.return_value
+        numpy.array.assert_called_once_with([1, 2], dtype='int32')
+
+
+class TestColumnBuffer(TestCase):
+
+    def setUp(self):
+        self.buffer = ColumnBuffer()
+
+    def test_append(self):
+        self.buffer.append({'price': 1.5, 'size': 10})
+        self.buffer.append({'price': 2.5, 'size': 20, 'ignored': True})
+        assert len(self.buffer) == 2
+        assert self.buffer.fields == ['price', 'size']
+        columns = self.buffer.flush()
+        assert list(columns) == ['price', 'size']
+        assert list(columns['price']) == [1.5, 2.5]
+        assert list(columns['size']) == [10, 20]
+        assert len(self.buffer) == 0
+        assert self.buffer.flush() == {}
+
+    def test_missing_field(self):
+        self.buffer = ColumnBuffer(fields=['price', 'size'], dtypes={'price': 'd'})
+        self.buffer.append({'price': 1})
+        columns = self.buffer.flush()
+        assert list(columns['price']) == [1.0]
+        assert list(columns['size']) == [None]
+
+    def test_schema_objects(self):
+        schema = compile_schema({'price': float, 'size': int})
+        self.buffer.append(schema({'price': 1, 'size': 2}))
+        columns = self.buffer.flush()
+        assert list(columns['price']) == [1.0]
+        assert list(columns['size']) == [2]
+
+    def test_dataclasses(self):
+        self.buffer.append(Quote(price=1.5, size=3))
+        assert self.buffer.fields == ['price', 'size']
+        columns = self.buffer.flush()
+        assert list(columns['price']) == [1.5]
+        assert list(columns['size']) == [3]
+
+    def test_channel_field(self):
+        self.buffer = ColumnBuffer(channel_field='channel')
+        self.buffer.append({'price': 1.5}, '/quotes/a')
+        self.buffer.append({'price': 2.5}, '/quotes/b')
+        columns = self.buffer.flush()
+        assert sorted(columns) == ['channel', 'price']
+        assert list(columns['channel']) == ['/quotes/a', '/quotes/b']
+        assert list(self.buffer.flush()) == []
+
+
+class TestColumnarListener(AsyncTestCase):
+
+    def setUp(self):
+        super(TestColumnarListener, self).setUp()
+        self.client = Client('http://www.example.com')
+        self.client.io_loop = self.io_loop
+        self.channel = self.client.get_channel('/quotes/*')
+        self.function = Mock()
+        self.function.__name__ = 'mock'
+
+    def receive(self, listener, *prices):
+        for price in prices:
+            listener(self.channel, Message(channel='/quotes/abc', data={'price': price}))
+
+    @gen_test
+    def test_flush_after_messages(self):
+        listener = ColumnarListener(self.client, self.channel, self.function, extra_args=(1,))
+        self.receive(listener, 1.0, 2.0, 3.0)
+        assert not self.function.called
+        assert listener.buffered == 3
+        yield None
+        assert self.function.call_count == 1
+        args = self.function.call_args[0]
+        assert args[0] is self.channel
+        assert list(args[1]['price']) == [1.0, 2.0, 3.0]
+        assert args[2] == 1
+        assert listener.buffered == 0
+
+    @gen_test
+    def test_window(self):
+        self.client.configure(timer_wheel=TimerWheel(granularity=10, io_loop=self.io_loop))
+        listener = ColumnarListener(self.client, self.channel, self.function, window=50)
+        self.receive(listener, 1.0)
+        yield None
+        assert not self.function.called
+        self.receive(listener, 2.0)
+        yield gen.sleep(0.08)
+        assert self.function.call_count == 1
+        assert list(self.function.call_args[0][1]['price']) == [1.0, 2.0]
+
+    def test_max_size(self):
+        listener = ColumnarListener(self.client, self.channel, self.function, window=1000, max_size=2)
+        self.receive(listener, 1.0, 2.0, 3.0)
+        assert self.function.call_count == 1
+        assert list(self.function.call_args[0][1]['price']) == [1.0, 2.0]
+        assert listener.flush()
+        assert list(self.function.call_args[0][1]['price']) == [3.0]
+        assert not listener.flush()
+        assert listener._scheduled_flush is None
+
+    def test_exception(self):
+        listener = ColumnarListener(self.client, self.channel, Mock(side_effect=ValueError()), max_size=1)
+        exception_listener = Mock()
+        exception_listener.__name__ = 'mock'
+        self.client.register_listener(Client.EVENT_LISTENER_EXCEPTION, exception_listener)
+        self.receive(listener, 1.0)
+        assert exception_listener.call_args[0][:3] == (self.client, listener.listener, None)
+        assert isinstance(listener.listener, Listener)
+        assert listener.listener.function is listener
+
+        # Once subscribed, it's the listener of the subscription
+        listener = self.channel.subscribe_columnar(Mock(side_effect=ValueError()), max_size=1)
+        self.client.receive_messages([Message(channel='/quotes/abc', data={'price': 1})])
+        assert exception_listener.call_args[0][1] in self.channel._subscriptions
+        assert exception_listener.call_args[0][1].function is listener
+
+    @gen_test
+    def test_subscribe_columnar(self):
+        self.client.start_batch()
+        listener = self.channel.subscribe_columnar(self.function, fields=['price'], dtypes={'price': 'd'})
+        assert isinstance(listener, ColumnarListener)
+        self.client.receive_messages([
+            Message(channel='/quotes/abc', data={'price': 1}),
+            Message(channel='/quotes/def', data={'price': 2, 'size': 5})
+        ])
+        yield None
+        self.function.assert_called_once()
+        assert list(self.function.call_args[0][1]) == ['price']
+        assert list(self.function.call_args[0][1]['price']) == [1.0, 2.0]
+        assert self.channel.unsubscribe(function=listener)
+        assert self.client._message_queue[0].channel == ChannelId.META_SUBSCRIBE
+
+    @gen_test
+    def test_subscribe_columnar_with_schema(self):
+        self.client.register_schema('/quotes/*', Quote)
+        self.client.start_batch()
+        self.channel.subscribe_columnar(self.function, channel_field='channel')
+        self.client.receive_messages([
+            Message(channel='/quotes/abc', data={'price': 1.5, 'size': 1}),
+            Message(channel='/quotes/def', data={'price': 2.5, 'size': 2})
+        ])
+        yield None
+        columns = self.function.call_args[0][1]
+        assert sorted(columns) == ['channel', 'price', 'size']
+        assert list(columns['price']) == [1.5, 2.5]
+        assert list(columns['size']) == [1, 2]
+        assert list(columns['channel']) == ['/quotes/abc', '/quotes/def']
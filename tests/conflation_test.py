@@ -0,0 +1,117 @@
+from mock import Mock
+from tornado import gen
+from tornado.testing import AsyncTestCase
+from tornado.testing import gen_test
+
+from baiocas.client import Client
+from baiocas.conflation import ConflatingListener
+from baiocas.listener import Listener
+from baiocas.message import Message
+
+
+class TestConflatingListener(AsyncTestCase):
+
+    def setUp(self):
+        super(TestConflatingListener, self).setUp()
+        self.client = Client('http://www.example.com')
+        self.client.io_loop = self.io_loop
+        self.channel = self.client.get_channel('/quotes/*')
+        self.function = Mock()
+        self.function.__name__ = 'mock'
+
+    def receive(self, listener, channel_id, symbol, price):
+        message = Message(channel=channel_id, data={'quote': {'symbol': symbol, 'price': price}})
+        listener(self.channel, message)
+        return message
+
+    def get_prices(self):
+        return [args[1].data['quote']['price'] for args, _ in self.function.call_args_list]
+
+    @gen_test
+    def test_conflate_by_key(self):
+        listener = ConflatingListener(self.client, self.function, key='quote.symbol', extra_args=(1,))
+        self.receive(listener, '/quotes/a', 'A', 1)
+        self.receive(listener, '/quotes/a', 'B', 2)
+        self.receive(listener, '/quotes/a', 'A', 3)
+        self.receive(listener, '/quotes/b', 'A', 4)
+        assert listener.pending == 3
+        assert listener.conflated == 1
+        assert not self.function.called
+        yield gen.sleep(0)
+        assert self.get_prices() == [3, 2, 4]
+        assert self.function.call_args[0][0] is self.channel
+        assert self.function.call_args[0][2] == 1
+        assert listener.pending == 0
+
+    @gen_test
+    def test_conflate_by_channel(self):
+        listener = ConflatingListener(self.client, self.function)
+        self.receive(listener, '/quotes/a', 'A', 1)
+        self.receive(listener, '/quotes/a', 'B', 2)
+        self.receive(listener, '/quotes/b', 'C', 3)
+        yield gen.sleep(0)
+        assert self.get_prices() == [2, 3]
+
+    @gen_test
+    def test_unhashable_key(self):
+        listener = ConflatingListener(self.client, self.function, key='quote')
+        self.receive(listener, '/quotes/a', 'A', 1)
+        self.receive(listener, '/quotes/a', 'A', 2)
+        assert listener.pending == 2
+        assert listener.conflated == 0
+        yield gen.sleep(0)
+        assert self.get_prices() == [1, 2]
+
+    @gen_test
+    def test_maximum_rate(self):
+        listener = ConflatingListener(self.client, self.function, key='quote.symbol', interval=50)
+        self.receive(listener, '/quotes/a', 'A', 1)
+        yield gen.sleep(0)
+        assert self.get_prices() == [1]
+
+        # Updates within the interval wait for it to be over
+        self.receive(listener, '/quotes/a', 'A', 2)
+        self.receive(listener, '/quotes/a', 'A', 3)
+        yield gen.sleep(0.02)
+        assert self.get_prices() == [1]
+        yield gen.sleep(0.05)
+        assert self.get_prices() == [1, 3]
+
+    def test_exception(self):
+        function = Mock(side_effect=ValueError())
+        listener = ConflatingListener(self.client, function)
+        exception_listener = Mock()
+        exception_listener.__name__ = 'mock'
+        self.client.register_listener(Client.EVENT_LISTENER_EXCEPTION, exception_listener)
+        message = self.receive(listener, '/quotes/a', 'A', 1)
+        assert listener.deliver() == 1
+        assert exception_listener.call_args[0][:3] == (self.client, listener.listener, message)
+        assert isinstance(listener.listener, Listener)
+        assert listener.listener.function is listener
+
+        # Once subscribed, it's the listener of the subscription
+        listener = self.channel.subscribe_conflated(function)
+        self.client.receive_messages([Message(channel='/quotes/a', data={'quote': {'symbol': 'A', 'price': 1}})])
+        assert listener.deliver() == 1
+        assert exception_listener.call_args[0][1] in self.channel._subscriptions
+        assert exception_listener.call_args[0][1].function is listener
+
+    @gen_test
+    def test_subscribe_conflated(self):
+        self.client.start_batch()
+        listener = self.channel.subscribe_conflated(self.function, key='quote.symbol', interval=10)
+        assert isinstance(listener, ConflatingListener)
+        self.client.receive_messages([
+            Message(channel='/quotes/a', data={'quote': {'symbol': 'A', 'price': 1}}),
+            Message(channel='/quotes/a', data={'quote': {'symbol': 'A', 'price': 2}})
+        ])
+        yield gen.sleep(0)
+        assert self.get_prices() == [2]
+
+        # Unsubscribing drops pending messages
+        self.client.receive_messages([Message(channel='/quotes/a', data={'quote': {'symbol': 'A', 'price': 3}})])
+        assert listener.pending == 1
+        assert self.channel.unsubscribe(function=listener)
+        assert listener.pending == 0
+        yield gen.sleep(0.02)
+        assert self.get_prices() == [2]
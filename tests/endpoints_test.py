@@ -0,0 +1,75 @@
+from unittest import TestCase
+
+from baiocas.endpoints import Endpoint
+from baiocas.endpoints import EndpointSelector
+
+
+class TestEndpoint(TestCase):
+
+    def setUp(self):
+        self.endpoint = Endpoint('http://www.example.com', smoothing=0.5, error_penalty=1000)
+
+    def test_init(self):
+        assert self.endpoint.url == 'http://www.example.com'
+        assert repr(self.endpoint) == 'Endpoint(http://www.example.com)'
+        assert not self.endpoint.is_measured
+        assert self.endpoint.rtt is None
+        assert self.endpoint.get_score() == 0
+        assert self.endpoint.get_score(default_rtt=50) == 50
+
+    def test_record_rtt(self):
+        self.endpoint.record_rtt(100)
+        assert self.endpoint.rtt == 100
+        self.endpoint.record_rtt(200)
+        assert self.endpoint.rtt == 150
+        assert self.endpoint.successes == 2
+        assert self.endpoint.get_score() == 150
+
+    def test_record_failure(self):
+        self.endpoint.record_rtt(100)
+        self.endpoint.record_failure()
+        self.endpoint.record_failure()
+        assert self.endpoint.failures == 2
+        assert self.endpoint.consecutive_failures == 2
+        assert self.endpoint.get_score() == 2100
+        self.endpoint.record_rtt(100)
+        assert self.endpoint.consecutive_failures == 0
+        assert self.endpoint.failures == 2
+
+
+class TestEndpointSelector(TestCase):
+
+    def setUp(self):
+        self.selector = EndpointSelector(['http://one', 'http://two', 'http://three'])
+        self.one, self.two, self.three = self.selector.endpoints
+
+    def test_init(self):
+        assert len(self.selector) == 3
+        assert self.selector.current is self.one
+        assert len(EndpointSelector('http://one')) == 1
+        self.assertRaises(ValueError, EndpointSelector, [])
+
+    def test_select(self):
+        assert self.selector.select() is self.one
+        self.one.record_rtt(100)
+        self.two.record_rtt(20)
+        assert self.selector.select() is self.two
+        assert self.selector.current is self.two
+
+    def test_select_unmeasured(self):
+
+        # Unmeasured endpoints count as average, so they only beat slow ones
+        self.one.record_rtt(100)
+        self.two.record_rtt(300)
+        assert self.selector.get_best() is self.one
+        self.one.record_failure()
+        assert self.selector.get_best() is self.three
+
+    def test_failover(self):
+        self.two.record_rtt(100)
+        self.three.record_rtt(50)
+        assert self.selector.failover() is self.three
+        assert self.selector.current is self.three
+        assert self.selector.failover() is self.one
+        selector = EndpointSelector(['http://one'])
+        assert selector.failover() is selector.current
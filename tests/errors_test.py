@@ -58,6 +58,12 @@ class TestBatchError(TestBayeuxError):
     ERROR_CLASS = errors.BatchError
 
 
+class TestCircuitOpenError(TestBayeuxError):
+
+    # The class of the error to test
+    ERROR_CLASS = errors.CircuitOpenError
+
+
 class TestCommunicationError(TestBayeuxError):
 
     # The class of the error to test
@@ -82,6 +88,18 @@ class TestConnectionStringError(TestBayeuxError):
     EXPECTED_STRING = 'Invalid connection string, "http://www.example.com", for transport long-polling'
 
 
+class TestSchemaError(TestBayeuxError):
+
+    # The class of the error to test
+    ERROR_CLASS = errors.SchemaError
+
+    # Arguments to pass when creating an instance of the error
+    ARGS = ('quotes[2].price', 'expected float, got str')
+
+    # The expected string representation of the class
+    EXPECTED_STRING = 'Invalid data at "quotes[2].price": expected float, got str'
+
+
 class TestServerError(TestBayeuxError):
 
     # The class of the error to test
@@ -0,0 +1,137 @@
+import base64
+import json
+import os
+import tempfile
+import zlib
+from unittest import TestCase
+
+from baiocas.channel_id import ChannelId
+from baiocas.client import Client
+from baiocas.extensions import compression
+from baiocas.extensions.compression import CompressionExtension
+from baiocas.extensions.compression import train_dictionary
+from baiocas.message import Message
+from baiocas.message import RawData
+
+
+class TestCompressionExtension(TestCase):
+
+    def setUp(self):
+        self.samples = [
+            {'symbol': symbol, 'price': 100 + index, 'exchange': 'NASDAQ', 'currency': 'USD'}
+            for index, symbol in enumerate(['AAPL', 'MSFT', 'GOOG', 'AMZN'] * 5)
+        ]
+        self.dictionary = train_dictionary(self.samples)
+        self.extension = CompressionExtension(self.dictionary)
+        self.client = Client('http://www.example.com')
+        self.extension.register(self.client)
+
+    def test_init(self):
+        assert self.extension.dictionary is self.dictionary
+        assert self.extension.dictionary_id == zlib.adler32(self.dictionary)
+        extension = CompressionExtension()
+        assert extension.dictionary == b''
+        assert extension.dictionary_id == 0
+
+    def test_train_dictionary(self):
+        assert 0 < len(self.dictionary) <= compression.DEFAULT_DICTIONARY_SIZE
+        assert b'"exchange":"NASDAQ"' in self.dictionary
+        assert b'AAPL' in self.dictionary
+        assert len(train_dictionary(self.samples, size=64)) <= 64
+        assert train_dictionary([]) == b''
+
+    def test_send_receive(self):
+        data = {'symbol': 'MSFT', 'price': 250, 'exchange': 'NASDAQ', 'currency': 'USD'}
+        message = Message(channel='/quotes', data=data, ext={'ack': 1})
+        original = message.copy()
+        compressed = self.extension.send(message)
+        assert compressed.ext == {'ack': 1, CompressionExtension.FIELD_COMPRESSION: self.extension.dictionary_id}
+        assert isinstance(compressed.data, str)
+        assert len(compressed.data) < len(json.dumps(data))
+
+        # The data is replaced on a copy, leaving the message as it was
+        assert message == original
+        assert message.ext == {'ack': 1}
+
+        # Sending the compressed message again leaves it alone
+        assert self.extension.send(compressed) is compressed
+
+        # The receiving side gets the original data back
+        message = Message.from_json(Message.to_json(compressed))[0]
+        assert self.extension.receive(message) is message
+        assert message == {'channel': '/quotes', 'data': data, 'ext': {'ack': 1}}
+
+    def test_send_raw_data(self):
+        message = Message(channel='/quotes', data=RawData('{"symbol": "MSFT", "exchange": "NASDAQ"}'))
+        message = self.extension.send(message)
+        assert message.ext
+        self.extension.receive(message)
+        assert message.data == {'symbol': 'MSFT', 'exchange': 'NASDAQ'}
+
+    def test_send_skipped(self):
+        message = Message(channel=ChannelId.META_HANDSHAKE, data={'exchange': 'NASDAQ'})
+        assert self.extension.send(message) == {'channel': ChannelId.META_HANDSHAKE, 'data': {'exchange': 'NASDAQ'}}
+        message = Message(channel='/quotes')
+        assert self.extension.send(message) == {'channel': '/quotes'}
+
+        # Payloads that wouldn't get any smaller are sent as is
+        message = Message(channel='/quotes', data='x')
+        assert self.extension.send(message) == {'channel': '/quotes', 'data': 'x'}
+        extension = CompressionExtension(self.dictionary, threshold=1000)
+        message = Message(channel='/quotes', data=self.samples[0])
+        assert extension.send(message) == {'channel': '/quotes', 'data': self.samples[0]}
+
+    def test_receive_uncompressed(self):
+        message = Message(channel='/quotes', data={'price': 1}, ext={'ack': 1})
+        assert self.extension.receive(message) == {'channel': '/quotes', 'data': {'price': 1}, 'ext': {'ack': 1}}
+
+    def test_receive_other_dictionary(self):
+        old_extension = CompressionExtension(train_dictionary(self.samples[:4]))
+        extension = CompressionExtension(self.dictionary, dictionaries=[old_extension.dictionary])
+        message = old_extension.send(Message(channel='/quotes', data=self.samples[0], ext={'ack': 1}))
+        extension.receive(message)
+        assert message == {'channel': '/quotes', 'data': self.samples[0], 'ext': {'ack': 1}}
+
+        # Without the dictionary, the data can't be decompressed
+        message = old_extension.send(Message(channel='/quotes', data=self.samples[0]))
+        self.assertRaises(ValueError, self.extension.receive, message)
+
+    def test_receive_invalid(self):
+        message = Message(channel='/quotes', data='not base64!', ext={CompressionExtension.FIELD_COMPRESSION: 0})
+        self.assertRaises(ValueError, self.extension.receive, message)
+        data = base64.b64encode(b'not deflate').decode('ascii')
+        message = Message(channel='/quotes', data=data, ext={CompressionExtension.FIELD_COMPRESSION: 0})
+        self.assertRaises(zlib.error, self.extension.receive, message)
+
+    def test_receive_too_large(self):
+        data = {'padding': ' ' * 100000}
+        extension = CompressionExtension(self.dictionary, max_length=100000)
+        message = Message.from_json(Message.to_json(self.extension.send(Message(channel='/quotes', data=data))))[0]
+        self.assertRaises(ValueError, extension.receive, message)
+
+        # The limit covers the decompressed size, not the size sent
+        assert len(message.data) < 1000
+        extension = CompressionExtension(self.dictionary, max_length=200000)
+        message = Message.from_json(Message.to_json(self.extension.send(Message(channel='/quotes', data=data))))[0]
+        assert extension.receive(message).data == data
+        extension = CompressionExtension(self.dictionary, max_length=None)
+        message = Message.from_json(Message.to_json(self.extension.send(Message(channel='/quotes', data=data))))[0]
+        assert extension.receive(message).data == data
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        capture = os.path.join(directory, 'capture.jsonl')
+        output = os.path.join(directory, 'payloads.zdict')
+        with open(capture, 'w') as capture_file:
+            capture_file.write(json.dumps({'channel': '/meta/connect', 'successful': True}) + '\n\n')
+            for sample in self.samples:
+                capture_file.write(json.dumps([{'channel': '/quotes', 'data': sample}]) + '\n')
+        try:
+            assert compression.main([capture, '-o', output]) == 0
+            with open(output, 'rb') as output_file:
+                assert output_file.read() == self.dictionary
+        finally:
+            for path in (capture, output):
+                if os.path.exists(path):
+                    os.remove(path)
+            os.rmdir(directory)
@@ -1,3 +1,5 @@
+from datetime import datetime
+from decimal import Decimal
 from email.utils import formatdate
 from json import dumps
 from unittest import TestCase
@@ -5,6 +7,7 @@ from unittest import TestCase
 from baiocas.channel_id import ChannelId
 from baiocas.message import FailureMessage
 from baiocas.message import Message
+from baiocas.message import RawData
 
 
 class TestMessage(TestCase):
@@ -164,6 +167,40 @@ class TestMessage(TestCase):
         for message in messages:
             assert isinstance(message, Message)
 
+    def test_from_json_intern_keys(self):
+        value = dumps([{'channel': '/test', 'data': {'price': 1, 'nested': [{'price': 2}]}, 'id': '1'}])
+        first = Message.from_json(value, intern_keys=True)
+        second = Message.from_json(value.encode('utf8'), encoding='utf8', intern_keys=True)
+        assert first == second == Message.from_json(value)
+        assert isinstance(first[0], Message)
+        first_keys = list(first[0]) + list(first[0].data) + list(first[0].data['nested'][0])
+        second_keys = list(second[0]) + list(second[0].data) + list(second[0].data['nested'][0])
+        assert all(first_key is second_key for first_key, second_key in zip(first_keys, second_keys))
+        assert isinstance(first[0].channel, ChannelId)
+        assert first[0].channel is second[0].channel
+
+        # Without interning, the documents share nothing
+        third = Message.from_json(value)
+        assert third[0].channel is not first[0].channel
+        assert list(third[0].data)[0] is not list(first[0].data)[0]
+
+    def test_from_json_intern_keys_single(self):
+        message = Message.from_json('{"channel": "/test", "id": "1"}', intern_keys=True)[0]
+        assert message == {'channel': '/test', 'id': '1'}
+        assert Message.from_json('{"data": 1}', intern_keys=True) == [{'data': 1}]
+
+    def test_iter_json(self):
+        assert ''.join(Message.iter_json([])) == Message.to_json([])
+        message = Message(channel='/test', id='1')
+        assert list(Message.iter_json(message)) == ['[' + dumps(message), ']']
+        messages = [
+            Message(channel='/caf\xe9', id='1'),
+            Message(channel='/test2', id='2')
+        ]
+        chunks = list(Message.iter_json(messages, encoding='utf8'))
+        assert len(chunks) == 3
+        assert b''.join(chunks) == Message.to_json(messages, encoding='utf8')
+
     def test_to_json(self):
         assert Message.to_json([]) == dumps([])
         message = Message(channel='/test', id='1')
@@ -174,12 +211,71 @@ class TestMessage(TestCase):
         ]
         assert Message.to_json(messages) == dumps(messages)
 
+    def test_to_json_publish(self):
+        message = Message(channel='/caf\xe9', data={'text': '"quoted"', 'values': [1, 2.5, None]})
+        message['clientId'] = 'abc\n'
+        message.id = '1'
+        assert Message.to_json(message) == dumps([message], ensure_ascii=False)
+        assert list(Message.iter_json(message)) == ['[' + dumps(message, ensure_ascii=False), ']']
+
+    def test_to_json_raw_data(self):
+        message = Message({'channel': '/test', 'data': RawData('{"value":  1}'), 'clientId': 'abc', 'id': '1'})
+        expected = '[{"channel": "/test", "data": {"value":  1}, "clientId": "abc", "id": "1"}]'
+        assert Message.to_json(message) == expected
+        message.ext = {'ack': True}
+        other_message = Message(channel='/other', data=[1])
+        value = Message.to_json([message, other_message])
+        assert value == expected[:-2] + ', "ext": {"ack": true}}, {"channel": "/other", "data": [1]}]'
+        assert ''.join(Message.iter_json([message, other_message])) == value
+
+    def test_to_json_default(self):
+        messages = [
+            Message({'channel': '/test', 'data': {'at': datetime(2024, 1, 2), 'price': Decimal('1.50')},
+                     'clientId': 'abc', 'id': '1'}),
+            Message(channel='/test', data=b'\x00')
+        ]
+        expected = '[{"channel": "/test", "data": {"at": "2024-01-02T00:00:00", "price": "1.50"}, ' \
+            '"clientId": "abc", "id": "1"}, {"channel": "/test", "data": "AA=="}]'
+        assert Message.to_json(messages) == expected
+        assert Message.to_json(messages[0]) == expected.split(', {"channel"')[0] + ']'
+        assert ''.join(Message.iter_json(messages)) == expected
+        value = Message.to_json(messages[1], default=lambda value: 'custom')
+        assert value == '[{"channel": "/test", "data": "custom"}]'
+        self.assertRaises(TypeError, Message.to_json, Message(channel='/test', data=object()))
+
     def test_to_json_with_encoding(self):
         message = Message(channel='/caf\xe9', id='1')
         value = dumps([message], ensure_ascii=False).encode('utf8')
         assert Message.to_json(message, encoding='utf8') == value
 
 
+class TestRawData(TestCase):
+
+    def test_init(self):
+        assert RawData(b'{"caf\xc3\xa9": 1}').value == '{"caf\xe9": 1}'
+        assert RawData('[1]').value == '[1]'
+        assert str(RawData('[1]')) == '[1]'
+        assert bytes(RawData('"caf\xe9"')) == b'"caf\xc3\xa9"'
+
+    def test_bool(self):
+        for value in ('{}', '{ }', '[]', '""', 'null', 'false', '0', '-0.0', ' 0e5 '):
+            assert not RawData(value), value
+        for value in ('{"a": 1}', '[0]', '" "', 'true', '1', '0.1'):
+            assert RawData(value), value
+
+    def test_decode(self):
+        data = RawData('{"value": [1, 2]}')
+        assert data.decode() == {'value': [1, 2]}
+        assert data.decode() is data.decode()
+
+    def test_encode(self):
+        value = {'value': 'caf\xe9'}
+        data = RawData.encode(value)
+        assert data == RawData('{"value": "caf\xe9"}')
+        assert data.decode() is value
+        assert RawData.encode(data) is data
+
+
 class TestFailureMessage(TestCase):
 
     def test_fields(self):
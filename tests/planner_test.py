@@ -0,0 +1,74 @@
+import logging
+from unittest import TestCase
+
+from baiocas.planner import SubscriptionPlanner
+
+
+class TestSubscriptionPlanner(TestCase):
+
+    def setUp(self):
+        self.planner = SubscriptionPlanner(threshold=3, ratio=0.5)
+
+    def test_init(self):
+        assert isinstance(self.planner.log, logging.Logger)
+        assert self.planner.log.name == 'baiocas.planner.SubscriptionPlanner'
+        assert self.planner.threshold == 3
+        assert self.planner.ratio == 0.5
+        assert self.planner.collapsed == []
+        self.assertRaises(ValueError, SubscriptionPlanner, threshold=0)
+        self.assertRaises(ValueError, SubscriptionPlanner, ratio=1.5)
+
+    def test_subscribe(self):
+        assert self.planner.subscribe(['/prices/a', '/prices/b']) == (['/prices/a', '/prices/b'], [])
+        assert self.planner.subscribe(['/prices/a']) == ([], [])
+        assert self.planner.subscribe(['/other/a', '/prices/*/**']) == (['/other/a', '/prices/*/**'], [])
+        assert self.planner.collapsed == []
+
+    def test_subscribe_collapse(self):
+        self.planner.subscribe(['/prices/a', '/prices/b'])
+        assert self.planner.subscribe(['/prices/c', '/other/a']) == (
+            ['/other/a', '/prices/*'],
+            ['/prices/a', '/prices/b']
+        )
+        assert self.planner.collapsed == ['/prices/*']
+        assert self.planner.subscribe(['/prices/d']) == ([], [])
+        assert self.planner.get_server_subscriptions() == ['/other/a', '/prices/*']
+
+    def test_subscribe_collapse_in_one_call(self):
+        assert self.planner.subscribe(['/prices/a', '/prices/b', '/prices/c']) == (['/prices/*'], [])
+
+    def test_unsubscribe(self):
+        self.planner.subscribe(['/prices/a', '/prices/b'])
+        assert self.planner.unsubscribe(['/prices/a', '/prices/z']) == ([], ['/prices/a'])
+        assert self.planner.get_server_subscriptions() == ['/prices/b']
+
+    def test_unsubscribe_split(self):
+        self.planner.subscribe(['/prices/a', '/prices/b', '/prices/c', '/prices/d'])
+        assert self.planner.unsubscribe(['/prices/a', '/prices/b']) == ([], [])
+        assert self.planner.collapsed == ['/prices/*']
+        assert self.planner.unsubscribe(['/prices/c']) == (['/prices/d'], ['/prices/*'])
+        assert self.planner.collapsed == []
+        assert self.planner.get_server_subscriptions() == ['/prices/d']
+
+    def test_application_wildcard(self):
+        self.planner.subscribe(['/prices/*'])
+        assert self.planner.subscribe(['/prices/a', '/prices/b', '/prices/c']) == ([], [])
+        assert self.planner.unsubscribe(['/prices/*']) == ([], [])
+        assert self.planner.get_server_subscriptions() == ['/prices/*']
+        assert self.planner.unsubscribe(['/prices/a', '/prices/b']) == (['/prices/c'], ['/prices/*'])
+
+    def test_is_wanted(self):
+        assert self.planner.is_wanted('/prices/z')
+        self.planner.subscribe(['/prices/a', '/prices/b', '/prices/c', '/other/a'])
+        assert self.planner.is_wanted('/prices/a')
+        assert not self.planner.is_wanted('/prices/z')
+        assert self.planner.is_wanted('/other/z')
+        self.planner.subscribe(['/prices/**'])
+        assert self.planner.is_wanted('/prices/z')
+
+    def test_reset(self):
+        self.planner.subscribe(['/prices/a', '/prices/b', '/prices/c'])
+        self.planner.reset()
+        assert self.planner.collapsed == []
+        assert self.planner.get_server_subscriptions() == []
+        assert self.planner.subscribe(['/prices/a']) == (['/prices/a'], [])
@@ -0,0 +1,170 @@
+from mock import Mock
+from tornado.testing import AsyncTestCase
+
+from baiocas.channel_id import ChannelId
+from baiocas.client import Client
+from baiocas.extensions.ack import AckExtension
+from baiocas.message import Message
+from baiocas.pool import ClientPool
+from baiocas.rate_limit import TokenBucket
+from baiocas.transports.context import HttpClientContext
+from baiocas.util import find_channel_entry
+from tests.client_test import MockTransport
+
+
+class TestClientPool(AsyncTestCase):
+
+    def create_mock_function(self, name='mock'):
+        mock = Mock()
+        mock.__name__ = name
+        return mock
+
+    def create_client(self, url, **options):
+        client = Client(url, **options)
+        client.io_loop = self.io_loop
+        client.register_transport(MockTransport('mock-transport'))
+        return client
+
+    def connect_pool(self):
+        self.pool.handshake()
+        for index, client in enumerate(self.pool):
+            client.transport.receive([
+                Message(
+                    channel=ChannelId.META_HANDSHAKE,
+                    successful=True,
+                    client_id='client-%d' % index,
+                    supported_connection_types=[client.transport.name],
+                    version=Client.BAYEUX_VERSION
+                ),
+                Message(channel=ChannelId.META_CONNECT, successful=True)
+            ])
+            client.transport.clear_sent_messages()
+
+    def setUp(self):
+        super(TestClientPool, self).setUp()
+        self.pool = ClientPool('http://www.example.com', size=4, client_factory=self.create_client,
+                               fast_start=True)
+
+    def test_init(self):
+        assert len(self.pool) == 4
+        assert len(set(self.pool.clients)) == 4
+        assert all(client.options['fast_start'] for client in self.pool)
+        self.assertRaises(ValueError, ClientPool, 'http://www.example.com', size=0)
+        assert self.pool.http_context is None
+
+    def test_init_http_context(self):
+        pool = ClientPool('http://www.example.com', size=3)
+        context = pool.http_context
+        assert context is not HttpClientContext.get_default()
+        assert context.max_clients == 3 * ClientPool.CONNECTIONS_PER_SESSION
+        assert all(client.get_transport('long-polling').context is context for client in pool)
+
+    def test_get_client(self):
+        clients = set()
+        for index in range(100):
+            channel_id = '/test/%d' % index
+            client = self.pool.get_client(channel_id)
+            assert self.pool.get_client(ChannelId(channel_id)) is client
+            assert self.pool.get_channel(channel_id) is client.get_channel(channel_id)
+            clients.add(client)
+        assert len(clients) == 4
+
+    def test_publish(self):
+        self.connect_pool()
+        for index in range(3):
+            self.pool.publish('/test', index)
+        client = self.pool.get_client('/test')
+        assert [message.data for message in client.transport.sent_messages] == [0, 1, 2]
+        for other in self.pool:
+            if other is not client:
+                assert other.transport.sent_messages == []
+
+    def test_subscribe(self):
+        self.connect_pool()
+        function = self.create_mock_function()
+        for index in range(20):
+            self.pool.subscribe('/test/%d' % index, function)
+        subscribed = []
+        for client in self.pool:
+            for message in client.transport.sent_messages:
+                assert self.pool.get_client(message.subscription) is client
+                subscribed.append(message.subscription)
+        assert sorted(subscribed) == sorted('/test/%d' % index for index in range(20))
+
+        # Messages from every session go to the same listeners
+        for index in (1, 2):
+            client = self.pool.get_client('/test/%d' % index)
+            client.transport.receive([Message(channel='/test/%d' % index, data=index)])
+        assert [call[0][1].data for call in function.call_args_list] == [1, 2]
+
+        # Unsubscribing goes through the same session
+        client = self.pool.get_client('/test/1')
+        client.transport.clear_sent_messages()
+        assert self.pool.unsubscribe('/test/1', function=function)
+        assert [message.subscription for message in client.transport.sent_messages] == ['/test/1']
+
+    def test_listeners(self):
+        function = self.create_mock_function()
+        ids = self.pool.add_listener(ChannelId.META_HANDSHAKE, function)
+        event_ids = self.pool.register_listener(Client.EVENT_LISTENER_EXCEPTION, self.create_mock_function())
+        assert len(ids) == 4
+        assert len(event_ids) == 4
+        self.connect_pool()
+        assert function.call_count == 4
+        assert self.pool.remove_listener(ChannelId.META_HANDSHAKE, ids=ids)
+        assert not self.pool.remove_listener(ChannelId.META_HANDSHAKE, function=function)
+        assert self.pool.unregister_listener(ids=event_ids)
+        assert not self.pool.unregister_listener(ids=event_ids)
+
+    def test_schemas(self):
+        schema = self.pool.register_schema('/quotes/*', {'price': float})
+        assert all(find_channel_entry(client._schemas, {}, ChannelId('/quotes/abc')) is schema for client in self.pool)
+        assert self.pool.unregister_schema('/quotes/*')
+        assert not self.pool.unregister_schema('/quotes/*')
+
+    def test_decoders(self):
+        decoders = self.pool.register_decoder('/quotes/*', {'price': float})
+        assert len(decoders) == 4
+        for client, decoder in zip(self.pool, decoders):
+            assert find_channel_entry(client._decoders, {}, ChannelId('/quotes/abc')) is decoder
+        assert self.pool.unregister_decoder('/quotes/*')
+        assert not self.pool.unregister_decoder('/quotes/*')
+
+    def test_extensions(self):
+        extensions = self.pool.register_extension(AckExtension)
+        assert len(set(extensions)) == 4
+        for client, extension in zip(self.pool, extensions):
+            assert client._extensions == [extension]
+            assert extension._client is client
+        assert self.pool.unregister_extension(extensions)
+        assert all(client._extensions == [] for client in self.pool)
+        assert not self.pool.unregister_extension(extensions)
+
+    def test_publish_limits(self):
+        clock = Mock(return_value=0.0)
+        limiter = TokenBucket(1, clock=clock)
+        self.pool.register_publish_limit('/test/*', limiter)
+        self.connect_pool()
+        for index in range(8):
+            self.pool.publish('/test/%d' % index, index)
+
+        # The limit holds across the sessions
+        assert sum(len(client.transport.sent_messages) for client in self.pool) == 1
+        assert self.pool.unregister_publish_limit('/test/*')
+        assert not self.pool.unregister_publish_limit('/test/*')
+
+    def test_batch(self):
+        self.connect_pool()
+        with self.pool.batch():
+            assert all(client.is_batching for client in self.pool)
+            for index in range(8):
+                self.pool.publish('/test/%d' % index, index)
+            assert all(client.transport.sent_messages == [] for client in self.pool)
+        assert sum(len(client.transport.send_calls) for client in self.pool) <= 4
+        assert sum(len(client.transport.sent_messages) for client in self.pool) == 8
+
+    def test_disconnect(self):
+        self.connect_pool()
+        self.pool.disconnect()
+        for client in self.pool:
+            assert [message.channel for message in client.transport.sent_messages] == [ChannelId.META_DISCONNECT]
@@ -0,0 +1,149 @@
+from unittest import TestCase
+
+from baiocas.channel_id import ChannelId
+from baiocas.message import Message
+from baiocas.rate_limit import HANDSHAKE_LIMITER
+from baiocas.rate_limit import PublishThrottle
+from baiocas.rate_limit import TokenBucket
+
+
+class MockClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.bucket = TokenBucket(rate=10, burst=2, clock=self.clock)
+
+    def test_init(self):
+        assert self.bucket.rate == 10
+        assert self.bucket.burst == 2
+        assert repr(self.bucket) == 'TokenBucket(rate=10, burst=2)'
+        self.assertRaises(ValueError, TokenBucket, rate=0)
+        self.assertRaises(ValueError, TokenBucket, rate=1, burst=0)
+        assert isinstance(HANDSHAKE_LIMITER, TokenBucket)
+
+    def test_consume(self):
+        assert self.bucket.consume()
+        assert self.bucket.consume()
+        assert not self.bucket.consume()
+        assert abs(self.bucket.get_wait() - 0.1) < 1e-9
+        self.clock.now += 0.1
+        assert self.bucket.consume()
+        assert not self.bucket.consume()
+        self.clock.now += 1
+        assert self.bucket.consume()
+        assert self.bucket.consume()
+        assert not self.bucket.consume()
+
+    def test_reserve(self):
+        waits = [self.bucket.reserve() for _ in range(5)]
+        assert [round(wait, 3) for wait in waits] == [0, 0, 0.1, 0.2, 0.3]
+        assert not self.bucket.consume()
+        self.clock.now += 10
+        assert self.bucket.reserve() == 0
+
+    def test_reserve_with_delays(self):
+
+        # A caller scheduling far ahead doesn't hold up the others
+        waits = [delay + self.bucket.reserve() for delay in (60, 0, 0, 5)]
+        assert [round(wait, 3) for wait in waits] == [60, 0, 0.1, 5.2]
+        assert not self.bucket.consume()
+        self.clock.now += 0.3
+        assert self.bucket.consume()
+
+    def test_configure(self):
+        self.bucket.configure(rate=1, burst=1)
+        assert self.bucket.consume()
+        assert not self.bucket.consume()
+        assert round(self.bucket.get_wait(), 3) == 1
+
+
+class TestPublishThrottle(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.throttle = PublishThrottle()
+        self.bucket = TokenBucket(rate=10, clock=self.clock)
+        self.throttle.add_limit(ChannelId('/quotes/*'), self.bucket, coalesce=True, key='symbol')
+
+    def create_messages(self, *values):
+        return [Message(channel='/quotes/%s' % channel, data={'symbol': symbol, 'price': price})
+                for channel, symbol, price in values]
+
+    def get_prices(self, messages):
+        return [message.data['price'] for message in messages]
+
+    def test_admit(self):
+        messages = self.create_messages(('a', 'A', 1), ('a', 'A', 2), ('a', 'B', 3), ('a', 'A', 4))
+        meta = Message(channel='/meta/subscribe')
+        other = Message(channel='/other', data='dummy')
+        admitted, wait = self.throttle.admit(messages + [meta, other])
+        assert admitted == [messages[0], meta, other]
+        assert len(self.throttle) == 2
+        assert self.throttle.coalesced == 1
+        assert abs(wait - 0.1) < 1e-9
+
+    def test_unhashable_key(self):
+        self.throttle.add_limit(ChannelId('/levels/*'), TokenBucket(rate=10, clock=self.clock), coalesce=True,
+                                key='symbol')
+        messages = [Message(channel='/levels/a', data={'symbol': ['A'], 'price': price}) for price in range(3)]
+        admitted, wait = self.throttle.admit(messages)
+        assert admitted == [messages[0]]
+        assert len(self.throttle) == 2
+        assert self.throttle.coalesced == 0
+
+    def test_drain(self):
+        self.throttle.add_limit(ChannelId('/quotes/b'), TokenBucket(rate=1, clock=self.clock))
+        messages = self.create_messages(('a', 'A', 1), ('a', 'A', 2), ('b', 'A', 3), ('b', 'A', 4), ('a', 'B', 5))
+        admitted, wait = self.throttle.admit(messages)
+        assert self.get_prices(admitted) == [1, 3]
+        assert len(self.throttle) == 3
+        assert self.throttle.drain() == ([], wait)
+
+        # A channel waiting for its limit doesn't hold back the others
+        self.clock.now += 0.1
+        released, wait = self.throttle.drain()
+        assert self.get_prices(released) == [2]
+        self.clock.now += 0.1
+        released, wait = self.throttle.drain()
+        assert self.get_prices(released) == [5]
+        assert abs(wait - 0.8) < 1e-9
+        self.clock.now += 0.85
+        released, wait = self.throttle.drain()
+        assert self.get_prices(released) == [4]
+        assert wait is None
+
+    def test_overall_limit(self):
+        limiter = TokenBucket(rate=10, burst=2, clock=self.clock)
+        messages = [Message(channel='/news/%d' % index, data={'price': index}) for index in range(3)]
+        admitted, wait = self.throttle.admit(messages, limiter)
+        assert self.get_prices(admitted) == [0, 1]
+        assert abs(wait - 0.1) < 1e-9
+
+        # Once anything is held back, everything queues up behind it
+        self.clock.now += 1
+        admitted, wait = self.throttle.admit(self.create_messages(('a', 'A', 3)), limiter)
+        assert admitted == []
+        assert wait == 0
+        released, wait = self.throttle.drain(limiter)
+        assert self.get_prices(released) == [2, 3]
+
+    def test_limits(self):
+        admitted, _ = self.throttle.admit(self.create_messages(('a', 'A', 1), ('a', 'A', 2)))
+        assert self.throttle.remove_limit(ChannelId('/quotes/*'))
+        assert not self.throttle.remove_limit(ChannelId('/quotes/*'))
+        assert self.throttle.get_wait() == 0
+        released, wait = self.throttle.drain()
+        assert self.get_prices(released) == [2]
+        assert wait is None
+        self.throttle.admit(self.create_messages(('a', 'A', 1)), TokenBucket(rate=1, burst=1, clock=self.clock))
+        self.throttle.admit(self.create_messages(('a', 'A', 1)), TokenBucket(rate=1, burst=1, clock=self.clock))
+        assert len(self.throttle.clear()) == 0
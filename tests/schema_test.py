@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Union
+from unittest import TestCase
+
+from baiocas import errors
+from baiocas.schema import compile_schema
+from baiocas.schema import Schema
+from baiocas.schema import SchemaObject
+
+
+@dataclass
+class Trade(object):
+    symbol: str
+    price: float
+    size: int = 1
+    tags: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Order(object):
+    size: int
+
+    def __post_init__(self):
+        if self.size <= 0:
+            raise ValueError('size must be positive')
+
+
+@dataclass
+class Node(object):
+    name: str
+    children: List['Node'] = field(default_factory=list)
+
+
+class TestCompileSchema(TestCase):
+
+    def setUp(self):
+        self.schema = compile_schema({
+            'symbol': str,
+            'price': float,
+            'size': (int, 0),
+            'open': bool,
+            'venue': Optional[str],
+            'levels': Dict[str, List[float]],
+            'extra': (Any, None),
+            'source': {'name': str, 'region': (str, 'us')}
+        }, name='Quote')
+        self.data = {
+            'symbol': 'ABC',
+            'price': 12,
+            'open': True,
+            'venue': None,
+            'levels': {'bid': [1, 1.5]},
+            'source': {'name': 'feed'},
+            'unknown': 'ignored'
+        }
+
+    def assert_invalid(self, schema, data, path, reason):
+        with self.assertRaises(errors.SchemaError) as context:
+            schema(data)
+        assert context.exception.path == path
+        assert context.exception.reason == reason
+
+    def test_field_spec(self):
+        quote = self.schema(self.data)
+        assert isinstance(self.schema, Schema)
+        assert isinstance(quote, SchemaObject)
+        assert quote.__class__.__name__ == 'Quote'
+        assert not hasattr(quote, '__dict__')
+        assert quote.to_dict() == {
+            'symbol': 'ABC',
+            'price': 12.0,
+            'size': 0,
+            'open': True,
+            'venue': None,
+            'levels': {'bid': [1.0, 1.5]},
+            'extra': None,
+            'source': quote.source
+        }
+        assert isinstance(quote.price, float)
+        assert quote.source.to_dict() == {'name': 'feed', 'region': 'us'}
+        assert quote == self.schema(self.data)
+        assert repr(quote).startswith("Quote(symbol='ABC', price=12.0, ")
+
+    def test_field_spec_invalid(self):
+        self.assert_invalid(self.schema, [], '', 'expected object, got list')
+        self.assert_invalid(self.schema, dict(self.data, symbol=1), 'symbol', 'expected str, got int')
+        self.assert_invalid(self.schema, dict(self.data, price=True), 'price', 'expected float, got bool')
+        self.assert_invalid(self.schema, dict(self.data, size=1.0), 'size', 'expected int, got float')
+        self.assert_invalid(self.schema, dict(self.data, open=1), 'open', 'expected bool, got int')
+        self.assert_invalid(self.schema, dict(self.data, levels={'bid': [1, '2']}), 'levels.bid[1]',
+                            'expected float, got str')
+        self.assert_invalid(self.schema, dict(self.data, source={}), 'source.name', 'missing field')
+        del self.data['price']
+        self.assert_invalid(self.schema, self.data, 'price', 'missing field')
+
+    def test_dataclass(self):
+        schema = compile_schema(Trade)
+        assert schema.name == 'Trade'
+        assert schema.fields == ['symbol', 'price', 'size', 'tags']
+        assert schema({'symbol': 'ABC', 'price': 1}) == Trade('ABC', 1.0)
+        assert schema({'symbol': 'ABC', 'price': 1.5, 'size': 3, 'tags': ['a']}) == Trade('ABC', 1.5, 3, ['a'])
+        self.assert_invalid(schema, {'symbol': 'ABC', 'price': 1, 'tags': [None]}, 'tags[0]', 'expected str, got NoneType')
+
+    def test_dataclass_invalid(self):
+        schema = compile_schema(Order)
+        assert schema({'size': 1}) == Order(1)
+        self.assert_invalid(schema, {'size': 0}, '', 'ValueError: size must be positive')
+        schema = compile_schema({'order': Order})
+        self.assert_invalid(schema, {'order': {'size': -1}}, 'order', 'ValueError: size must be positive')
+
+    def test_mutable_defaults(self):
+        schema = compile_schema({'tags': (list, []), 'limits': (dict, {'max': [1]}), 'name': (str, 'x')})
+        first = schema({})
+        second = schema({})
+        first.tags.append('a')
+        first.limits['max'].append(2)
+        assert second.tags == []
+        assert second.limits == {'max': [1]}
+        assert first.name is second.name
+
+    def test_recursive_dataclass(self):
+        schema = compile_schema(Node)
+        data = {'name': 'a', 'children': [{'name': 'b', 'children': [{'name': 'c'}]}]}
+        assert schema(data) == Node('a', [Node('b', [Node('c')])])
+        data['children'][0]['children'][0]['name'] = 5
+        self.assert_invalid(schema, data, 'children[0].children[0].name', 'expected str, got int')
+
+    def test_compiled_once(self):
+        assert compile_schema(self.schema) is self.schema
+        schema = compile_schema({'first': Trade, 'second': Trade})
+        assert schema.source.count('def convert') == 1
+
+    def test_unsupported(self):
+        self.assertRaises(TypeError, compile_schema, [str])
+        self.assertRaises(TypeError, compile_schema, {'value': Union[int, str]})
+
+    def test_invalid_field_names(self):
+        for field_name in ('class', 'last-price', '1st', '', 1):
+            self.assertRaises(ValueError, compile_schema, {field_name: int})
+        self.assertRaises(ValueError, compile_schema, {'quote': {'def': float}})
@@ -0,0 +1,122 @@
+import array
+import datetime
+import decimal
+import json
+from dataclasses import dataclass
+from unittest import skipIf
+from unittest import TestCase
+
+from baiocas import errors
+from baiocas import serialization
+from baiocas.schema import compile_schema
+from baiocas.serialization import create_default
+from baiocas.serialization import decode_array
+from baiocas.serialization import decode_bytes
+from baiocas.serialization import decode_date
+from baiocas.serialization import decode_datetime
+from baiocas.serialization import decode_decimal
+from baiocas.serialization import FieldDecoder
+from baiocas.util import get_numpy
+
+numpy = get_numpy()
+
+
+@dataclass
+class Point(object):
+    x: int
+    y: int
+
+
+class TestDefault(TestCase):
+
+    def dumps(self, value, default=serialization.default):
+        return json.dumps(value, default=default)
+
+    def test_builtin_types(self):
+        assert json.loads(self.dumps({
+            'bytes': b'\x00\xff',
+            'datetime': datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            'date': datetime.date(2024, 1, 2),
+            'time': datetime.time(3, 4),
+            'decimal': decimal.Decimal('0.10'),
+            'array': array.array('d', [1.0, 2.5]),
+            'set': {1}
+        })) == {
+            'bytes': 'AP8=',
+            'datetime': '2024-01-02T03:04:05+00:00',
+            'date': '2024-01-02',
+            'time': '03:04:00',
+            'decimal': '0.10',
+            'array': [1.0, 2.5],
+            'set': [1]
+        }
+
+    def test_typed_objects(self):
+        schema = compile_schema({'x': int})
+        assert self.dumps([schema({'x': 1}), Point(1, 2)]) == '[{"x": 1}, {"x": 1, "y": 2}]'
+
+    def test_unsupported(self):
+        self.assertRaises(TypeError, self.dumps, object())
+        self.assertRaises(ValueError, create_default, 'unknown')
+
+    @skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        value = numpy.arange(6, dtype='int32').reshape(2, 3)
+        assert json.loads(self.dumps({'array': value, 'scalar': numpy.float64(1.5)})) == {
+            'array': [[0, 1, 2], [3, 4, 5]],
+            'scalar': 1.5
+        }
+        encoded = json.loads(self.dumps(value, default=create_default(serialization.ARRAY_BASE64)))
+        assert encoded['dtype'] == 'int32'
+        assert encoded['shape'] == [2, 3]
+        assert (decode_array(encoded) == value).all()
+
+
+class TestDecodeHooks(TestCase):
+
+    def test_decode_array(self):
+        encoded = {'dtype': 'float64', 'shape': [2], 'buffer': 'AAAAAAAA8D8AAAAAAAAEQA=='}
+        assert list(decode_array(encoded)) == [1.0, 2.5]
+        self.assertRaises(ValueError, decode_array, {'dtype': 'float64'})
+        if numpy is None:
+            assert decode_array([1, 2]) == [1, 2]
+            self.assertRaises(ValueError, decode_array, dict(encoded, dtype='complex128'))
+
+    def test_decode_scalars(self):
+        assert decode_bytes('AP8=') == b'\x00\xff'
+        self.assertRaises(ValueError, decode_bytes, 'A')
+        assert decode_date('2024-01-02') == datetime.date(2024, 1, 2)
+        assert decode_datetime('2024-01-02T03:04:05Z') == \
+            datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+        assert decode_decimal('0.10') == decimal.Decimal('0.10')
+        assert decode_decimal(0.1) == decimal.Decimal('0.1')
+        self.assertRaises(ValueError, decode_decimal, 'abc')
+
+
+class TestFieldDecoder(TestCase):
+
+    def setUp(self):
+        self.decoder = FieldDecoder({'at': decode_datetime, 'price': decode_decimal})
+
+    def test_decode(self):
+        data = {'at': '2024-01-02T03:04:05', 'price': '1.5', 'other': 'x'}
+        assert self.decoder(data) == {
+            'at': datetime.datetime(2024, 1, 2, 3, 4, 5),
+            'price': decimal.Decimal('1.5'),
+            'other': 'x'
+        }
+        assert data['at'] == '2024-01-02T03:04:05'
+        assert self.decoder({'at': None}) == {'at': None}
+        assert repr(self.decoder) == 'FieldDecoder(at, price)'
+
+    def test_invalid(self):
+        self.assertRaises(errors.SchemaError, self.decoder, [])
+        with self.assertRaises(errors.SchemaError) as context:
+            self.decoder({'at': 5})
+        assert context.exception.path == 'at'
+
+    def test_with_schema(self):
+        schema = compile_schema({'at': datetime.datetime})
+        value = schema(self.decoder({'at': '2024-01-02T03:04:05'}))
+        assert value.at == datetime.datetime(2024, 1, 2, 3, 4, 5)
+        self.assertRaises(errors.SchemaError, schema, {'at': '2024-01-02T03:04:05'})
@@ -0,0 +1,118 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from baiocas.timer_wheel import Timer
+from baiocas.timer_wheel import TimerWheel
+
+
+class MockClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockIOLoop(object):
+
+    def __init__(self):
+        self.timeouts = []
+
+    def call_later(self, delay, callback):
+        timeout = (delay, callback)
+        self.timeouts.append(timeout)
+        return timeout
+
+    def remove_timeout(self, timeout):
+        self.timeouts.remove(timeout)
+
+
+class TestTimerWheel(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.io_loop = MockIOLoop()
+        self.wheel = TimerWheel(granularity=10, slots=4, levels=2, io_loop=self.io_loop, clock=self.clock)
+        self.fired = []
+
+    def add_timeout(self, delay):
+        return self.wheel.add_timeout(delay, lambda: self.fired.append((delay, self.get_elapsed())))
+
+    def get_elapsed(self):
+        return int(round((self.clock.now - 100.0) * 1000))
+
+    def run_for(self, milliseconds, step=10):
+        for _ in range(milliseconds // step):
+            self.clock.now += step / 1000.0
+            if self.io_loop.timeouts:
+                delay, callback = self.io_loop.timeouts.pop(0)
+                assert not self.io_loop.timeouts
+                callback()
+
+    def test_init(self):
+        assert self.wheel.granularity == 10
+        assert len(self.wheel) == 0
+        self.assertRaises(ValueError, TimerWheel, granularity=0, io_loop=self.io_loop)
+        self.assertRaises(ValueError, TimerWheel, slots=1, io_loop=self.io_loop)
+
+    def test_add_timeout(self):
+        timer = self.add_timeout(25)
+        assert isinstance(timer, Timer)
+        assert len(self.wheel) == 1
+        assert len(self.io_loop.timeouts) == 1
+        self.run_for(100)
+        assert self.fired == [(25, 30)]
+        assert len(self.wheel) == 0
+        assert not self.io_loop.timeouts
+
+    def test_add_timeout_levels(self):
+
+        # Covers the first level, the second level and beyond the wheel range
+        for delay in (500, 5, 100, 30, 155):
+            self.add_timeout(delay)
+        assert len(self.io_loop.timeouts) == 1
+        self.run_for(600)
+        assert self.fired == [(5, 10), (30, 30), (100, 100), (155, 160), (500, 500)]
+
+    def test_add_timeout_never_early(self):
+        self.clock.now += 0.007
+        self.add_timeout(10)
+        self.run_for(10, step=1)
+        assert self.fired == []
+        self.run_for(20, step=1)
+        assert self.fired == [(10, 20)]
+
+    def test_add_timeout_after_idle(self):
+        self.add_timeout(10)
+        self.run_for(20)
+        self.clock.now += 5
+        self.add_timeout(40)
+        self.run_for(50)
+        assert self.fired[0] == (10, 10)
+        assert 5060 <= self.fired[1][1] <= 5070
+
+    def test_remove_timeout(self):
+        timer = self.add_timeout(50)
+        other = self.add_timeout(20)
+        assert self.wheel.remove_timeout(timer)
+        assert not self.wheel.remove_timeout(timer)
+        assert len(self.wheel) == 1
+        assert other.cancel()
+        assert not self.io_loop.timeouts
+        self.run_for(100)
+        assert self.fired == []
+
+    def test_callback_exception(self):
+        self.wheel.add_timeout(10, Mock(side_effect=Exception()))
+        self.add_timeout(10)
+        self.run_for(10)
+        assert self.fired == [(10, 10)]
+
+    def test_close(self):
+        timer = self.add_timeout(10)
+        self.wheel.close()
+        assert timer.cancelled
+        assert len(self.wheel) == 0
+        assert not self.io_loop.timeouts
@@ -0,0 +1,109 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from baiocas import errors
+from baiocas.client import Client
+from baiocas.message import Message
+from baiocas.transports.base import Transport
+from baiocas.transports.circuit_breaker import CircuitBreaker
+
+
+class MockClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class MockTransport(Transport):
+
+    def __init__(self, **options):
+        super(MockTransport, self).__init__(**options)
+        self.sent_messages = []
+
+    @property
+    def name(self):
+        return 'mock-transport'
+
+    def send(self, messages, sync=False):
+        if not self._check_circuit(messages):
+            return
+        self.sent_messages.extend(messages)
+
+
+class TestTransportCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.breaker = CircuitBreaker(minimum_requests=1, window=1, probe_interval=1000, clock=self.clock)
+        self.transport = MockTransport(circuit_breaker=self.breaker, spool_size=1)
+        self.client = Mock(spec=Client)
+        self.client.EVENT_CIRCUIT_STATE_CHANGE = Client.EVENT_CIRCUIT_STATE_CHANGE
+        self.transport.register(self.client, url='http://localhost/cometd')
+
+    def _open_circuit(self):
+        self.transport._record_result(errors.CommunicationError(Exception('refused')))
+        assert self.breaker.is_open
+
+    def test_record_result(self):
+        self.transport._record_result(errors.ServerError(404))
+        assert not self.breaker.is_open
+        self.transport._record_result(errors.ServerError(503))
+        assert self.breaker.is_open
+        self.client.fire.assert_called_once_with(
+            Client.EVENT_CIRCUIT_STATE_CHANGE,
+            self.transport,
+            CircuitBreaker.STATE_CLOSED,
+            CircuitBreaker.STATE_OPEN
+        )
+
+    def test_record_timeout(self):
+        breaker = CircuitBreaker(consecutive_timeouts=1)
+        self.transport.configure(circuit_breaker=breaker)
+        self.transport._record_result(errors.TimeoutError())
+        assert breaker.metrics['timeouts'] == 1
+        assert breaker.is_open
+
+    def test_open_circuit(self):
+        self._open_circuit()
+        messages = [
+            Message(channel='/meta/connect'),
+            Message(channel='/foo', data='one'),
+            Message(channel='/foo', data='two')
+        ]
+        self.transport.send(messages)
+        assert self.transport.sent_messages == []
+        assert self.client.fail_messages.call_count == 1
+        failed_messages, error = self.client.fail_messages.call_args[0]
+        assert failed_messages == [messages[0], messages[2]]
+        assert isinstance(error, errors.CircuitOpenError)
+
+    def test_send_spooled_messages(self):
+        self._open_circuit()
+        message = Message(channel='/foo', data='one')
+        self.transport.send([message])
+        assert self.transport.sent_messages == []
+        self.clock.now += 1
+        self.transport.send([])
+        self.transport._record_result()
+        assert self.breaker.state == CircuitBreaker.STATE_CLOSED
+        assert self.transport.sent_messages == [message]
+
+    def test_abort(self):
+        self._open_circuit()
+        message = Message(channel='/foo', data='one')
+        self.transport.send([message])
+        self.transport.abort()
+        failed_messages, error = self.client.fail_messages.call_args[0]
+        assert failed_messages == [message]
+        assert isinstance(error, errors.CircuitOpenError)
+
+    def test_configure(self):
+        breaker = CircuitBreaker()
+        self.transport.configure(circuit_breaker=breaker)
+        assert self.transport.circuit_breaker is breaker
+        assert not self.breaker.remove_listener(self.transport._handle_circuit_state_change)
+        assert breaker.remove_listener(self.transport._handle_circuit_state_change)
@@ -0,0 +1,132 @@
+from unittest import TestCase
+
+from mock import Mock
+
+from baiocas.transports.circuit_breaker import CircuitBreaker
+
+
+class MockClock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(TestCase):
+
+    def setUp(self):
+        self.clock = MockClock()
+        self.listener = Mock()
+        self.breaker = CircuitBreaker(
+            error_rate=0.5,
+            minimum_requests=4,
+            window=4,
+            consecutive_timeouts=2,
+            probe_interval=1000,
+            clock=self.clock
+        )
+        self.breaker.add_listener(self.listener)
+
+    def test_init(self):
+        assert self.breaker.state == CircuitBreaker.STATE_CLOSED
+        assert not self.breaker.is_open
+        assert self.breaker.error_rate == 0.0
+        assert self.breaker.metrics == dict(
+            requests=0,
+            successes=0,
+            failures=0,
+            timeouts=0,
+            rejected=0,
+            state_changes=0,
+            state=CircuitBreaker.STATE_CLOSED,
+            error_rate=0.0
+        )
+
+    def test_error_rate(self):
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        assert self.breaker.state == CircuitBreaker.STATE_CLOSED
+        self.breaker.record_failure()
+        assert self.breaker.error_rate == 0.5
+        assert self.breaker.is_open
+        self.listener.assert_called_once_with(CircuitBreaker.STATE_CLOSED, CircuitBreaker.STATE_OPEN)
+
+    def test_error_rate_window(self):
+        for _ in range(4):
+            self.breaker.record_success()
+        self.breaker.record_failure()
+        assert self.breaker.error_rate == 0.25
+        assert not self.breaker.is_open
+
+    def test_consecutive_timeouts(self):
+        self.breaker.record_failure(timeout=True)
+        self.breaker.record_success()
+        self.breaker.record_failure(timeout=True)
+        assert not self.breaker.is_open
+        self.breaker.record_failure(timeout=True)
+        assert self.breaker.is_open
+        assert self.breaker.metrics['timeouts'] == 3
+        assert self.breaker.metrics['failures'] == 3
+
+    def test_allow_request(self):
+        assert self.breaker.allow_request()
+        self.breaker.record_failure(timeout=True)
+        self.breaker.record_failure(timeout=True)
+        assert not self.breaker.allow_request()
+        self.clock.now += 0.5
+        assert not self.breaker.allow_request()
+        assert self.breaker.metrics['rejected'] == 2
+        assert self.breaker.metrics['requests'] == 1
+
+    def test_probe_success(self):
+        self.breaker.record_failure(timeout=True)
+        self.breaker.record_failure(timeout=True)
+        self.clock.now += 1
+        assert self.breaker.allow_request()
+        assert self.breaker.state == CircuitBreaker.STATE_HALF_OPEN
+        assert not self.breaker.allow_request()
+        self.breaker.record_success()
+        assert self.breaker.state == CircuitBreaker.STATE_CLOSED
+        assert self.breaker.error_rate == 0.0
+        assert self.breaker.allow_request()
+        assert self.breaker.metrics['state_changes'] == 3
+        assert [call[0] for call in self.listener.call_args_list] == [
+            (CircuitBreaker.STATE_CLOSED, CircuitBreaker.STATE_OPEN),
+            (CircuitBreaker.STATE_OPEN, CircuitBreaker.STATE_HALF_OPEN),
+            (CircuitBreaker.STATE_HALF_OPEN, CircuitBreaker.STATE_CLOSED)
+        ]
+
+    def test_probe_failure(self):
+        self.breaker.record_failure(timeout=True)
+        self.breaker.record_failure(timeout=True)
+        self.clock.now += 1
+        assert self.breaker.allow_request()
+        self.breaker.record_failure()
+        assert self.breaker.is_open
+        assert not self.breaker.allow_request()
+        self.clock.now += 1
+        assert self.breaker.allow_request()
+
+    def test_cancel_probe(self):
+        assert not self.breaker.cancel_probe()
+        self.breaker.record_failure(timeout=True)
+        self.breaker.record_failure(timeout=True)
+        self.clock.now += 1
+        assert self.breaker.allow_request()
+        assert not self.breaker.allow_request()
+        assert self.breaker.cancel_probe()
+        assert self.breaker.state == CircuitBreaker.STATE_HALF_OPEN
+        assert self.breaker.allow_request()
+        self.breaker.record_success()
+        assert self.breaker.state == CircuitBreaker.STATE_CLOSED
+
+    def test_remove_listener(self):
+        assert self.breaker.remove_listener(self.listener)
+        assert not self.breaker.remove_listener(self.listener)
+        self.breaker.record_failure(timeout=True)
+        self.breaker.record_failure(timeout=True)
+        assert self.breaker.is_open
+        assert not self.listener.called
@@ -0,0 +1,87 @@
+from mock import patch
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPClient
+from tornado.httpclient import HTTPRequest
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncTestCase
+
+from baiocas.transports.context import _CancellableHTTPClient
+from baiocas.transports.context import HttpClientContext
+
+
+class TestHttpClientContext(AsyncTestCase):
+
+    def setUp(self):
+        super(TestHttpClientContext, self).setUp()
+        self.context = HttpClientContext(max_clients=50)
+
+    def tearDown(self):
+        self.context.close()
+        super(TestHttpClientContext, self).tearDown()
+
+    def test_init(self):
+        assert self.context.max_clients == 50
+        assert self.context._blocking_http_client is None
+
+    def test_get_default(self):
+        context = HttpClientContext.get_default()
+        assert isinstance(context, HttpClientContext)
+        assert HttpClientContext.get_default() is context
+
+    def test_open(self):
+        self.context.open()
+        blocking_http_client = self.context.blocking_http_client
+        assert isinstance(blocking_http_client, HTTPClient)
+        self.context.open()
+        assert self.context.blocking_http_client is blocking_http_client
+
+    def test_http_client(self):
+        http_client = self.context.http_client
+        assert self.context.http_client is http_client
+        assert http_client is not AsyncHTTPClient()
+        assert http_client.max_clients == 50
+
+        # Contexts don't share clients or settings, nor change the defaults
+        context = HttpClientContext(max_clients=5)
+        assert context.http_client is not http_client
+        assert context.http_client.max_clients == 5
+        assert http_client.max_clients == 50
+        assert AsyncHTTPClient._save_configuration()[1] is None
+        context.close()
+
+        # A new client is created for another IO loop
+        async def get_http_client():
+            return self.context.http_client
+        io_loop = IOLoop()
+        try:
+            new_http_client = io_loop.run_sync(get_http_client)
+        finally:
+            io_loop.close()
+        assert new_http_client is not http_client
+        assert new_http_client.io_loop is io_loop
+
+    def test_cancel(self):
+        request = HTTPRequest('http://localhost/')
+        assert not self.context.cancel(request)
+        assert isinstance(self.context.http_client, _CancellableHTTPClient)
+        assert not self.context.cancel(request)
+        with patch.object(AsyncHTTPClient, 'configured_class', return_value=AsyncHTTPClient):
+            context = HttpClientContext()
+            assert not isinstance(context.http_client, _CancellableHTTPClient)
+            assert not context.cancel(request)
+            context.close()
+
+    def test_close(self):
+        blocking_http_client = self.context.blocking_http_client
+        self.context.close()
+        assert self.context._blocking_http_client is None
+        assert self.context.blocking_http_client is not blocking_http_client
+        http_client = self.context.http_client
+        self.context.close()
+        assert self.context._http_client is None
+        assert self.context.http_client is not http_client
+
+    def test_supports_body_producer(self):
+        assert self.context.supports_body_producer
+        with patch.object(AsyncHTTPClient, 'configured_class', return_value=AsyncHTTPClient):
+            assert not self.context.supports_body_producer
@@ -0,0 +1,148 @@
+from email.utils import formatdate
+from unittest import TestCase
+
+from baiocas.transports.cookies import Cookie
+from baiocas.transports.cookies import CookieJar
+
+
+class TestCookie(TestCase):
+
+    def test_init(self):
+        cookie = Cookie('foo', 'bar', domain='.Example.com', path='', expires=100)
+        assert cookie.domain == 'example.com'
+        assert cookie.path == '/'
+        assert cookie.key == ('example.com', '/', 'foo')
+        assert cookie.output() == 'foo=bar'
+        assert repr(cookie) == 'Cookie(foo=bar, domain=example.com, path=/)'
+
+    def test_is_expired(self):
+        assert not Cookie('foo', 'bar').is_expired()
+        cookie = Cookie('foo', 'bar', expires=100)
+        assert not cookie.is_expired(now=99)
+        assert cookie.is_expired(now=100)
+
+    def test_matches_domain(self):
+        cookie = Cookie('foo', 'bar', domain='example.com')
+        assert cookie.matches('example.com')
+        assert cookie.matches('EXAMPLE.com')
+        assert not cookie.matches('www.example.com')
+        cookie.host_only = False
+        assert cookie.matches('www.example.com')
+        assert not cookie.matches('badexample.com')
+        assert not cookie.matches('example.org')
+
+    def test_matches_path(self):
+        cookie = Cookie('foo', 'bar', domain='example.com', path='/cometd')
+        assert cookie.matches('example.com', '/cometd')
+        assert cookie.matches('example.com', '/cometd/connect')
+        assert not cookie.matches('example.com', '/cometdx')
+        assert not cookie.matches('example.com', '/')
+
+    def test_matches_secure(self):
+        cookie = Cookie('foo', 'bar', domain='example.com', secure=True)
+        assert not cookie.matches('example.com')
+        assert cookie.matches('example.com', secure=True)
+
+
+class TestCookieJar(TestCase):
+
+    def setUp(self):
+        self.jar = CookieJar()
+
+    def test_update(self):
+        cookies = self.jar.update(
+            ['one=1; Max-Age=60', 'two=2; Path=/cometd; Domain=example.com', 'three=3; Secure'],
+            host='www.example.com',
+            request_path='/cometd/handshake',
+            time_received=1000
+        )
+        assert len(cookies) == 3
+        assert len(self.jar) == 3
+        one = self.jar.get('one')
+        assert one.expires == 1060
+        assert one.domain == 'www.example.com'
+        assert one.path == '/cometd'
+        assert self.jar.get('two').domain == 'example.com'
+        assert not self.jar.get('two').host_only
+        assert self.jar.get('three').secure
+        assert self.jar.get('four') is None
+        assert self.jar.update([]) == []
+
+    def test_update_expired(self):
+        self.jar.update(['one=1', 'two=2'], host='example.com', time_received=1000)
+        version = self.jar.version
+        self.jar.update(['one=1; Expires=%s' % formatdate(0, usegmt=True)], host='example.com', time_received=1000)
+        assert self.jar.get('one') is None
+        assert self.jar.get('two') is not None
+        assert self.jar.version > version
+
+    def test_update_other_domain(self):
+        cookies = self.jar.update(
+            ['one=1; Domain=example.org', 'two=2; Domain=ample.com', 'three=3; Domain=.Example.com'],
+            host='www.example.com'
+        )
+        assert [cookie.name for cookie in cookies] == ['three']
+        assert self.jar.get('three').domain == 'example.com'
+        self.assertRaises(ValueError, self.jar.set, 'four', '4', host='www.example.com', domain='www.example.org')
+        assert len(self.jar) == 1
+
+    def test_update_unchanged(self):
+        self.jar.update(['one=1; Max-Age=60'], host='example.com', time_received=1000)
+        cookie = self.jar.get('one')
+        version = self.jar.version
+        self.jar.update(['one=1; Max-Age=60'], host='example.com', time_received=1000)
+        assert self.jar.version == version
+        assert self.jar.get('one') is cookie
+        self.jar.update(['one=1; Max-Age=60'], host='example.com', time_received=1001)
+        assert self.jar.version > version
+        assert self.jar.get('one').expires == 1061
+
+    def test_set(self):
+        cookie = self.jar.set('foo', 'bar', host='example.com', time_received=1000, **{'max-age': '10'})
+        assert cookie.expires == 1010
+        assert self.jar.get('foo') is cookie
+        assert self.jar.next_expiration == 1010
+
+    def test_to_morsel(self):
+        morsel = self.jar.set('foo', 'bar', host='example.com', path='/cometd').to_morsel()
+        assert (morsel.key, morsel.value, morsel['path']) == ('foo', 'bar', '/cometd')
+        morsel = Cookie('foo', 'bar', domain='example.com', expires=0, secure=True, host_only=False).to_morsel()
+        assert morsel.OutputString() == 'foo=bar; Domain=example.com; expires=Thu, 01 Jan 1970 00:00:00 GMT; Path=/; Secure'
+
+    def test_get_header(self):
+        self.jar.set('b', '2', host='example.com')
+        self.jar.set('a', '1', host='example.com')
+        self.jar.set('c', '3', host='example.com', path='/cometd')
+        self.jar.set('d', '4', host='example.org')
+        assert self.jar.get_header('example.com', '/cometd') == 'c=3; a=1; b=2'
+        assert self.jar.get_header('example.com') == 'a=1; b=2'
+        assert self.jar.get_header('example.net') is None
+        assert [cookie.output() for cookie in self.jar.get_cookies('example.org')] == ['d=4']
+
+    def test_get_header_cache(self):
+        self.jar.set('a', '1', host='example.com', time_received=1000, **{'max-age': '10'})
+        header = self.jar.get_header('example.com', now=1005)
+        assert header == 'a=1'
+        assert self.jar.get_header('example.com', now=1005) is header
+        self.jar.set('b', '2', host='example.com', time_received=1000)
+        assert self.jar.get_header('example.com', now=1005) == 'a=1; b=2'
+        assert self.jar.get_header('example.com', now=1010) == 'b=2'
+        assert self.jar.get('a') is None
+
+    def test_expire(self):
+        self.jar.set('a', '1', host='example.com', time_received=1000, **{'max-age': '10'})
+        self.jar.set('b', '2', host='example.com', time_received=1000, **{'max-age': '20'})
+        self.jar.set('a', '1', host='example.com', time_received=1000, **{'max-age': '30'})
+        assert self.jar.next_expiration == 1020
+        assert self.jar.expire(now=1015) == 0
+        assert self.jar.expire(now=1020) == 1
+        assert self.jar.next_expiration == 1030
+        assert self.jar.expire(now=1030) == 1
+        assert self.jar.next_expiration is None
+        assert len(self.jar) == 0
+
+    def test_clear(self):
+        self.jar.set('a', '1', host='example.com', **{'max-age': '10'})
+        self.jar.clear()
+        assert len(self.jar) == 0
+        assert self.jar.next_expiration is None
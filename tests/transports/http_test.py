@@ -0,0 +1,60 @@
+from http.cookies import Morsel
+from unittest import TestCase
+
+from baiocas.transports.http import HttpTransport
+
+
+class MockHttpTransport(HttpTransport):
+
+    @property
+    def name(self):
+        return 'mock-http'
+
+
+class TestHttpTransportCookies(TestCase):
+
+    def setUp(self):
+        self.transport = MockHttpTransport()
+        self.transport.url = 'http://one.example.com/cometd'
+
+    def test_update_cookies(self):
+        version = self.transport._headers_version
+        self.transport.update_cookies([])
+        assert self.transport._headers_version == version
+        self.transport.update_cookies(['session=abc', 'node=1; Max-Age=60'],
+                                      time_received='Thu, 01 Jan 1970 00:16:40 GMT')
+        assert self.transport._headers_version > version
+        assert isinstance(self.transport.get_cookie('session'), Morsel)
+        assert self.transport.get_cookie('session').value == 'abc'
+        assert self.transport.get_cookie('other') is None
+        assert self.transport.get_cookie_expiration() == 1060
+        assert self.transport.get_cookie_headers(include_expired=True) == ['node=1', 'session=abc']
+        assert self.transport.get_cookie_headers() == ['session=abc']
+
+        # Cookies that are sent again as they were don't change the headers
+        version = self.transport._headers_version
+        self.transport.update_cookies(['session=abc'], time_received=1000)
+        assert self.transport._headers_version == version
+
+    def test_cookies_per_endpoint(self):
+        self.transport.set_cookie('session', 'one')
+        assert self.transport.get_headers()['cookie'] == ['session=one']
+        self.transport.url = 'http://two.example.com/cometd'
+        assert 'cookie' not in self.transport.get_headers()
+        self.transport.set_cookie('session', 'two')
+        assert self.transport.get_headers()['cookie'] == ['session=two']
+        self.transport.url = 'http://one.example.com/cometd'
+        assert self.transport.get_headers()['cookie'] == ['session=one']
+        assert len(self.transport.cookies) == 2
+
+    def test_set_cookie(self):
+        morsel = self.transport.set_cookie('session', 'abc', path='/cometd')
+        assert isinstance(morsel, Morsel)
+        assert morsel['path'] == '/cometd'
+        assert self.transport.get_cookie('session') is morsel
+
+    def test_get_headers(self):
+        self.transport.set_header('Cookie', 'static=1')
+        self.transport.set_cookie('session', 'abc')
+        assert self.transport.get_headers()['cookie'] == ['static=1', 'session=abc']
+        assert self.transport.get_headers()['cookie'] == ['static=1', 'session=abc']
@@ -0,0 +1,390 @@
+import json
+import time
+import zlib
+
+from mock import Mock
+from mock import patch
+from tornado import gen
+from tornado.httputil import HTTPHeaders
+from tornado.testing import AsyncHTTPTestCase
+from tornado.testing import gen_test
+from tornado.web import Application
+from tornado.web import RequestHandler
+
+from baiocas import errors
+from baiocas.client import Client
+from baiocas.message import Message
+from baiocas.transports.circuit_breaker import CircuitBreaker
+from baiocas.transports.context import HttpClientContext
+from baiocas.transports.long_polling import LongPollingHttpTransport
+
+
+class MockHandler(RequestHandler):
+
+    def initialize(self, test):
+        self.test = test
+
+    async def post(self):
+        if self.test.delay:
+            await gen.sleep(self.test.delay)
+        if self.test.status_code != 200:
+            self.set_status(self.test.status_code)
+            return
+        if self.test.chunks:
+            for chunk in self.test.chunks:
+                self.write(chunk)
+                await self.flush()
+                await gen.sleep(0.01)
+            return
+        self.test.request_headers = self.request.headers
+        body = self.request.body
+        if 'Content-Encoding' in self.request.headers:
+            if self.test.accept_encoding is None:
+                self.set_status(415)
+                return
+            body = zlib.decompress(body, zlib.MAX_WBITS | 32)
+        if self.test.accept_encoding:
+            self.set_header('Accept-Encoding', self.test.accept_encoding)
+        messages = json.loads(body)
+        replies = [dict(channel=message['channel'], id=message['id'], successful=True) for message in messages]
+        self.set_header('Content-Type', 'application/json; charset=UTF-8')
+        self.write(json.dumps(replies))
+
+
+class TestLongPollingHttpTransport(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return Application([(r'/cometd', MockHandler, {'test': self})])
+
+    def setUp(self):
+        super(TestLongPollingHttpTransport, self).setUp()
+        self.delay = 0
+        self.status_code = 200
+        self.chunks = None
+        self.request_headers = None
+        self.accept_encoding = ''
+        self.context = HttpClientContext()
+        self.client = Mock(spec=Client)
+        self.transport = LongPollingHttpTransport(http_context=self.context)
+        self.transport.register(self.client, url=self.get_url('/cometd'))
+        self.message = Message(channel='/test', data='dummy', id='1')
+
+    def tearDown(self):
+        self.context.close()
+        super(TestLongPollingHttpTransport, self).tearDown()
+
+    def test_context(self):
+        assert self.transport.context is self.context
+        transport = LongPollingHttpTransport()
+        assert transport.context is HttpClientContext.get_default()
+        assert LongPollingHttpTransport().context is transport.context
+
+    def test_lazy_http_clients(self):
+        context = HttpClientContext()
+        LongPollingHttpTransport(http_context=context)
+        assert context._http_client is None
+        assert context._blocking_http_client is None
+
+    def test_json_default(self):
+        message = Message(channel='/test', data=object())
+        self.assertRaises(TypeError, self.transport._prepare_request, [message])
+        self.transport.configure(json_default=lambda value: 'custom')
+        assert self.transport._prepare_request([message]).body == b'[{"channel": "/test", "data": "custom"}]'
+
+    def test_request_headers_cache(self):
+        headers = self.transport._prepare_request([self.message]).headers
+        assert headers['Content-Type'] == 'application/json; charset=UTF-8'
+        assert self.transport._prepare_request([self.message]).headers is headers
+
+        # Changing the headers or cookies rebuilds them
+        self.transport.set_header('X-Test', 'one')
+        new_headers = self.transport._prepare_request([self.message]).headers
+        assert new_headers is not headers
+        assert new_headers['X-Test'] == 'one'
+        self.transport.add_header('X-Test', 'two')
+        assert self.transport._prepare_request([self.message]).headers.get_list('X-Test') == ['one', 'two']
+        self.transport.set_cookie('session', 'abc', **{'max-age': '60'})
+        headers = self.transport._prepare_request([self.message]).headers
+        assert headers['Cookie'] == 'session=abc'
+        self.transport.update_cookies([])
+        assert self.transport._prepare_request([self.message]).headers is headers
+        assert self.transport.remove_header('x-test', None)
+        assert 'X-Test' not in self.transport._prepare_request([self.message]).headers
+
+        # The headers are also rebuilt once a cookie expires
+        headers = self.transport._prepare_request([self.message]).headers
+        with patch('time.time', return_value=time.time() + 120):
+            new_headers = self.transport._prepare_request([self.message]).headers
+        assert new_headers is not headers
+        assert 'Cookie' not in new_headers
+
+    def test_request_url_cache(self):
+        url = self.get_url('/cometd')
+        self.transport._append_message_type = True
+        connect = Message(channel='/meta/connect', advice={'timeout': 0})
+        assert self.transport._prepare_request([self.message]).url == url
+        assert self.transport._prepare_request([connect]).url == url + '/connect'
+        assert self.transport._prepare_request([connect, self.message]).url == url
+        assert self.transport._request_urls == {'/meta/connect': url + '/connect'}
+        self.transport.url = 'http://www.example.com/'
+        assert self.transport._prepare_request([connect]).url == 'http://www.example.com/connect'
+
+    @gen_test
+    def test_send(self):
+        yield self.transport.send([self.message])
+        assert not self.client.fail_messages.called
+        messages = self.client.receive_messages.call_args[0][0]
+        assert [(message.channel, message.id, message.successful) for message in messages] == [
+            ('/test', '1', True)
+        ]
+
+    @gen_test
+    def test_send_reuses_headers(self):
+        headers = self.transport._prepare_request([self.message]).headers
+        expected_headers = list(headers.get_all())
+        yield self.transport.send([self.message])
+        yield self.transport.send([self.message])
+        assert self.transport._prepare_request([self.message]).headers is headers
+        assert list(headers.get_all()) == expected_headers
+
+    @gen_test
+    def test_send_server_error(self):
+        self.status_code = 503
+        yield self.transport.send([self.message])
+        assert not self.client.receive_messages.called
+        messages, error = self.client.fail_messages.call_args[0]
+        assert messages == [self.message]
+        assert isinstance(error, errors.ServerError)
+        assert error.code == 503
+
+    @gen_test
+    def test_send_connection_error(self):
+        self.transport.url = 'http://127.0.0.1:1/cometd'
+        yield self.transport.send([self.message])
+        messages, error = self.client.fail_messages.call_args[0]
+        assert messages == [self.message]
+        assert isinstance(error, errors.CommunicationError)
+
+    @gen_test
+    def test_abort(self):
+        self.delay = 0.05
+        future = self.transport.send([self.message])
+        yield gen.moment
+        self.transport.abort()
+        yield future
+        assert not self.client.receive_messages.called
+        assert not self.client.fail_messages.called
+
+        # The request was cancelled and its connection freed
+        assert not self.transport._pending_requests
+        assert not self.context.http_client.active
+        assert not self.context.http_client.connections
+
+        # The shared HTTP client is still usable after the abort
+        self.delay = 0
+        yield self.transport.send([self.message])
+        assert self.client.receive_messages.called
+
+    @gen_test
+    def test_abort_queued(self):
+        context = HttpClientContext(max_clients=1)
+        self.transport.configure(http_context=context)
+        self.delay = 0.05
+        futures = [self.transport.send([self.message]), self.transport.send([self.message])]
+        yield gen.moment
+        assert len(context.http_client.waiting) == 1
+        start = time.time()
+        self.transport.abort()
+        yield futures
+        assert time.time() - start < self.delay
+        assert not context.http_client.active
+        assert not context.http_client.waiting
+        assert not self.client.receive_messages.called
+        assert not self.client.fail_messages.called
+        context.close()
+
+    @gen_test
+    def test_abort_probe(self):
+        clock = Mock(return_value=0.0)
+        breaker = CircuitBreaker(consecutive_timeouts=1, probe_interval=1000, clock=clock)
+        self.transport.configure(circuit_breaker=breaker)
+        breaker.record_failure(timeout=True)
+        clock.return_value = 1.0
+
+        # The response to the aborted probe is dropped, which mustn't leave
+        # the circuit half-open for good
+        self.delay = 0.05
+        future = self.transport.send([self.message])
+        yield gen.moment
+        assert breaker.state == CircuitBreaker.STATE_HALF_OPEN
+        self.transport.abort()
+        yield future
+        self.delay = 0
+        yield self.transport.send([self.message])
+        assert self.client.receive_messages.called
+        assert breaker.state == CircuitBreaker.STATE_CLOSED
+
+    @gen_test
+    def test_send_intern_keys(self):
+        self.transport.configure(intern_keys=True)
+        yield self.transport.send([self.message])
+        yield self.transport.send([self.message])
+        first, second = [call[0][0][0] for call in self.client.receive_messages.call_args_list]
+        assert first == second
+        assert first.channel is second.channel
+
+    @gen_test
+    def test_send_streaming_request(self):
+        self.transport.configure(streaming_requests=True)
+        messages = [Message(channel='/test', data='x' * 1000, id=str(index)) for index in range(200)]
+        request = self.transport._prepare_request(messages)
+        assert request.body_producer is not None
+        yield self.transport.send(messages)
+        assert self.request_headers.get('Transfer-Encoding') == 'chunked'
+        assert not self.client.fail_messages.called
+        replies = self.client.receive_messages.call_args[0][0]
+        assert [message.id for message in replies] == [message.id for message in messages]
+
+    @gen_test
+    def test_streaming_request_body(self):
+        messages = [Message(channel='/test', data='x' * 100, id=str(index)) for index in range(10)]
+        chunks = []
+
+        @gen.coroutine
+        def write(chunk):
+            chunks.append(chunk)
+
+        with patch.object(LongPollingHttpTransport, 'REQUEST_CHUNK_SIZE', 300):
+            yield self.transport._get_body_producer(messages)(write)
+        assert b''.join(chunks) == Message.to_json(messages, encoding='utf8')
+        assert 1 < len(chunks) < len(messages)
+        assert max(len(chunk) for chunk in chunks) < 300 + 200
+
+    def test_streaming_request_unsupported(self):
+        with patch.object(HttpClientContext, 'supports_body_producer', False):
+            with patch.object(self.transport.log, 'warning') as warning:
+                self.transport.configure(streaming_requests=True)
+            assert warning.called
+            request = self.transport._prepare_request([self.message])
+        assert request.body_producer is None
+        assert request.body == Message.to_json([self.message], encoding='utf8')
+
+    @gen_test
+    def test_send_streaming(self):
+        self.transport.configure(streaming_responses=True)
+        other_message = Message(channel='/other', data='dummy', id='2')
+        self.chunks = [
+            '[{"channel": "/test", "id": "1", "successful": true}',
+            ', {"channel": "/other", "id": "2", "successful": true}]'
+        ]
+        yield self.transport.send([self.message, other_message])
+        assert not self.client.fail_messages.called
+        calls = self.client.receive_messages.call_args_list
+        assert [[(message.id, message.successful) for message in call[0][0]] for call in calls] == [
+            [('1', True)], [('2', True)]
+        ]
+
+    @gen_test
+    def test_send_streaming_truncated(self):
+        self.transport.configure(streaming_responses=True)
+        other_message = Message(channel='/other', data='dummy', id='2')
+        self.chunks = ['[{"channel": "/test", "id": "1", "successful": true}, {"channel": "/oth']
+        yield self.transport.send([self.message, other_message])
+        assert self.client.receive_messages.call_count == 1
+        messages, error = self.client.fail_messages.call_args[0]
+        assert messages == [other_message]
+        assert isinstance(error, errors.CommunicationError)
+
+    @gen_test
+    def test_send_streaming_server_error(self):
+        self.transport.configure(streaming_responses=True)
+        self.status_code = 503
+        yield self.transport.send([self.message])
+        assert not self.client.receive_messages.called
+        messages, error = self.client.fail_messages.call_args[0]
+        assert messages == [self.message]
+        assert isinstance(error, errors.ServerError)
+
+    def test_configure_request_compression(self):
+        self.assertRaises(ValueError, self.transport.configure, request_compression='br')
+        self.transport.configure(request_compression='deflate')
+        assert self.transport.options['request_compression'] == 'deflate'
+
+    def test_request_compression(self):
+        self.transport.configure(request_compression='gzip', compression_threshold=100)
+        request = self.transport._prepare_request([self.message])
+        assert request.body == Message.to_json([self.message], encoding='utf8')
+        assert 'Content-Encoding' not in request.headers
+
+        # Large enough bodies are compressed without touching the cached
+        # request headers
+        messages = [Message(channel='/test', data='dummy', id=str(index)) for index in range(10)]
+        request = self.transport._prepare_request(messages)
+        assert request.headers['Content-Encoding'] == 'gzip'
+        assert zlib.decompress(request.body, zlib.MAX_WBITS | 16) == Message.to_json(messages, encoding='utf8')
+        assert 'Content-Encoding' not in self.transport._get_request_headers()
+        self.transport.configure(request_compression='deflate')
+        request = self.transport._prepare_request(messages)
+        assert request.headers['Content-Encoding'] == 'deflate'
+        assert zlib.decompress(request.body) == Message.to_json(messages, encoding='utf8')
+
+    def test_request_compression_auto(self):
+        self.transport.configure(request_compression='auto', compression_threshold=0)
+        assert 'Content-Encoding' not in self.transport._prepare_request([self.message]).headers
+        self.transport._handle_response(Mock(
+            error=None,
+            code=200,
+            headers=HTTPHeaders({'Accept-Encoding': 'deflate, gzip;q=0.5'}),
+            body=b'[]'
+        ), [])
+        assert self.transport._accepted_encodings == {'deflate': 1.0, 'gzip': 0.5}
+        assert self.transport._prepare_request([self.message]).headers['Content-Encoding'] == 'deflate'
+
+        # The server's preference wins, and a quality of 0 rules a coding out
+        for accept_encoding, expected in (('gzip, deflate', 'gzip'), ('deflate, gzip', 'gzip'),
+                                          ('gzip;q=0.5, deflate;q=0.8', 'deflate'), ('gzip;q=0', None),
+                                          ('*;q=0.5, gzip;q=0', 'deflate'), ('*', 'gzip'), ('br', None)):
+            self.transport._handle_response(Mock(
+                error=None,
+                code=200,
+                headers=HTTPHeaders({'Accept-Encoding': accept_encoding}),
+                body=b'[]'
+            ), [])
+            headers = self.transport._prepare_request([self.message]).headers
+            assert headers.get('Content-Encoding') == expected
+
+    def test_decompress_responses(self):
+        assert self.transport._prepare_request([self.message]).decompress_response
+        self.transport.configure(decompress_responses=False)
+        assert not self.transport._prepare_request([self.message]).decompress_response
+
+    @gen_test
+    def test_send_compressed(self):
+        self.transport.configure(request_compression='deflate', compression_threshold=0)
+        yield self.transport.send([self.message])
+        assert self.request_headers['Content-Encoding'] == 'deflate'
+        assert not self.client.fail_messages.called
+        assert self.client.receive_messages.called
+
+    @gen_test
+    def test_send_compressed_streaming(self):
+        self.transport.configure(request_compression='gzip', streaming_requests=True)
+        messages = [Message(channel='/test', data='x' * 1000, id=str(index)) for index in range(100)]
+        yield self.transport.send(messages)
+        assert self.request_headers['Content-Encoding'] == 'gzip'
+        replies = self.client.receive_messages.call_args[0][0]
+        assert [message.id for message in replies] == [message.id for message in messages]
+
+    @gen_test
+    def test_send_compression_rejected(self):
+        self.accept_encoding = None
+        self.transport.configure(request_compression='gzip', compression_threshold=0)
+        yield self.transport.send([self.message])
+        assert 'Content-Encoding' not in self.request_headers
+        assert not self.client.fail_messages.called
+        assert self.client.receive_messages.called
+        assert 'Content-Encoding' not in self.transport._prepare_request([self.message]).headers
+
+        # Configuring compression again gives it another try
+        self.transport.configure(request_compression='gzip')
+        assert self.transport._prepare_request([self.message]).headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,132 @@
+import json
+from unittest import TestCase
+
+from baiocas.message import Message
+from baiocas.transports.streaming import MessageStreamParser
+from baiocas.transports.streaming import StreamingResponse
+
+
+class TestMessageStreamParser(TestCase):
+
+    def setUp(self):
+        self.parser = MessageStreamParser()
+        self.messages = [
+            dict(channel='/test', id='1', successful=True),
+            dict(channel='/chat', id='2', data={'text': 'say "hi" \\o/ [{', 'list': [1, {'a': []}]}),
+            dict(channel='/chat', id='3', data='caf\u00e9 \u2603 \U0001f600'),
+        ]
+        self.body = json.dumps(self.messages, ensure_ascii=False).encode('utf8')
+
+    def feed(self, chunks):
+        messages = []
+        for chunk in chunks:
+            messages.extend(self.parser.feed(chunk))
+        messages.extend(self.parser.close())
+        return messages
+
+    def test_feed(self):
+        messages = self.feed([self.body])
+        assert all(isinstance(message, Message) for message in messages)
+        assert [dict(message) for message in messages] == self.messages
+        assert self.parser.is_done
+
+    def test_feed_split(self):
+
+        # Split at every position, including in the middle of strings,
+        # escapes and multibyte characters
+        for index in range(1, len(self.body)):
+            self.parser = MessageStreamParser()
+            messages = self.feed([self.body[:index], self.body[index:]])
+            assert [dict(message) for message in messages] == self.messages, index
+
+    def test_feed_bytewise(self):
+        messages = self.feed([self.body[index:index + 1] for index in range(len(self.body))])
+        assert [dict(message) for message in messages] == self.messages
+
+    def test_feed_returns_complete_messages(self):
+        first = json.dumps(self.messages[0]).encode('utf8')
+        messages = self.parser.feed(b'[' + first + b', {"channel": "/te')
+        assert [dict(message) for message in messages] == [self.messages[0]]
+        assert self.parser._parts == ['{"channel": "/te']
+        assert not self.parser.is_done
+
+    def test_feed_single_message(self):
+        messages = self.feed([b'{"channel": "/test", ', b'"id": "1", "successful": true}'])
+        assert [dict(message) for message in messages] == [self.messages[0]]
+
+    def test_feed_empty_array(self):
+        assert self.feed([b' [ ', b'] ']) == []
+        assert self.parser.is_done
+
+    def test_intern_keys(self):
+        messages = []
+        for _ in range(2):
+            self.parser = MessageStreamParser(intern_keys=True)
+            messages.extend(self.feed([self.body]))
+        assert [dict(message) for message in messages[:3]] == self.messages
+        assert messages[1].channel is messages[2].channel is messages[4].channel
+        assert list(messages[0])[0] is list(messages[3])[0]
+
+    def test_buffer_bounded(self):
+        message = json.dumps(self.messages[1]).encode('utf8')
+        self.parser.feed(b'[')
+        for _ in range(100):
+            self.parser.feed(message + b', ')
+            assert self.parser._parts == []
+
+    def test_large_message(self):
+        data = 'x' * 100000
+        body = json.dumps([{'channel': '/test', 'data': data}]).encode('utf8')
+        chunks = [body[index:index + 1000] for index in range(0, len(body), 1000)]
+        for chunk in chunks[:-1]:
+            assert self.parser.feed(chunk) == []
+        messages = self.parser.feed(chunks[-1]) + self.parser.close()
+        assert [message.data for message in messages] == [data]
+        assert self.parser._parts == []
+
+    def test_close_truncated(self):
+        self.parser.feed(self.body[:-1])
+        self.assertRaises(ValueError, self.parser.close)
+
+    def test_close_empty(self):
+        self.assertRaises(ValueError, self.parser.close)
+
+    def test_trailing_data(self):
+        self.assertRaises(ValueError, self.parser.feed, b'[] []')
+
+    def test_unbalanced(self):
+        self.assertRaises(ValueError, self.parser.feed, b'[{}]]')
+
+    def test_string_element(self):
+        self.assertRaises(ValueError, self.parser.feed, b'["/test"]')
+
+
+class TestStreamingResponse(TestCase):
+
+    def setUp(self):
+        self.received = []
+        self.messages = [Message(channel='/test', id='1'), Message(channel='/test', id='2')]
+        self.stream = StreamingResponse(self.messages, self.received.append)
+
+    def test_handle_header(self):
+        self.stream.handle_header('HTTP/1.1 200 OK\r\n')
+        self.stream.handle_header('Content-Type: application/json\r\n')
+        assert self.stream.code == 200
+
+    def test_handle_chunk(self):
+        self.stream.handle_header('HTTP/1.1 200 OK\r\n')
+        self.stream.handle_chunk(b'[{"channel": "/test", "id": "1", "successful": true}, ')
+        assert [message.id for message in self.received] == ['1']
+        assert self.stream.pending_messages == [self.messages[1]]
+        self.stream.handle_chunk(b'{"channel": "/other", "data": "dummy"}')
+        assert len(self.received) == 2
+        assert self.stream.pending_messages == [self.messages[1]]
+        self.stream.handle_chunk(b', {"channel": "/test", "id": "2", "successful": false}]')
+        self.stream.close()
+        assert self.stream.pending_messages == []
+
+    def test_handle_chunk_error_response(self):
+        self.stream.handle_header('HTTP/1.1 500 Internal Server Error\r\n')
+        self.stream.handle_chunk(b'<html>')
+        assert self.received == []
+        assert self.stream.pending_messages == self.messages
@@ -3,7 +3,9 @@ from email.utils import formatdate
 from http.cookies import Morsel
 from unittest import TestCase
 
+from baiocas.transports.util import get_cookie_expiration
 from baiocas.transports.util import is_cookie_expired
+from baiocas.transports.util import parse_accept_encoding
 
 
 class TestExpiredCookie(TestCase):
@@ -63,3 +65,36 @@ class TestExpiredCookie(TestCase):
         self.cookie['max-age'] = '1'
         self.cookie['expires'] = formatdate(time.time() + 86400, localtime=True)
         assert is_cookie_expired(self.cookie)
+
+
+class TestCookieExpiration(TestCase):
+
+    def setUp(self):
+        self.cookie = Morsel()
+        self.cookie.set('foo', 'bar', 'bar')
+        self.cookie.time_received = 1000
+
+    def test_no_expiration_information(self):
+        assert get_cookie_expiration(self.cookie) is None
+
+    def test_max_age(self):
+        self.cookie['max-age'] = '60'
+        assert get_cookie_expiration(self.cookie) == 1060
+
+    def test_expires(self):
+        self.cookie['expires'] = formatdate(86400, usegmt=True)
+        assert get_cookie_expiration(self.cookie) == 86400
+
+    def test_invalid_expires(self):
+        self.cookie['expires'] = 'invalid'
+        assert get_cookie_expiration(self.cookie) is None
+
+
+class TestParseAcceptEncoding(TestCase):
+
+    def test_parse(self):
+        assert parse_accept_encoding('gzip') == {'gzip': 1.0}
+        assert parse_accept_encoding('GZIP;q=0.5, deflate , br;q=0') == {'gzip': 0.5, 'deflate': 1.0, 'br': 0.0}
+        assert parse_accept_encoding('gzip; Q=0.8; level=1') == {'gzip': 0.8}
+        assert parse_accept_encoding('gzip;q=2, deflate;q=oops') == {'gzip': 1.0, 'deflate': 0.0}
+        assert parse_accept_encoding(' , ') == {}
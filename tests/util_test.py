@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+from mock import patch
+
+from baiocas import util
+from baiocas.schema import compile_schema
+from baiocas.util import get_key
+from baiocas.util import get_numpy
+from baiocas.util import get_path
+
+
+class TestGetKey(TestCase):
+
+    def test_get_key(self):
+        data = {'quote': {'symbol': 'A', 'levels': [1, 2]}}
+        assert get_key('/quotes', data) == '/quotes'
+        assert get_key('/quotes', data, ['quote', 'symbol']) == ('/quotes', 'A')
+        assert get_key('/quotes', data, ['quote', 'price']) == ('/quotes', None)
+
+    def test_unhashable(self):
+        data = {'quote': {'symbol': 'A', 'levels': [1, 2]}}
+        assert get_key('/quotes', data, ['quote']) is None
+        assert get_key('/quotes', data, ['quote', 'levels']) is None
+
+
+class TestGetNumpy(TestCase):
+
+    def test_lazy_import(self):
+
+        # Importing the client doesn't import NumPy, even when it's installed
+        code = 'import sys, baiocas.client; print("numpy" in sys.modules)'
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        assert subprocess.check_output([sys.executable, '-c', code], cwd=root).strip() == b'False'
+
+    def test_get_numpy(self):
+        with patch.object(util, '_numpy', []):
+            with patch.dict(sys.modules, {'numpy': None}):
+                assert get_numpy() is None
+            assert util._numpy == [None]
+        assert get_numpy() is get_numpy()
+
+
+class TestGetPath(TestCase):
+
+    def test_get_path(self):
+        data = {'quote': {'symbol': 'A', 'levels': [{'price': 1.5}]}}
+        assert get_path(data, 'quote.symbol') == 'A'
+        assert get_path(data, 'quote.levels.0.price') == 1.5
+        assert get_path(data, ['quote', 'symbol']) == 'A'
+        assert get_path(data, 'quote') is data['quote']
+
+    def test_missing(self):
+        data = {'quote': {'symbol': None, 'levels': []}}
+        assert get_path(data, 'quote.symbol', 'default') is None
+        assert get_path(data, 'quote.price', 'default') == 'default'
+        assert get_path(data, 'quote.levels.0') is None
+        assert get_path(data, 'quote.levels.first') is None
+        assert get_path('text', 'quote') is None
+        assert get_path(None, 'quote') is None
+
+    def test_objects(self):
+        schema = compile_schema({'quote': {'symbol': str}})
+        assert get_path(schema({'quote': {'symbol': 'A'}}), 'quote.symbol') == 'A'